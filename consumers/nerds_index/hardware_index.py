@@ -0,0 +1,148 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Hardware inventory index over juniper_conf and nso_juniper NERDS output.
+#
+# Flattens the chassis module trees into one row per module so serial and
+# part number questions (RMA, spares, inventory) can be answered without
+# loading all router JSON.
+import argparse
+import collections
+import sys
+
+import sources
+
+Module = collections.namedtuple('Module', ['serial', 'host', 'producer', 'path', 'part', 'description', 'model'])
+
+# juniper_conf uses the model attribute names, nso keeps the junos names
+KEYS = {
+    'juniper_conf': {
+        'serial': 'serial_number',
+        'part': 'part_number',
+        'model': 'model_number',
+        'children': ('modules', 'sub_modules'),
+    },
+    'nso_juniper': {
+        'serial': 'serial-number',
+        'part': 'part-number',
+        'model': 'model-number',
+        'children': ('sub-modules',),
+    },
+}
+
+
+def module_rows(name, producer, chassis):
+    """
+    Walks a chassis tree and yields [serial, host, producer, path, part,
+    description, model] for every module that has a serial or part number.
+    """
+    keys = KEYS[producer]
+    stack = [(chassis, chassis.get('name') or '')]
+    while stack:
+        module, path = stack.pop()
+        serial = module.get(keys['serial'])
+        part = module.get(keys['part'])
+        if serial or part:
+            yield [serial, name, producer, path, part, module.get('description'), module.get(keys['model'])]
+        children = []
+        for key in keys['children']:
+            children += [c for c in module.get(key) or [] if isinstance(c, dict)]
+        stack += [(c, '{}/{}'.format(path, c.get('name') or '')) for c in reversed(children)]
+
+
+def host_rows(host):
+    name = host.get('name')
+    for producer in KEYS:
+        data = host.get(producer)
+        if not isinstance(data, dict) or not isinstance(data.get('hardware'), dict):
+            continue
+        yield from module_rows(name, producer, data['hardware'])
+
+
+class HardwareIndex(sources.FileIndex):
+    version = 1
+
+    def __init__(self, files=None):
+        super().__init__(files)
+        self._by_serial = None
+        self._by_part = None
+
+    def rows(self, host):
+        return host_rows(host)
+
+    def reset(self):
+        self._by_serial = None
+        self._by_part = None
+
+    def _build(self):
+        by_serial = collections.defaultdict(list)
+        by_part = collections.defaultdict(list)
+        for row in self.all_rows():
+            module = Module(*row)
+            if module.serial:
+                by_serial[module.serial.upper()].append(module)
+            if module.part:
+                by_part[module.part.upper()].append(module)
+        self._by_serial = by_serial
+        self._by_part = by_part
+
+    def find_serial(self, serial):
+        """
+        Returns the modules with serial (case insensitive).
+        """
+        if self._by_serial is None:
+            self._build()
+        return list(self._by_serial.get(serial.upper(), []))
+
+    def find_part(self, part):
+        """
+        Returns every installed module with part number part.
+        """
+        if self._by_part is None:
+            self._build()
+        return list(self._by_part.get(part.upper(), []))
+
+    def count_parts(self):
+        """
+        Returns a Counter of installed modules per part number.
+        """
+        if self._by_part is None:
+            self._build()
+        return collections.Counter({part: len(modules) for part, modules in self._by_part.items()})
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Hardware serial and part number index over juniper_conf and nso NERDS output.')
+    parser.add_argument('-I', '--index', default='hardware_index.json.gz', help='Path to the index file.')
+    sub = parser.add_subparsers(dest='command', required=True)
+    update = sub.add_parser('update', help='Add new and changed NERDS files to the index.')
+    update.add_argument('dirs', nargs='+', help='NERDS json directories, e.g. producers/juniper_conf/json')
+    serial = sub.add_parser('serial', help='Find where serial numbers are installed.')
+    serial.add_argument('values', nargs='+')
+    part = sub.add_parser('part', help='Find where part numbers are installed.')
+    part.add_argument('values', nargs='+')
+    sub.add_parser('parts', help='Count installed modules per part number.')
+    args = parser.parse_args()
+
+    index = HardwareIndex.load(args.index)
+    if args.command == 'update':
+        changed, removed = index.update(args.dirs)
+        index.save(args.index)
+        print('{} files updated, {} removed, {} files indexed'.format(changed, removed, len(index.files)))
+        return 0
+    if args.command == 'parts':
+        for part, count in index.count_parts().most_common():
+            print('{}\t{}'.format(count, part))
+        return 0
+
+    find = index.find_serial if args.command == 'serial' else index.find_part
+    found = False
+    for value in args.values:
+        for m in find(value):
+            found = True
+            print('\t'.join(str(v) if v is not None else '-' for v in [value, m.host, m.path, m.serial, m.part, m.description, m.model]))
+    return 0 if found else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
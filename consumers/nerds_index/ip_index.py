@@ -0,0 +1,333 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Fleet wide IP address index over juniper_conf and nso_juniper NERDS output.
+#
+# Answers "which router/interface/unit has this address?" using a longest
+# prefix match over all configured unit addresses.
+#
+# Next to the gzip compressed rows, which are only needed to update the
+# index, save() writes the lookup table: the prefixes sorted per prefix
+# length in fixed width records. lookup() maps it and binary searches it
+# in place, so a lookup from a new process does not read the whole index.
+import argparse
+import collections
+import ipaddress
+import json
+import mmap
+import os
+import struct
+import sys
+
+import sources
+
+PRODUCERS = ('juniper_conf', 'nso_juniper')
+NETWORKS = {4: ipaddress.IPv4Network, 6: ipaddress.IPv6Network}
+
+Match = collections.namedtuple('Match', ['prefix', 'address', 'host', 'producer', 'interface', 'unit', 'logical_system'])
+
+
+class PrefixTrie:
+    """
+    Path compressed binary radix trie over integer keys of a fixed bit width.
+
+    Nodes are lists of [prefix, prefixlen, child0, child1, values].
+    """
+    __slots__ = ('bits', 'root')
+
+    def __init__(self, bits):
+        self.bits = bits
+        self.root = [0, 0, None, None, None]
+
+    def _bit(self, key, pos):
+        return (key >> (self.bits - 1 - pos)) & 1
+
+    def _common(self, a, b, maxlen):
+        diff = (a ^ b) >> (self.bits - maxlen)
+        return maxlen - diff.bit_length()
+
+    def _mask(self, prefixlen):
+        return ((1 << prefixlen) - 1) << (self.bits - prefixlen)
+
+    def insert(self, prefix, prefixlen, value):
+        node = self.root
+        while True:
+            if node[1] == prefixlen:
+                # Only reached when node covers exactly prefix/prefixlen
+                if node[4] is None:
+                    node[4] = []
+                node[4].append(value)
+                return
+            slot = 2 + self._bit(prefix, node[1])
+            child = node[slot]
+            if child is None:
+                node[slot] = [prefix, prefixlen, None, None, [value]]
+                return
+            common = self._common(child[0], prefix, min(child[1], prefixlen))
+            if common == child[1]:
+                node = child
+                continue
+            if common == prefixlen:
+                new = [prefix, prefixlen, None, None, [value]]
+                new[2 + self._bit(child[0], prefixlen)] = child
+                node[slot] = new
+                return
+            inner = [prefix & self._mask(common), common, None, None, None]
+            inner[2 + self._bit(child[0], common)] = child
+            inner[2 + self._bit(prefix, common)] = [prefix, prefixlen, None, None, [value]]
+            node[slot] = inner
+            return
+
+    def longest_match(self, key, prefixlen=None):
+        """
+        Returns the values of the longest prefix covering key/prefixlen.
+        """
+        if prefixlen is None:
+            prefixlen = self.bits
+        best = []
+        node = self.root
+        while node is not None:
+            if node[1] > prefixlen or (key ^ node[0]) >> (self.bits - node[1]):
+                break
+            if node[4]:
+                best = node[4]
+            if node[1] == prefixlen:
+                break
+            node = node[2 + self._bit(key, node[1])]
+        return best
+
+
+class PrefixTable:
+    """
+    Read only longest prefix match table over a bytes like buffer:
+
+        magic, number of sections, record offset, row offset table offset
+        sections: ip version, prefixlen, first record, number of records
+        records: network (16 bytes, big endian), row number
+        row offset table: number of rows + 1 offsets into the row data
+        row data: one compact JSON row per row
+
+    Sections are sorted by prefix length, records by network within them.
+    """
+    MAGIC = b'NRDSIPT1'
+    HEADER = struct.Struct('>8sIQQ')
+    SECTION = struct.Struct('>BBII')
+    RECORD = struct.Struct('>16sI')
+    OFFSET = struct.Struct('>Q')
+
+    def __init__(self, buf):
+        self.buf = buf
+        magic, sections, self.records_at, self.offsets_at = self.HEADER.unpack_from(buf, 0)
+        if magic != self.MAGIC:
+            raise ValueError('Not an ip index lookup table')
+        # ip version -> [(prefixlen, first, count)], longest prefix first
+        self.sections = {4: [], 6: []}
+        for i in range(sections):
+            version, prefixlen, first, count = self.SECTION.unpack_from(buf, self.HEADER.size + i * self.SECTION.size)
+            self.sections[version].append((prefixlen, first, count))
+        for sections in self.sections.values():
+            sections.sort(reverse=True)
+
+    @classmethod
+    def build(cls, rows):
+        """
+        Returns the table bytes for index rows.
+        """
+        rows = sorted(rows, key=lambda r: (r[0], r[2], r[1]))
+        sections = []
+        records = bytearray()
+        for i, row in enumerate(rows):
+            if not sections or sections[-1][:2] != [row[0], row[2]]:
+                sections.append([row[0], row[2], i, 0])
+            sections[-1][3] += 1
+            records += cls.RECORD.pack(row[1].to_bytes(16, 'big'), i)
+        data = [json.dumps(row, separators=(',', ':')).encode('utf-8') for row in rows]
+        records_at = cls.HEADER.size + len(sections) * cls.SECTION.size
+        offsets_at = records_at + len(records)
+        out = bytearray(cls.HEADER.pack(cls.MAGIC, len(sections), records_at, offsets_at))
+        for section in sections:
+            out += cls.SECTION.pack(*section)
+        out += records
+        offset = offsets_at + (len(rows) + 1) * cls.OFFSET.size
+        for row in data + [b'']:
+            out += cls.OFFSET.pack(offset)
+            offset += len(row)
+        for row in data:
+            out += row
+        return bytes(out)
+
+    @classmethod
+    def open(cls, path):
+        with open(path, 'rb') as f:
+            return cls(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+
+    def _network(self, i):
+        network, _ = self.RECORD.unpack_from(self.buf, self.records_at + i * self.RECORD.size)
+        return int.from_bytes(network, 'big')
+
+    def _row(self, i):
+        _, n = self.RECORD.unpack_from(self.buf, self.records_at + i * self.RECORD.size)
+        start, = self.OFFSET.unpack_from(self.buf, self.offsets_at + n * self.OFFSET.size)
+        end, = self.OFFSET.unpack_from(self.buf, self.offsets_at + (n + 1) * self.OFFSET.size)
+        return json.loads(self.buf[start:end])
+
+    def longest_match(self, version, key, prefixlen):
+        """
+        Returns the rows of the longest prefix covering key/prefixlen.
+        """
+        bits = 32 if version == 4 else 128
+        for plen, first, count in self.sections[version]:
+            if plen > prefixlen:
+                continue
+            network = key & (((1 << plen) - 1) << (bits - plen))
+            lo, hi = first, first + count
+            while lo < hi:
+                mid = (lo + hi) // 2
+                if self._network(mid) < network:
+                    lo = mid + 1
+                else:
+                    hi = mid
+            rows = []
+            while lo < first + count and self._network(lo) == network:
+                rows.append(self._row(lo))
+                lo += 1
+            if rows:
+                return rows
+        return []
+
+
+def host_rows(host, producers=PRODUCERS):
+    """
+    Yields one compact row per address configured on a unit:
+    [ip version, network, prefixlen, address, host, producer, interface, unit, logical system]
+    """
+    name = host.get('name')
+    for producer in producers:
+        data = host.get(producer)
+        if not isinstance(data, dict):
+            continue
+        for iface in data.get('interfaces') or []:
+            for unit in iface.get('units') or []:
+                for address in unit.get('address') or []:
+                    try:
+                        network = ipaddress.ip_interface(address).network
+                    except ValueError:
+                        continue
+                    yield [
+                        network.version,
+                        int(network.network_address),
+                        network.prefixlen,
+                        address,
+                        name,
+                        producer,
+                        iface.get('name'),
+                        unit.get('unit'),
+                        unit.get('logical_system'),
+                    ]
+
+
+class IpIndex(sources.FileIndex):
+    version = 1
+
+    def __init__(self, files=None):
+        super().__init__(files)
+        self._tries = None
+
+    def rows(self, host):
+        return host_rows(host)
+
+    def reset(self):
+        self._tries = None
+
+    def _build(self):
+        tries = {4: PrefixTrie(32), 6: PrefixTrie(128)}
+        for row in self.all_rows():
+            tries[row[0]].insert(row[1], row[2], row)
+        self._tries = tries
+
+    def save(self, path):
+        super().save(path)
+        tmp = '{}.tmp'.format(table_path(path))
+        with open(tmp, 'wb') as f:
+            f.write(PrefixTable.build(self.all_rows()))
+        os.replace(tmp, table_path(path))
+
+    def lookup(self, address):
+        """
+        Returns Matches for the most specific prefix covering address, which
+        can be an IP address or a prefix. Both ends of a point to point link
+        share the prefix, so there can be more than one match.
+        """
+        if self._tries is None:
+            self._build()
+        network = ipaddress.ip_network(address, strict=False)
+        return matches(self._tries[network.version].longest_match(int(network.network_address), network.prefixlen))
+
+
+def matches(rows):
+    return [Match(str(NETWORKS[r[0]]((r[1], r[2]))), *r[3:]) for r in rows]
+
+
+def table_path(index_path):
+    """
+    Path of the lookup table saved along with the index at index_path.
+    """
+    return '{}.table'.format(index_path)
+
+
+_loaded = {}
+
+
+def lookup(address, index_path):
+    """
+    Looks up address in the lookup table of the index file at index_path.
+    The mapped table is cached until the file changes. Indexes saved
+    without a table are loaded whole.
+    """
+    path = table_path(index_path)
+    if not os.path.isfile(path):
+        return IpIndex.load(index_path).lookup(address)
+    mtime = os.stat(path).st_mtime_ns
+    cached = _loaded.get(path)
+    if not cached or cached[0] != mtime:
+        cached = (mtime, PrefixTable.open(path))
+        _loaded[path] = cached
+    network = ipaddress.ip_network(address, strict=False)
+    return matches(cached[1].longest_match(network.version, int(network.network_address), network.prefixlen))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='IP address index over juniper_conf and nso NERDS output.')
+    parser.add_argument('-I', '--index', default='ip_index.json.gz', help='Path to the index file.')
+    sub = parser.add_subparsers(dest='command', required=True)
+    update = sub.add_parser('update', help='Add new and changed NERDS files to the index.')
+    update.add_argument('dirs', nargs='+', help='NERDS json directories, e.g. producers/juniper_conf/json')
+    query = sub.add_parser('lookup', help='Find the routers, interfaces and units with an address.')
+    query.add_argument('addresses', nargs='+', help='IP addresses or prefixes')
+    args = parser.parse_args()
+
+    if args.command == 'update':
+        index = IpIndex.load(args.index)
+        changed, removed = index.update(args.dirs)
+        index.save(args.index)
+        print('{} files updated, {} removed, {} files indexed'.format(changed, removed, len(index.files)))
+        return 0
+
+    found = False
+    for address in args.addresses:
+        try:
+            found_matches = lookup(address, args.index)
+        except ValueError as e:
+            print(e, file=sys.stderr)
+            continue
+        for m in found_matches:
+            found = True
+            unit = '{}.{}'.format(m.interface, m.unit)
+            if m.logical_system:
+                unit = '{}:{}'.format(m.logical_system, unit)
+            print('{}\t{}\t{}\t{}\t{}\t({})'.format(address, m.prefix, m.host, unit, m.address, m.producer))
+    return 0 if found else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
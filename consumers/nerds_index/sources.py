@@ -0,0 +1,114 @@
+import gzip
+import json
+import os
+
+
+def scan(dirs, files):
+    """
+    Compares the NERDS *.json files in dirs with the files already known in
+    an index (path -> [mtime_ns, size, ...]).
+
+    Returns a list of (path, mtime_ns, size) for new or modified files and a
+    list of known paths in dirs that no longer exist. Known files outside
+    dirs are left alone.
+    """
+    changed = []
+    seen = set()
+    scanned_dirs = set()
+    for d in dirs:
+        d = os.path.abspath(d)
+        scanned_dirs.add(d)
+        with os.scandir(d) as it:
+            for entry in it:
+                if not entry.name.endswith('.json') or not entry.is_file():
+                    continue
+                path = entry.path
+                seen.add(path)
+                st = entry.stat()
+                known = files.get(path)
+                if not known or known[0] != st.st_mtime_ns or known[1] != st.st_size:
+                    changed.append((path, st.st_mtime_ns, st.st_size))
+    removed = [p for p in files if p not in seen and os.path.dirname(p) in scanned_dirs]
+    return changed, removed
+
+
+def load_host(path):
+    """
+    Returns the host part of a NERDS document, or None if the file could not
+    be read.
+    """
+    try:
+        with open(path) as f:
+            return json.load(f).get('host')
+    except (IOError, ValueError, AttributeError):
+        return None
+
+
+def load_index(path):
+    """
+    Reads a gzip compressed index file, returns None if it does not exist.
+    """
+    if not os.path.isfile(path):
+        return None
+    with gzip.open(path, 'rt') as f:
+        return json.load(f)
+
+
+def save_index(data, path):
+    """
+    Writes data as compact gzip compressed JSON, replacing path atomically.
+    """
+    tmp = '{}.tmp'.format(path)
+    with gzip.open(tmp, 'wt') as f:
+        json.dump(data, f, separators=(',', ':'))
+    os.replace(tmp, path)
+
+
+class FileIndex:
+    """
+    Base class for indexes made of rows extracted from NERDS files.
+
+    Subclasses implement rows(host) and may build lookup structures from
+    self.files, which maps path -> [mtime_ns, size, rows]. reset() is called
+    whenever the rows change.
+    """
+    version = 1
+
+    def __init__(self, files=None):
+        self.files = files or {}
+
+    @classmethod
+    def load(cls, path):
+        data = load_index(path)
+        if not data or data.get('version') != cls.version:
+            return cls()
+        return cls(data['files'])
+
+    def save(self, path):
+        save_index({'version': self.version, 'files': self.files}, path)
+
+    def rows(self, host):
+        raise NotImplementedError()
+
+    def reset(self):
+        pass
+
+    def update(self, dirs):
+        """
+        Re-reads new and modified NERDS files in dirs and drops removed ones.
+        Returns the number of (changed, removed) files.
+        """
+        changed, removed = scan(dirs, self.files)
+        for path in removed:
+            del self.files[path]
+        for path, mtime, size in changed:
+            host = load_host(path)
+            rows = list(self.rows(host)) if host else []
+            self.files[path] = [mtime, size, rows]
+        if changed or removed:
+            self.reset()
+        return len(changed), len(removed)
+
+    def all_rows(self):
+        for _, _, rows in self.files.values():
+            yield from rows
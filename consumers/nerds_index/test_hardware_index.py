@@ -0,0 +1,92 @@
+import json
+import os
+import tempfile
+import unittest
+
+from hardware_index import HardwareIndex, module_rows
+
+JUNIPER_CONF = {
+    'name': 'Chassis',
+    'serial_number': 'JN1111',
+    'description': 'T4000',
+    'modules': [
+        {
+            'name': 'FPC 0', 'version': 'REV 02', 'part_number': '750-1', 'serial_number': 'FPC0SN',
+            'description': 'FPC Type 5-3D', 'model_number': 'T4000-FPC5-3D', 'clei_code': None,
+            'sub_modules': [
+                {
+                    'name': 'PIC 0', 'version': None, 'part_number': '750-2', 'serial_number': 'PIC0SN',
+                    'description': '12x10GE', 'model_number': None, 'clei_code': None,
+                    'sub_modules': [
+                        {'name': 'Xcvr 0', 'part_number': '740-1', 'serial_number': 'xcvr1', 'description': 'SFP+-10G-LR', 'sub_modules': []},
+                    ],
+                },
+            ],
+        },
+        {'name': 'PEM 0', 'part_number': None, 'serial_number': None, 'description': 'Power', 'sub_modules': []},
+    ],
+}
+
+NSO_JUNIPER = {
+    'name': 'Chassis',
+    'serial-number': 'NSO1',
+    'description': 'MX2010',
+    'sub-modules': [
+        {'name': 'FPC 1', 'part-number': '750-1', 'serial-number': 'FPC1SN', 'description': 'MPC', 'model-number': 'MPC7E',
+         'sub-modules': [{'name': 'Xcvr 3', 'part-number': '740-1', 'serial-number': 'XCVR3'}]},
+    ],
+}
+
+
+def nerds(name, producer, hardware):
+    return {'host': {'name': name, 'version': 1, producer: {'name': name, 'hardware': hardware}}}
+
+
+class ModuleRowsTest(unittest.TestCase):
+    def test_juniper_conf(self):
+        rows = list(module_rows('r1', 'juniper_conf', JUNIPER_CONF))
+        self.assertEqual([r[3] for r in rows], ['Chassis', 'Chassis/FPC 0', 'Chassis/FPC 0/PIC 0', 'Chassis/FPC 0/PIC 0/Xcvr 0'])
+        self.assertEqual(rows[1], ['FPC0SN', 'r1', 'juniper_conf', 'Chassis/FPC 0', '750-1', 'FPC Type 5-3D', 'T4000-FPC5-3D'])
+
+    def test_nso(self):
+        rows = list(module_rows('r2', 'nso_juniper', NSO_JUNIPER))
+        self.assertEqual([r[0] for r in rows], ['NSO1', 'FPC1SN', 'XCVR3'])
+        self.assertEqual(rows[2][3], 'Chassis/FPC 1/Xcvr 3')
+
+
+class HardwareIndexTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.dir = self.tmp.name
+        self.write('r1.json', nerds('r1', 'juniper_conf', JUNIPER_CONF))
+        self.write('r2.json', nerds('r2', 'nso_juniper', NSO_JUNIPER))
+        self.write('r3.json', nerds('r3', 'juniper_conf', ''))
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write(self, name, doc):
+        with open(os.path.join(self.dir, name), 'w') as f:
+            json.dump(doc, f)
+
+    def test_queries(self):
+        index = HardwareIndex()
+        self.assertEqual(index.update([self.dir]), (3, 0))
+        xcvr = index.find_serial('XCVR1')
+        self.assertEqual(len(xcvr), 1)
+        self.assertEqual((xcvr[0].host, xcvr[0].path, xcvr[0].part), ('r1', 'Chassis/FPC 0/PIC 0/Xcvr 0', '740-1'))
+        self.assertEqual(sorted(m.host for m in index.find_part('750-1')), ['r1', 'r2'])
+        self.assertEqual(index.count_parts()['740-1'], 2)
+        self.assertEqual(index.find_serial('missing'), [])
+
+    def test_incremental_update(self):
+        path = os.path.join(self.dir, 'hw.json.gz')
+        index = HardwareIndex()
+        index.update([self.dir])
+        index.save(path)
+
+        index = HardwareIndex.load(path)
+        self.assertEqual(len(index.find_serial('FPC1SN')), 1)
+        os.remove(os.path.join(self.dir, 'r2.json'))
+        self.assertEqual(index.update([self.dir]), (0, 1))
+        self.assertEqual(index.find_serial('FPC1SN'), [])
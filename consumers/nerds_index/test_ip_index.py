@@ -0,0 +1,137 @@
+import json
+import os
+import random
+import tempfile
+import unittest
+import ipaddress
+
+from ip_index import PrefixTrie, PrefixTable, IpIndex, lookup, table_path
+
+
+def nerds(name, producer, interfaces):
+    return {'host': {'name': name, 'version': 1, producer: {'name': name, 'interfaces': interfaces}}}
+
+
+def iface(name, *units):
+    return {'name': name, 'units': [{'unit': u, 'address': list(a)} for u, a in units]}
+
+
+class PrefixTrieTest(unittest.TestCase):
+    def test_longest_match(self):
+        trie = PrefixTrie(32)
+        prefixes = ['0.0.0.0/0', '10.0.0.0/8', '10.1.0.0/16', '10.1.2.0/24', '10.1.2.4/30', '192.168.0.0/24']
+        for p in prefixes:
+            n = ipaddress.ip_network(p)
+            trie.insert(int(n.network_address), n.prefixlen, p)
+        self.assertEqual(trie.longest_match(int(ipaddress.ip_address('10.1.2.5'))), ['10.1.2.4/30'])
+        self.assertEqual(trie.longest_match(int(ipaddress.ip_address('10.1.2.9'))), ['10.1.2.0/24'])
+        self.assertEqual(trie.longest_match(int(ipaddress.ip_address('10.2.0.1'))), ['10.0.0.0/8'])
+        self.assertEqual(trie.longest_match(int(ipaddress.ip_address('172.16.0.1'))), ['0.0.0.0/0'])
+        self.assertEqual(trie.longest_match(int(ipaddress.ip_address('10.1.0.0')), 12), ['10.0.0.0/8'])
+
+    def test_random_against_linear_scan(self):
+        rnd = random.Random(42)
+        trie = PrefixTrie(32)
+        networks = set()
+        for _ in range(500):
+            plen = rnd.randint(8, 32)
+            networks.add(ipaddress.ip_network((rnd.getrandbits(32) & ~((1 << (32 - plen)) - 1), plen)))
+        for n in networks:
+            trie.insert(int(n.network_address), n.prefixlen, n)
+        for n in list(networks)[:100]:
+            addr = n.network_address + rnd.randint(0, n.num_addresses - 1)
+            expected = max((m for m in networks if addr in m), key=lambda m: m.prefixlen)
+            self.assertEqual(trie.longest_match(int(addr)), [expected])
+
+
+class PrefixTableTest(unittest.TestCase):
+    def test_random_against_trie(self):
+        rnd = random.Random(7)
+        rows = []
+        tries = {4: PrefixTrie(32), 6: PrefixTrie(128)}
+        for i in range(1000):
+            version, bits = rnd.choice([(4, 32), (6, 128)])
+            plen = rnd.randint(8, bits)
+            network = rnd.getrandbits(bits) & ~((1 << (bits - plen)) - 1)
+            row = [version, network, plen, 'a{}'.format(i), 'r{}'.format(i % 10), 'juniper_conf', 'xe-0/0/0', '0', None]
+            rows.append(row)
+            tries[version].insert(network, plen, row)
+        # both ends of a link
+        rows.append(list(rows[0]))
+        tries[rows[0][0]].insert(rows[0][1], rows[0][2], rows[-1])
+        table = PrefixTable(PrefixTable.build(rows))
+        for row in rows:
+            bits = 32 if row[0] == 4 else 128
+            key = row[1] + rnd.randint(0, (1 << (bits - row[2])) - 1)
+            for plen in (bits, row[2]):
+                expected = tries[row[0]].longest_match(key, plen)
+                self.assertEqual(sorted(map(tuple, table.longest_match(row[0], key, plen))), sorted(map(tuple, expected)))
+        self.assertEqual(table.longest_match(4, 0, 0), tries[4].longest_match(0, 0))
+
+    def test_empty(self):
+        table = PrefixTable(PrefixTable.build([]))
+        self.assertEqual(table.longest_match(4, 1, 32), [])
+        with self.assertRaises(ValueError):
+            PrefixTable(b'\0' * PrefixTable.HEADER.size)
+
+
+class IpIndexTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.dir = self.tmp.name
+        self.write('r1.json', nerds('r1', 'juniper_conf', [
+            iface('xe-0/0/0', ('10', ['192.168.1.1/30', 'fc00::1/64'])),
+            iface('lo0', ('0', ['10.0.0.1/32', 'not-an-address'])),
+        ]))
+        self.write('r2.json', nerds('r2', 'nso_juniper', [
+            iface('xe-1/0/0', ('5', ['192.168.1.2/30'])),
+        ]))
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write(self, name, doc):
+        with open(os.path.join(self.dir, name), 'w') as f:
+            json.dump(doc, f)
+
+    def test_lookup(self):
+        index = IpIndex()
+        self.assertEqual(index.update([self.dir]), (2, 0))
+        matches = index.lookup('192.168.1.1')
+        self.assertEqual(sorted(m.host for m in matches), ['r1', 'r2'])
+        self.assertEqual(matches[0].prefix, '192.168.1.0/30')
+        lo = index.lookup('10.0.0.1')
+        self.assertEqual(len(lo), 1)
+        self.assertEqual((lo[0].host, lo[0].interface, lo[0].unit, lo[0].producer), ('r1', 'lo0', '0', 'juniper_conf'))
+        self.assertEqual(index.lookup('fc00::abcd')[0].address, 'fc00::1/64')
+        self.assertEqual(index.lookup('172.16.0.1'), [])
+
+    def test_incremental_update(self):
+        path = os.path.join(self.dir, 'index.json.gz')
+        index = IpIndex()
+        index.update([self.dir])
+        index.save(path)
+
+        index = IpIndex.load(path)
+        self.assertEqual(index.update([self.dir]), (0, 0))
+        os.remove(os.path.join(self.dir, 'r2.json'))
+        self.write('r3.json', nerds('r3', 'juniper_conf', [iface('ge-0/0/0', ('0', ['10.9.0.1/24']))]))
+        self.assertEqual(index.update([self.dir]), (1, 1))
+        self.assertEqual([m.host for m in index.lookup('192.168.1.2')], ['r1'])
+        self.assertEqual([m.host for m in index.lookup('10.9.0.200')], ['r3'])
+
+        index.save(path)
+        self.assertEqual([m.host for m in lookup('10.9.0.0/25', path)], ['r3'])
+
+    def test_lookup_table(self):
+        path = os.path.join(self.dir, 'index.json.gz')
+        self.assertEqual(lookup('192.168.1.1', path), [])
+        index = IpIndex()
+        index.update([self.dir])
+        index.save(path)
+        self.assertTrue(os.path.isfile(table_path(path)))
+        for address in ['192.168.1.1', '10.0.0.1', 'fc00::abcd', '172.16.0.1', '192.168.1.0/29']:
+            self.assertEqual(sorted(lookup(address, path)), sorted(index.lookup(address)))
+        # indexes saved before the table was added
+        os.remove(table_path(path))
+        self.assertEqual(sorted(lookup('192.168.1.1', path)), sorted(index.lookup('192.168.1.1')))
@@ -0,0 +1,55 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Throughput of the old line parser juniper.parse against
+# juniper.parse_text, in MB/s over a directory of Junos configs. Files
+# where the two disagree are counted, parse_text also reads quoted values
+# with ; { or }, trailing comments and inactive: keys that the line parser
+# gets wrong.
+import argparse
+import os
+import time
+from pathlib import Path
+
+from parsers import juniper
+import sources
+
+
+def parse_lines(path):
+    with open(path) as f:
+        return juniper.parse(f)
+
+
+def parse_text(path):
+    return juniper.parse_text(sources.read(path)[1])
+
+
+def measure(parse, paths, repeat):
+    best = None
+    for i in range(repeat):
+        start = time.perf_counter()
+        for p in paths:
+            parse(p)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('path', help='Directory with *.conf files')
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    paths = [p for p in sorted(Path(args.path).glob('*.conf')) if parse_text(p).get('version')]
+    size = sum(os.path.getsize(p) for p in paths) / 1e6
+    print('{} files, {:.1f} MB'.format(len(paths), size))
+    for name, parse in [('parse', parse_lines), ('parse_text', parse_text)]:
+        seconds = measure(parse, paths, args.repeat)
+        print('{:<10} {:8.2f} s {:8.1f} MB/s'.format(name, seconds, size / seconds))
+    differ = sum(1 for p in paths if parse_lines(p) != parse_text(p))
+    print('{} files parse differently'.format(differ))
+
+
+if __name__ == '__main__':
+    main()
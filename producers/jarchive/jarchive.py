@@ -1,17 +1,181 @@
 import argparse
-from pathlib import Path
+import json
+import os
+import time
+from collections import deque, namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from itertools import islice
 from parsers import juniper, arista
+from manifest import Manifest
+import sources
 
 import sys
 sys.path.append('../')
-from nerds_utils import to_nerds, save_to_json  # noqa: E40
+from nerds_utils import to_nerds, save_json_text, load_nerds_file  # noqa: E40
+
+PRODUCERS = {sources.JUNIPER: 'jarchive_juniper', sources.ARISTA: 'jarchive_arista'}
+# Config paths left out of the documents unless --exclude is given
+DEFAULT_EXCLUDE = ['system/login', 'system/root-authentication', 'system/services', 'system/syslog', 'system/archival']
+# Config paths get_hostname needs, kept along with any --include paths
+HOSTNAME_PATHS = ['system/host-name', 'system/domain-name', 'groups/re0/system/host-name']
+
+# What a parse job sends back to the writer: the host name and encoded
+# NERDS document to write, or a message saying why there is nothing to
+# write, and the digest of the config for the manifest. Encoding in the
+# job keeps the writer light and a string is much cheaper to send between
+# processes than the config tree.
+Result = namedtuple('Result', ['path', 'name', 'text', 'message', 'seconds', 'digest'])
+
+
+# Configs sent to a parse process at a time
+BATCH_SIZE = 16
+
+
+def source_path(source):
+    return source.path if isinstance(source, sources.Member) else str(source)
+
+
+def parse_config(vendor, conf, include_list=None, projection=None):
+    """
+    Parses the config text conf of vendor. Returns the host name, the
+    encoded NERDS document, or None if there is nothing to write, and a
+    message saying why not.
+    """
+    name, data, message, text = None, None, None, None
+    if vendor == sources.ARISTA:
+        data = arista.parse(conf.splitlines())
+        name = arista.get_hostname(data)
+        if not name:
+            data, message = None, 'No hostname found for:'
+    else:
+        # default to juniper
+        vendor = sources.JUNIPER
+        if include_list:
+            # skip excluded devices without parsing all of the config
+            name = juniper.scan_hostname(conf)
+            if name and name not in include_list:
+                return name, None, None
+        data = juniper.parse_text(conf, projection)
+        if not data or 'system' not in data:
+            data, message = None, 'No juniper data'
+        else:
+            name = juniper.get_hostname(data)
+            if not name:
+                data, message = None, 'No host-name found for:'
+    if data is not None and not (include_list and name not in include_list):
+        text = json.dumps(to_nerds(name, PRODUCERS[vendor], data), indent=4, sort_keys=False)
+    return name, text, message
+
+
+def parse_file(p, include_list=None, projection=None):
+    """
+    Returns the Result of parse_config for the config file path or
+    tarball member p. A config that cannot be read or parsed gets a
+    message instead of stopping the run.
+    """
+    start = time.perf_counter()
+    digest = None
+    try:
+        vendor, conf, digest = sources.read(p)
+        name, text, message = parse_config(vendor, conf, include_list, projection)
+    except Exception as e:
+        name, text, message = None, None, 'Could not parse ({}: {}):'.format(type(e).__name__, e)
+    return Result(source_path(p), name, text, message, time.perf_counter() - start, digest)
+
+
+def parse_batch(parse, batch):
+    return [parse(p) for p in batch]
+
+
+def parse_files(todo, include_list, jobs=1, projection=None):
+    """
+    Yields a Result per config in the iterable todo, in order. With more
+    than one job the configs are parsed by a pool of jobs processes, in
+    batches and with a bounded number of batches in flight so a streamed
+    tarball is never all in memory.
+    """
+    parse = partial(parse_file, include_list=include_list, projection=projection)
+    if jobs <= 1:
+        yield from map(parse, todo)
+        return
+    todo = iter(todo)
+    in_flight = deque()
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        while True:
+            batch = list(islice(todo, BATCH_SIZE))
+            if batch:
+                in_flight.append(executor.submit(parse_batch, parse, batch))
+            if in_flight and (not batch or len(in_flight) > jobs * 2):
+                yield from in_flight.popleft().result()
+            elif not batch:
+                return
+
+
+def output_file(out_dir, host):
+    return os.path.join(out_dir, '{}.json'.format(host.lower()))
+
+
+def remove_output(out_dir, host):
+    """
+    Removes what jarchive wrote for host, and the file if nothing else is
+    left in it. A file without jarchive data is left alone.
+    """
+    file_name = output_file(out_dir, host)
+    if not os.path.isfile(file_name):
+        return
+    current = load_nerds_file(file_name)
+    host_data = current.get('host', {}) if current else {}
+    removed = [host_data.pop(producer) for producer in PRODUCERS.values() if producer in host_data]
+    if not removed:
+        return
+    if set(host_data) - {'name', 'version'}:
+        with open(file_name, 'w') as f:
+            json.dump(current, f, indent=4, sort_keys=False)
+        return
+    os.remove(file_name)
+
+
+def changed_files(found, manifest, out_dir, current, stats):
+    """
+    Yields the config files or tarball members in found that are new or
+    changed since the manifest was written, or whose output is gone. The
+    paths of all of them are added to current, and the stat of the yielded
+    ones to stats.
+
+    A file that only has another mtime is read here to compare its hash,
+    and yielded as a Member so it is not read again to be parsed.
+    """
+    for p in found:
+        if isinstance(p, sources.Member):
+            path, stat, digest = p.path, p.stat, p.digest
+        else:
+            path, stat, digest = str(p), p.stat(), None
+            if manifest.moved(path, stat):
+                p = sources.load(p, stat)
+                digest = p.digest
+        current.add(path)
+        host = manifest.host(path)
+        if manifest.unchanged(path, stat, digest) and (not host or os.path.isfile(output_file(out_dir, host))):
+            continue
+        stats[path] = stat
+        yield p
 
 
 def main():
     parser = argparse.ArgumentParser()
-    parser.add_argument('--path', '-P', required=True, help='Path to jarchive directory')
+    parser.add_argument('--path', '-P', required=True,
+                        help='Path to jarchive directory or tarball, configs may be gzip or xz compressed')
     parser.add_argument('--out-dir', '-O', default='json', help='Path to output directory')
     parser.add_argument('--only-file', help='Only include devices specified in file')
+    parser.add_argument('--jobs', '-j', type=int, default=1, help='Number of processes parsing configs')
+    parser.add_argument('--timings', type=int, default=0, metavar='N', help='Print the parse times of the N slowest configs')
+    parser.add_argument('--manifest', help='Path to the manifest of parsed files (default: OUT_DIR/.jarchive_manifest)')
+    parser.add_argument('--full', action='store_true', help='Parse all files, not only new and changed ones')
+    parser.add_argument('--include', action='append', default=[], metavar='PATH',
+                        help='Only keep this config path, e.g. interfaces or protocols/bgp (repeatable)')
+    parser.add_argument('--exclude', action='append', metavar='PATH',
+                        help='Leave out this config path (repeatable, default: {})'.format(' '.join(DEFAULT_EXCLUDE)))
 
     args = parser.parse_args()
     include_list = []
@@ -19,31 +183,55 @@ def main():
         with open(args.only_file) as f:
             include_list = {line.strip() for line in f if line}
 
-    for p in Path(args.path).glob('*.conf'):
-        # need to read file "twice" 1 for detection of parser type.. and one for parsing
-        with p.open() as f:
-            if arista.is_ariasta(f):
-                print("Skipping arista", p)
-                continue
+    include = args.include + HOSTNAME_PATHS if args.include else []
+    projection = juniper.Projection(include, DEFAULT_EXCLUDE if args.exclude is None else args.exclude)
 
-            # default to juniper
-            data = juniper.parse(f)
-            if not data or 'system' not in data:
-                print('No juniper data', p)
-                continue
+    manifest = Manifest(args.manifest or os.path.join(args.out_dir, '.jarchive_manifest'),
+                        options={'only': sorted(include_list),
+                                 'include': projection.include,
+                                 'exclude': projection.exclude})
+    if args.full:
+        manifest.clear()
+    if os.path.isdir(args.path):
+        found = sources.config_files(args.path)
+    else:
+        found = sources.tar_members(args.path)
+    current = set()
+    stats = {}
+    todo = changed_files(found, manifest, args.out_dir, current, stats)
 
-            name = juniper.get_hostname(data)
-            if not name:
-                print('No host-name found for:', p)
-                continue
-            if include_list and name not in include_list:
-                continue
-            # some cleanup
-            for key in ['login', 'root-authentication', 'services', 'syslog', 'archival']:
-                if key in data['system']:
-                    del data['system'][key]
-            nerds = to_nerds(name, 'jarchive_juniper', data)
-            save_to_json(nerds, args.out_dir, sort_keys=False)
+    timings = []
+    # hosts that were written by files that are gone or now write another host
+    stale = set()
+    for result in parse_files(todo, include_list, args.jobs, projection):
+        timings.append((result.seconds, result.path))
+        if result.message:
+            print(result.message, result.path)
+        host = result.name if result.text is not None else None
+        old_host = manifest.host(result.path)
+        if old_host and old_host != host:
+            stale.add(old_host)
+        manifest.record(result.path, stats.pop(result.path), host, result.digest)
+        if host is None:
+            continue
+        save_json_text(result.text, result.name, args.out_dir, sort_keys=False)
+
+    removed = [path for path in list(manifest.files) if path not in current]
+    for path in removed:
+        old_host = manifest.remove(path)['host']
+        if old_host:
+            stale.add(old_host)
+    for host in (stale | manifest.dropped) - manifest.hosts():
+        remove_output(args.out_dir, host)
+    if not os.path.exists(args.out_dir):
+        os.makedirs(args.out_dir)
+    manifest.save()
+    print(f'Parsed {len(timings)}, unchanged {len(current) - len(timings)}, removed {len(removed)} files')
+
+    if args.timings:
+        print('Slowest configs:')
+        for seconds, path in sorted(timings, reverse=True)[:args.timings]:
+            print(f'{seconds * 1000:10.1f} ms  {path}')
 
 
 if __name__ == '__main__':
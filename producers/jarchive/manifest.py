@@ -0,0 +1,88 @@
+# Input fingerprints for incremental jarchive runs.
+#
+# For every config file the manifest keeps its size, mtime and sha1 along
+# with the host name it produced (None if it produced nothing). A file
+# whose size and mtime, or failing that hash, still match is not parsed
+# again. The hashes come from the reads of the configs, the manifest never
+# reads a file itself. When the manifest starts over, the hosts it had are
+# kept so their output can be removed if no file writes them any more.
+import json
+import os
+
+VERSION = 2
+
+
+class Manifest(object):
+    def __init__(self, path, options=''):
+        self.path = path
+        # Runs with other options, e.g. another --only-file or --include, start over
+        self.options = options
+        self.files = {}
+        # Hosts of the files that were forgotten, their output may be stale
+        self.dropped = set()
+        if os.path.isfile(path):
+            with open(path) as f:
+                try:
+                    saved = json.load(f)
+                except ValueError:
+                    saved = {}
+            if saved.get('version') == VERSION and saved.get('options') == options:
+                self.files = saved.get('files', {})
+            else:
+                self.dropped = {e.get('host') for e in saved.get('files', {}).values() if e.get('host')}
+
+    def clear(self):
+        self.dropped |= self.hosts()
+        self.files = {}
+
+    def host(self, path):
+        entry = self.files.get(path)
+        return entry['host'] if entry else None
+
+    def hosts(self):
+        return {e['host'] for e in self.files.values() if e['host']}
+
+    def moved(self, path, stat):
+        """
+        True if the file at path has the size it had when it was recorded
+        but another mtime, only its hash can tell if it changed.
+        """
+        entry = self.files.get(path)
+        return bool(entry) and entry['size'] == stat.st_size and entry['mtime'] != stat.st_mtime
+
+    def unchanged(self, path, stat, digest=None):
+        """
+        True if the file at path has the size and mtime it had when it was
+        recorded, or the size and content hash digest if it is known. A
+        matching hash refreshes the recorded mtime.
+        """
+        entry = self.files.get(path)
+        if not entry or entry['size'] != stat.st_size:
+            return False
+        if entry['mtime'] == stat.st_mtime:
+            return True
+        if digest and entry['hash'] == digest:
+            entry['mtime'] = stat.st_mtime
+            return True
+        return False
+
+    def record(self, path, stat, host, digest):
+        """
+        Records the file at path with the stat and digest of the content
+        that was parsed, None if it could not be read.
+        """
+        self.files[path] = {
+            'size': stat.st_size,
+            'mtime': stat.st_mtime,
+            'hash': digest,
+            'host': host,
+        }
+
+    def remove(self, path):
+        return self.files.pop(path, None)
+
+    def save(self):
+        tmp = '{}.tmp'.format(self.path)
+        with open(tmp, 'w') as f:
+            json.dump({'version': VERSION, 'options': self.options, 'files': self.files}, f)
+        os.replace(tmp, self.path)
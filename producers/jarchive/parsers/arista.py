@@ -1,52 +1,78 @@
-# conf needs to be an itterator, not an array for this to work
-def parse(conf, recursive=False):
+import re
+
+# Interface and vlan ranges: a name ending in numbers and number ranges,
+# like Ethernet1/1-4,6 or 10,20-22
+RANGE = re.compile(r'^(.*?)(\d+(?:-\d+)?(?:,\d+(?:-\d+)?)+|\d+-\d+)$')
+# Ranges larger than this are kept as they are
+MAX_RANGE = 4094
+
+
+def expand(name):
+    """
+    Returns the names in an interface or vlan range, or just name.
+    """
+    m = RANGE.match(name)
+    if not m:
+        return [name]
+    prefix, spec = m.groups()
+    names = []
+    for part in spec.split(','):
+        first, _, last = part.partition('-')
+        first = int(first)
+        last = int(last) if last else first
+        if last < first or len(names) + last - first >= MAX_RANGE:
+            return [name]
+        names.extend(f'{prefix}{i}' for i in range(first, last + 1))
+    return names
+
+
+# conf needs to be an itterator of lines
+def parse(conf):
     data = {}
+    # the interfaces or vlans the indented lines below belong to
+    blocks = []
     for line in conf:
         tline = line.strip()
-        if recursive and tline == '!':
-            return data
-        if tline.startswith('!') or tline == 'end':
+        if not tline or tline.startswith('!'):
             # ignore comment
             continue
-        # vlans and interfaces
-        if tline.startswith('vlan') or tline.startswith('interface'):
-            key, vlan = tline.split()
-            key = f'{key}s'
-            if key not in data:
-                data[key] = {}
-            data[key][vlan] = parse(conf, recursive=True)
-        # other keys
-        elif tline.startswith('hostname'):
-            data['hostname'] = tline.split()[-1]
-        elif tline.startswith('ip domain-name'):
-            data['domain-name'] = tline.split()[-1]
-        elif tline.startswith('ip address'):
-            data['ip-address'] = tline.split()[-1]
-        elif any([tline.startswith(p) for p in ['description', 'name', 'mlag']]):
-            key, val = tline.split(' ', 1)
-            if val.startswith('"'):
-                val = val[1: -1]
-            data[key] = val
+        if tline == 'end':
+            # end of the config
+            break
+        words = tline.split()
+        if not line[0].isspace():
+            # a line that is not indented ends the block before it
+            blocks = []
+            # vlans and interfaces
+            if words[0] in ('vlan', 'interface') and len(words) == 2:
+                key = f'{words[0]}s'
+                if key not in data:
+                    data[key] = {}
+                blocks = [data[key].setdefault(name, {}) for name in expand(words[1])]
+            # other keys
+            elif words[0] == 'hostname' and len(words) > 1:
+                data['hostname'] = words[-1]
+            elif words[:2] in (['ip', 'domain-name'], ['dns', 'domain']) and len(words) > 2:
+                data['domain-name'] = words[-1]
+            continue
+        for block in blocks:
+            if words[:2] == ['ip', 'address'] and len(words) > 2:
+                if 'ip-address' not in block:
+                    # the primary address, not a secondary one
+                    block['ip-address'] = words[2]
+            elif words[0] in ('description', 'name', 'mlag') and len(words) > 1:
+                val = tline.split(' ', 1)[1]
+                if val.startswith('"'):
+                    val = val[1: -1]
+                block[words[0]] = val
     return data
 
 
-def is_ariasta(conf):
-    i = 0
-    for line in conf:
-        if i > 5:
-            conf.seek(0)
-            return False
-        # will be in the first 5 lines normally
-        if line.startswith('!'):
-            # arista comment found
-            conf.seek(0)
-            return True
-        i += 1
-
-
 def get_hostname(data):
-    hostname = data['hostname']
-    domain = data['domain-name']
+    hostname = data.get('hostname')
+    if not hostname:
+        return None
+    domain = data.get('domain-name')
     if domain:
         hostname = f'{hostname}.{domain}'
     return hostname
@@ -1,3 +1,28 @@
+import re
+
+# parse_text handles lines holding one plain statement, or a key with a
+# single quoted value, with string methods. Anything else, quoted strings
+# that contain ;, { or } or span lines, [ ] arrays, /* */ annotations,
+# # comments or several statements on a line, goes through the regexes
+# below. A general statement is its text up to the ;, { or } that ends
+# it, with the special parts matched as a whole. Plain runs and special
+# parts start with different characters, so a failing match backtracks
+# at most linearly.
+PLAIN = r'[^;{}"\[#/]*'
+SPECIAL = r'(?:"[^"\\]*(?:\\.[^"\\]*)*"|\[[^\]]*\]|/\*.*?\*/|#[^\n]*|/(?!\*))'
+STATEMENT = re.compile(PLAIN + r'(?:' + SPECIAL + PLAIN + r')*[;{}]', re.S)
+# The words of a statement, whitespace is skipped by findall
+TOKENS = re.compile(r'"(?:[^"\\]|\\.)*"|/\*.*?\*/|#[^\n]*|[\[\]]|[^\s\[\]"]+|"', re.S)
+# Text with only comments and whitespace
+COMMENTS = re.compile(r'\s*(?:(?:#[^\n]*|/\*.*?\*/)\s*)*\Z', re.S)
+# Statement prefixes that are kept as part of the key
+PREFIXES = ('inactive:', 'protect:')
+# Top level stanzas, as written by show configuration with the closing
+# brace on the first column
+SYSTEM = re.compile(r'^system \{$(.*?)^\}', re.M | re.S)
+GROUPS = re.compile(r'^groups \{$(.*?)^\}', re.M | re.S)
+
+
 # conf needs to be an itterator, not an array for this to work
 def parse(conf):
     data = {}
@@ -29,6 +54,288 @@ def parse(conf):
     return data
 
 
+def unquote(token):
+    if len(token) > 1 and token[0] == '"' and token[-1] == '"':
+        return token[1:-1]
+    return token
+
+
+class Projection(object):
+    """
+    Config paths to keep and to drop while parsing. A path is written
+    with / between keys, and a key in a path matches a statement with
+    that key or that first word, so policy-options/policy-statement
+    matches every policy statement and interfaces/ge-0/0/0/unit every unit
+    of ge-0/0/0. With include paths only those hierarchies and the blocks
+    leading to them are kept, excluded paths are dropped even inside
+    included ones.
+    """
+    def __init__(self, include=(), exclude=()):
+        self.include = sorted(include)
+        self.exclude = sorted(exclude)
+        if self.include or self.exclude:
+            # rules for the top level, see _child
+            self.root = (self.include or None, self.exclude)
+        else:
+            self.root = None
+
+
+def _first_word(key):
+    word, _, rest = key.partition(' ')
+    if word in PREFIXES:
+        word = rest.partition(' ')[0]
+    return word
+
+
+def _tails(paths, key):
+    """
+    Returns the paths that key matches the start of, without that start,
+    and True if key matches a whole path.
+    """
+    tails = []
+    whole = False
+    for name in {key, _first_word(key)}:
+        for path in paths:
+            if path == name:
+                whole = True
+            elif path.startswith(name) and path[len(name)] == '/':
+                tails.append(path[len(name) + 1:])
+    return tails, whole
+
+
+def _child(rules, key):
+    """
+    Returns the rules for the block key under a block with rules, None if
+    everything in it is kept or False if it is dropped. Rules are the
+    include paths, or None for all, and the exclude paths below a block.
+    """
+    include, exclude = rules
+    exclude, whole = _tails(exclude, key)
+    if whole:
+        return False
+    if include is not None:
+        include, whole = _tails(include, key)
+        if whole:
+            include = None
+        elif not include:
+            return False
+    if include is None and not exclude:
+        return None
+    return include, exclude
+
+
+def _keeps(rules, key):
+    """
+    True if the leaf statement key is kept under a block with rules.
+    """
+    include, exclude = rules
+    if _tails(exclude, key)[1]:
+        return False
+    return include is None or _tails(include, key)[1]
+
+
+def parse_text(text, projection=None):
+    """
+    Parses a Junos configuration in curly brace format, like parse() but
+    from a string. Quoted strings may contain ;, { and } and span lines,
+    comments and annotations are skipped and inactive:/protect: prefixes
+    stay part of the key. Nesting is kept on an explicit stack.
+
+    With a Projection, dropped blocks are only read for their braces and
+    never built.
+
+    A statement that is still not complete at the end of the text, e.g.
+    after a stray quote, is taken to be broken: its first line is dropped
+    and the text from its second line on is read again.
+    """
+    data = {}
+    rules = projection.root if projection else None
+    stack = []
+    # depth inside a dropped block
+    skip = 0
+    # text of statements that are not complete yet and its number of quotes
+    pending = ''
+    quotes = 0
+    lines = text.splitlines()
+    while True:
+        last = len(lines) - 1
+        for i, line in enumerate(lines):
+            if pending:
+                pending += '\n' + line
+                if quotes % 2 and '"' not in line and i < last:
+                    # still in a quoted string, nothing can be complete yet
+                    continue
+            elif skip:
+                s = line.strip()
+                if not s:
+                    continue
+                if '"' in s or '#' in s or '/*' in s:
+                    pending = line
+                elif s == '}':
+                    skip -= 1
+                    continue
+                elif s[-1] == ';' and '{' not in s and '}' not in s:
+                    continue
+                elif s[-1] == '{' and s.count('{') == 1 and ';' not in s and '}' not in s:
+                    skip += 1
+                    continue
+                else:
+                    pending = line
+            else:
+                s = line.strip()
+                if not s:
+                    continue
+                end = s[-1]
+                if '"' in s or '#' in s or '[' in s or '/*' in s:
+                    if end == ';' and s[-2] == '"' and s.count('"') == 2 and not ('#' in s or '[' in s or '/*' in s):
+                        # key "value";
+                        key, _, value = s[:-1].partition(' ')
+                        if value and value[0] == '"' and key not in PREFIXES:
+                            if rules is None or _keeps(rules, key):
+                                data[key] = value[1:-1]
+                            continue
+                    pending = line
+                elif end == ';' and not (';' in s[:-1] or '{' in s or '}' in s):
+                    key, _, value = s[:-1].partition(' ')
+                    if key in PREFIXES:
+                        key, value = _leaf(s[:-1].split())
+                    if rules is None or _keeps(rules, key):
+                        data[key] = value or True
+                    continue
+                elif end == '{' and s.count('{') == 1 and ';' not in s and '}' not in s:
+                    key = s[:-1].rstrip()
+                    child = rules if rules is None else _child(rules, key)
+                    if child is False:
+                        skip = 1
+                        continue
+                    block = {}
+                    data[key] = block
+                    stack.append((data, rules))
+                    data, rules = block, child
+                    continue
+                elif s == '}':
+                    if not stack:
+                        return data
+                    data, rules = stack.pop()
+                    continue
+                else:
+                    pending = line
+            pos = 0
+            for m in _statements(pending):
+                end = m.group()[-1]
+                pos = m.end()
+                if skip:
+                    if end == '{':
+                        skip += 1
+                    elif end == '}':
+                        skip -= 1
+                    continue
+                words = _words(m.group()[:-1])
+                if end == '}':
+                    if not stack:
+                        return data
+                    data, rules = stack.pop()
+                elif end == '{':
+                    key = ' '.join(_word(w) for w in words)
+                    child = rules if rules is None else _child(rules, key)
+                    if child is False:
+                        skip = 1
+                        continue
+                    block = {}
+                    data[key] = block
+                    stack.append((data, rules))
+                    data, rules = block, child
+                elif words:
+                    key, value = _leaf(words)
+                    if rules is None or _keeps(rules, key):
+                        data[key] = value
+            pending = pending[pos:]
+            if COMMENTS.match(pending):
+                pending = ''
+            quotes = pending.count('"')
+        if not pending:
+            break
+        # a statement left open, read again from its second line
+        lines = pending.split('\n')[1:]
+        pending = ''
+    while stack:
+        # unterminated blocks
+        data, rules = stack.pop()
+    return data
+
+
+def _statements(text):
+    """
+    Yields the complete statements at the start of text, one after the
+    other, stopping at the first one that is not complete yet.
+    """
+    m = STATEMENT.match(text)
+    while m:
+        yield m
+        m = STATEMENT.match(text, m.end())
+
+
+def _words(text):
+    """
+    Splits statement text into words, without comments and with each
+    [ ] array as a list.
+    """
+    words = []
+    array = None
+    for token in TOKENS.findall(text):
+        if token[0] == '#' or token[:2] == '/*':
+            continue
+        if token == '[':
+            array = []
+        elif token == ']' and array is not None:
+            words.append(array)
+            array = None
+        elif array is not None:
+            array.append(unquote(token))
+        else:
+            words.append(token)
+    return words
+
+
+def _leaf(words):
+    """
+    Returns the key and value of a statement without a block.
+    """
+    n = 2 if words[0] in PREFIXES and len(words) > 1 else 1
+    key = ' '.join(words[:n])
+    values = words[n:]
+    if not values:
+        return key, True
+    if len(values) == 1 and isinstance(values[0], list):
+        return key, values[0]
+    if len(values) == 1:
+        return key, unquote(values[0])
+    return key, ' '.join(_word(v) for v in values)
+
+
+def _word(word):
+    if isinstance(word, list):
+        return '[ {} ]'.format(' '.join(word))
+    return word
+
+
+def scan_hostname(text):
+    """
+    Returns the host name get_hostname would give for the configuration
+    in text, parsing only the top level system stanza and, if that has no
+    host-name, the groups stanza. None if the system stanza is not found.
+    """
+    m = SYSTEM.search(text)
+    if not m:
+        return None
+    data = {'system': parse_text(m.group(1))}
+    if not data['system'].get('host-name'):
+        m = GROUPS.search(text)
+        if m:
+            data['groups'] = parse_text(m.group(1))
+    return get_hostname(data)
+
+
 def get_hostname(data):
     hostname = data['system'].get('host-name')
     domain = data['system'].get('domain-name')
@@ -44,28 +351,19 @@ def get_hostname(data):
     return hostname
 
 
-def is_juniper(conf):
-    # first 5 lines should include version
-    i = 0
-    for line in conf:
-        if i > 5:
-            conf.seek(0)
-            return False
-        if line.startswith('version'):
-            conf.seek(0)
-            return True
-        i += 1
-
-
 if __name__ == '__main__':
     import argparse
+    from pathlib import Path
     parser = argparse.ArgumentParser()
     parser.add_argument('conf')
     args = parser.parse_args()
 
-    with open(args.conf) as f:
-        import json
-        data = parse(f)
-        name = get_hostname(data)
-        print(name)
-        print(json.dumps(data, indent=4))
+    import json
+    import os
+    import sys
+    sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+    import sources
+    data = parse_text(sources.read(Path(args.conf))[1])
+    name = get_hostname(data)
+    print(name)
+    print(json.dumps(data, indent=4))
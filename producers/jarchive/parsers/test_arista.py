@@ -0,0 +1,86 @@
+from .arista import expand, get_hostname, parse
+import unittest
+
+CONFIG = '''! Command: show running-config
+! device: sw1 (DCS-7050SX3-48YC8, EOS-4.25.4M)
+!
+hostname sw1
+ip domain-name example.net
+!
+vlan 10
+   name mgmt
+!
+vlan 20-22,30
+   name users
+!
+interface Ethernet1/1-2
+   description "to r1"
+   mtu 9214
+!
+interface Ethernet3
+   description uplink to core
+   ip address 192.0.2.1/31
+   ip address 192.0.2.3/31 secondary
+!
+interface Port-Channel10
+   mlag 10
+!
+interface Management1
+   ip address 10.0.0.10/24
+!
+ip route 0.0.0.0/0 10.0.0.1
+!
+end
+hostname after-end
+'''
+
+
+class ExpandTest(unittest.TestCase):
+    def test_single(self):
+        self.assertEqual(expand('Ethernet3'), ['Ethernet3'])
+        self.assertEqual(expand('Port-Channel10'), ['Port-Channel10'])
+        self.assertEqual(expand('10'), ['10'])
+
+    def test_ranges(self):
+        self.assertEqual(expand('Ethernet1/1-3'), ['Ethernet1/1', 'Ethernet1/2', 'Ethernet1/3'])
+        self.assertEqual(expand('Ethernet5,7-8'), ['Ethernet5', 'Ethernet7', 'Ethernet8'])
+        self.assertEqual(expand('20-22,30'), ['20', '21', '22', '30'])
+
+    def test_kept_as_is(self):
+        # backwards and too large ranges
+        self.assertEqual(expand('5-3'), ['5-3'])
+        self.assertEqual(expand('1-5000'), ['1-5000'])
+        self.assertEqual(expand('1-4000,4001-4100'), ['1-4000,4001-4100'])
+
+
+class ParseTest(unittest.TestCase):
+    def setUp(self):
+        self.data = parse(iter(CONFIG.splitlines()))
+
+    def test_hostname(self):
+        self.assertEqual(self.data['hostname'], 'sw1')
+        self.assertEqual(get_hostname(self.data), 'sw1.example.net')
+        self.assertEqual(get_hostname({'hostname': 'sw1'}), 'sw1')
+        self.assertIsNone(get_hostname({'domain-name': 'example.net'}))
+
+    def test_vlans(self):
+        self.assertEqual(self.data['vlans'], {
+            '10': {'name': 'mgmt'},
+            '20': {'name': 'users'},
+            '21': {'name': 'users'},
+            '22': {'name': 'users'},
+            '30': {'name': 'users'},
+        })
+
+    def test_interfaces(self):
+        self.assertEqual(self.data['interfaces'], {
+            'Ethernet1/1': {'description': 'to r1'},
+            'Ethernet1/2': {'description': 'to r1'},
+            'Ethernet3': {'description': 'uplink to core', 'ip-address': '192.0.2.1/31'},
+            'Port-Channel10': {'mlag': '10'},
+            'Management1': {'ip-address': '10.0.0.10/24'},
+        })
+
+    def test_dns_domain(self):
+        data = parse(iter(['hostname sw2', 'dns domain example.org']))
+        self.assertEqual(get_hostname(data), 'sw2.example.org')
@@ -0,0 +1,148 @@
+from .juniper import Projection, parse, parse_text, scan_hostname
+import unittest
+
+CONFIG = '''## Last commit: 2024-01-01 12:00:00 UTC by admin
+version 20.4R3.8;
+system {
+    host-name r1-re0;
+    domain-name example.net;
+    login {
+        message "Authorised use only; {see policy}";
+    }
+}
+interfaces {
+    ge-0/0/0 {
+        description "uplink";
+        unit 0 {
+            family inet {
+                address 192.0.2.1/31;
+            }
+        }
+    }
+}
+'''
+
+
+class ParseTextTest(unittest.TestCase):
+    def test_same_as_parse(self):
+        self.assertEqual(parse_text(CONFIG), parse(iter(CONFIG.splitlines())))
+
+    def test_quoted_special_characters(self):
+        data = parse_text(CONFIG)
+        self.assertEqual(data['system']['login']['message'], 'Authorised use only; {see policy}')
+        self.assertEqual(data['interfaces']['ge-0/0/0']['unit 0']['family inet']['address'], '192.0.2.1/31')
+
+    def test_multi_line_string(self):
+        data = parse_text('system {\n    login {\n        message "line one\n  line two";\n    }\n    host-name r1;\n}\n')
+        self.assertEqual(data['system']['login']['message'], 'line one\n  line two')
+        self.assertEqual(data['system']['host-name'], 'r1')
+
+    def test_multi_line_string_with_braces(self):
+        data = parse_text('system {\n    login {\n        message "one {\n two }\n three;";\n    }\n    host-name r1;\n}\n')
+        self.assertEqual(data['system']['login']['message'], 'one {\n two }\n three;')
+        self.assertEqual(data['system']['host-name'], 'r1')
+
+    def test_annotation_with_braces(self):
+        data = parse_text('system {\n    /* { not\n       a block } */\n    host-name r1;\n}\n')
+        self.assertEqual(data, {'system': {'host-name': 'r1'}})
+
+    def test_stray_quote(self):
+        lines = ''.join('    ge-0/0/{} {{\n        mtu 9000;\n    }}\n'.format(i) for i in range(1000))
+        data = parse_text('system {\n    host-name "r1;\n}\ninterfaces {\n' + lines + '}\n')
+        # the broken statement is dropped and the rest is read
+        self.assertEqual(data['system'], {})
+        self.assertEqual(len(data['interfaces']), 1000)
+
+    def test_long_multi_line_string(self):
+        pem = '-----BEGIN CERTIFICATE-----\n' + '\n'.join('A' * 64 for _ in range(300)) + '\n-----END CERTIFICATE-----'
+        text = ('security {\n    certificates {\n        local {\n            c1 "' + pem + '";\n        }\n    }\n}\n'
+                'system {\n    host-name r1;\n}\ninterfaces {\n    lo0 {\n        description "loopback";\n    }\n}\n')
+        self.assertGreater(len(pem), 1 << 14)
+        data = parse_text(text)
+        self.assertEqual(data['security']['certificates']['local']['c1'], pem)
+        self.assertEqual(data['system'], {'host-name': 'r1'})
+        self.assertEqual(data['interfaces'], {'lo0': {'description': 'loopback'}})
+        data = parse_text(text, Projection(exclude=['security']))
+        self.assertEqual(data, {'system': {'host-name': 'r1'}, 'interfaces': {'lo0': {'description': 'loopback'}}})
+
+    def test_stray_quote_at_the_end(self):
+        data = parse_text('system {\n    host-name r1;\n    location "x;\n}\n')
+        self.assertEqual(data, {'system': {'host-name': 'r1'}})
+
+    def test_arrays(self):
+        data = parse_text('policy-options {\n    community c1 members [ 65000:1 "65000:2" ];\n}\n'
+                          'protocols {\n    bgp {\n        export [ a b ];\n    }\n}\n')
+        # arrays after other words stay part of the value
+        self.assertEqual(data['policy-options']['community'], 'c1 members [ 65000:1 65000:2 ]')
+        self.assertEqual(data['protocols']['bgp']['export'], ['a', 'b'])
+
+    def test_comments_and_annotations(self):
+        data = parse_text('# top comment\nsystem {\n    /* the name */\n    host-name r1; # trailing\n'
+                          '    /* multi\n       line */\n    services {\n        ssh;\n    }\n}\n')
+        self.assertEqual(data, {'system': {'host-name': 'r1', 'services': {'ssh': True}}})
+
+    def test_inactive(self):
+        data = parse_text('interfaces {\n    inactive: ge-0/0/1 {\n        disable;\n    }\n'
+                          '    inactive: description "old";\n    protect: mtu 9000;\n}\n')
+        self.assertEqual(data['interfaces'], {'inactive: ge-0/0/1': {'disable': True},
+                                              'inactive: description': 'old',
+                                              'protect: mtu': '9000'})
+
+    def test_bare_quoted(self):
+        self.assertEqual(parse_text('a {\n    "foo";\n}\n'), {'a': {'"foo"': True}})
+        self.assertEqual(parse_text('a {\n    "foo";\n}\n'), parse(iter(['a {', '    "foo";', '}'])))
+        self.assertEqual(parse_text('a {\n    key"x";\n}\n'), {'a': {'key': 'x'}})
+
+    def test_several_statements_on_a_line(self):
+        self.assertEqual(parse_text('a { b; c "d"; } e;\n'), {'a': {'b': True, 'c': 'd'}, 'e': True})
+
+    def test_unterminated(self):
+        self.assertEqual(parse_text('a {\n    b {\n        c;\n'), {'a': {'b': {'c': True}}})
+
+
+class ProjectionTest(unittest.TestCase):
+    def test_none(self):
+        self.assertIsNone(Projection().root)
+        self.assertEqual(parse_text(CONFIG, Projection()), parse_text(CONFIG))
+
+    def test_include(self):
+        projection = Projection(['system/host-name', 'interfaces/ge-0/0/0/unit'])
+        self.assertEqual(parse_text(CONFIG, projection), {
+            'system': {'host-name': 'r1-re0'},
+            'interfaces': {'ge-0/0/0': {'unit 0': {'family inet': {'address': '192.0.2.1/31'}}}},
+        })
+
+    def test_exclude(self):
+        data = parse_text(CONFIG, Projection(exclude=['system/login', 'interfaces/ge-0/0/0/description']))
+        self.assertEqual(data['system'], {'host-name': 'r1-re0', 'domain-name': 'example.net'})
+        self.assertEqual(list(data['interfaces']['ge-0/0/0']), ['unit 0'])
+
+    def test_exclude_inside_include(self):
+        data = parse_text(CONFIG, Projection(['system'], ['system/login']))
+        self.assertEqual(data, {'system': {'host-name': 'r1-re0', 'domain-name': 'example.net'}})
+
+    def test_first_word(self):
+        text = ('policy-options {\n    policy-statement a {\n        then accept;\n    }\n'
+                '    inactive: policy-statement b {\n        then reject;\n    }\n    prefix-list p;\n}\n')
+        data = parse_text(text, Projection(['policy-options/policy-statement']))
+        self.assertEqual(data, {'policy-options': {'policy-statement a': {'then': 'accept'},
+                                                   'inactive: policy-statement b': {'then': 'reject'}}})
+
+    def test_dropped_blocks_with_special_text(self):
+        text = ('system {\n    login {\n        message "a } b";\n        /* { */\n        user x {\n'
+                '            class "{";\n        }\n    }\n    host-name r1;\n}\n')
+        self.assertEqual(parse_text(text, Projection(exclude=['system/login'])), {'system': {'host-name': 'r1'}})
+
+
+class ScanHostnameTest(unittest.TestCase):
+    def test_system(self):
+        self.assertEqual(scan_hostname(CONFIG), 'r1.example.net')
+
+    def test_groups(self):
+        text = ('groups {\n    re0 {\n        system {\n            host-name r2-re0;\n        }\n    }\n}\n'
+                'system {\n    domain-name example.net;\n}\n')
+        self.assertEqual(scan_hostname(text), 'r2.example.net')
+
+    def test_no_system(self):
+        self.assertIsNone(scan_hostname('interfaces {\n    lo0;\n}\n'))
+        self.assertIsNone(scan_hostname('system {\n    services;\n}\n'))
@@ -0,0 +1,118 @@
+# Config sources for jarchive.
+#
+# Every config is read once. The vendor is sniffed from the first block,
+# peeked from buffered streams without consuming it, and the same data is
+# then parsed and hashed for the manifest. Files ending in .gz or .xz are
+# decompressed on the fly and a tarball is streamed member by member
+# without unpacking it to disk.
+import gzip
+import hashlib
+import lzma
+import tarfile
+from collections import namedtuple
+from pathlib import Path
+
+JUNIPER = 'juniper'
+ARISTA = 'arista'
+# How much of the start of a config sniff looks at
+SNIFF_SIZE = 4096
+SNIFF_LINES = 6
+SUFFIXES = ('.conf', '.conf.gz', '.conf.xz')
+OPENERS = {'.gz': gzip.open, '.xz': lzma.open}
+
+# The stat of a tarball member, as far as the manifest needs one
+Stat = namedtuple('Stat', ['st_size', 'st_mtime'])
+# A config read from a tarball, path is the tarball path joined with the
+# member name and digest the sha1 of data
+Member = namedtuple('Member', ['path', 'stat', 'digest', 'data'])
+
+
+def sniff(head):
+    """
+    Returns JUNIPER, ARISTA or None for the config starting with the bytes
+    in head. Arista configs start with ! comments, Junos configs with the
+    version statement or a block.
+    """
+    for line in head.splitlines()[:SNIFF_LINES]:
+        line = line.strip()
+        if line.startswith(b'!'):
+            return ARISTA
+        if line.startswith(b'version ') or line.endswith(b'{'):
+            return JUNIPER
+    return None
+
+
+def decode(data):
+    return str(data, 'utf-8', 'replace')
+
+
+def digest(data):
+    return hashlib.sha1(data).hexdigest()
+
+
+def read_stream(f):
+    """
+    Returns the vendor, text and digest of the config in the buffered
+    binary stream f, which does not have to be seekable.
+    """
+    vendor = sniff(f.peek(SNIFF_SIZE)[:SNIFF_SIZE])
+    data = f.read()
+    return vendor, decode(data), digest(data)
+
+
+def read_file(path):
+    """
+    Returns the vendor, text and digest of the config file at path.
+    """
+    opener = OPENERS.get(path.suffix)
+    if opener:
+        with opener(path) as f:
+            return read_stream(f)
+    with open(path, 'rb') as f:
+        data = f.read()
+    return sniff(data[:SNIFF_SIZE]), decode(data), digest(data)
+
+
+def read(source):
+    """
+    Returns the vendor, text and digest of a config file path or tarball
+    Member. The digest is the sha1 of the config, decompressed.
+    """
+    if isinstance(source, Member):
+        return sniff(source.data[:SNIFF_SIZE]), decode(source.data), source.digest
+    return read_file(source)
+
+
+def load(path, stat):
+    """
+    Returns the config file at path as a Member, decompressed, for when its
+    digest is needed before it is parsed.
+    """
+    opener = OPENERS.get(path.suffix, open)
+    with opener(path, 'rb') as f:
+        data = f.read()
+    return Member(str(path), stat, digest(data), data)
+
+
+def config_files(directory):
+    return sorted(p for p in Path(directory).iterdir() if p.name.endswith(SUFFIXES) and not p.name.startswith('.'))
+
+
+def tar_members(path):
+    """
+    Yields a Member for every config in the tarball at path, in archive
+    order. The tarball and its members may be compressed.
+    """
+    with tarfile.open(path, 'r|*') as tar:
+        for info in tar:
+            name = info.name.rsplit('/', 1)[-1]
+            if not info.isfile() or not name.endswith(SUFFIXES) or name.startswith('.'):
+                continue
+            f = tar.extractfile(info)
+            opener = OPENERS.get(Path(name).suffix)
+            if opener:
+                with opener(f) as member:
+                    data = member.read()
+            else:
+                data = f.read()
+            yield Member('{}/{}'.format(path, info.name), Stat(info.size, info.mtime), digest(data), data)
@@ -0,0 +1,263 @@
+import contextlib
+import hashlib
+import io
+import json
+import os
+import tarfile
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+import jarchive
+
+JUNOS = '''version 20.4R3.8;
+system {{
+    host-name {};
+    domain-name example.net;
+    login {{
+        message "welcome";
+    }}
+}}
+interfaces {{
+    lo0 {{
+        description "loopback";
+    }}
+}}
+'''
+
+
+class JarchiveTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, 'configs')
+        self.out = os.path.join(self.tmp.name, 'json')
+        os.makedirs(self.path)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write_config(self, name, text):
+        with open(os.path.join(self.path, name), 'w') as f:
+            f.write(text)
+
+    def run_main(self, *args):
+        argv = ['jarchive.py', '--path', self.path, '--out-dir', self.out] + list(args)
+        stdout = io.StringIO()
+        with mock.patch('sys.argv', argv), contextlib.redirect_stdout(stdout):
+            jarchive.main()
+        return stdout.getvalue()
+
+    def load(self, host):
+        with open(jarchive.output_file(self.out, host)) as f:
+            return json.load(f)['host']
+
+    def test_parse_file(self):
+        self.write_config('r1.conf', JUNOS.format('r1'))
+        result = jarchive.parse_file(Path(self.path, 'r1.conf'))
+        self.assertEqual(result.name, 'r1.example.net')
+        self.assertIsNone(result.message)
+        host = json.loads(result.text)['host']
+        self.assertEqual(host['jarchive_juniper']['interfaces'], {'lo0': {'description': 'loopback'}})
+
+    def test_parse_arista(self):
+        self.write_config('sw1.conf', '! device: sw1\n!\nhostname sw1\n!\nvlan 10\n   name mgmt\n!\nend\n')
+        self.write_config('sw2.conf', '! device: sw2\n!\nvlan 10\n!\nend\n')
+        result = jarchive.parse_file(Path(self.path, 'sw1.conf'))
+        self.assertEqual(result.name, 'sw1')
+        self.assertEqual(json.loads(result.text)['host']['jarchive_arista'],
+                         {'hostname': 'sw1', 'vlans': {'10': {'name': 'mgmt'}}})
+        result = jarchive.parse_file(Path(self.path, 'sw2.conf'))
+        self.assertEqual((result.text, result.message), (None, 'No hostname found for:'))
+
+    def test_parse_error(self):
+        self.write_config('r1.conf', JUNOS.format('r1'))
+        with mock.patch.object(jarchive.juniper, 'parse_text', side_effect=ValueError('broken')):
+            result = jarchive.parse_file(Path(self.path, 'r1.conf'))
+        self.assertEqual(result.message, 'Could not parse (ValueError: broken):')
+        self.assertIsNone(result.text)
+
+    def test_parse_error_does_not_stop_run(self):
+        self.write_config('r1.conf', JUNOS.format('r1'))
+        self.write_config('r2.conf', JUNOS.format('r2'))
+        parse_text = jarchive.juniper.parse_text
+
+        def parse_or_fail(text, projection=None):
+            if 'host-name r1;' in text:
+                raise IndexError('string index out of range')
+            return parse_text(text, projection)
+
+        with mock.patch.object(jarchive.juniper, 'parse_text', side_effect=parse_or_fail):
+            output = self.run_main()
+        self.assertIn('Could not parse (IndexError: string index out of range):', output)
+        self.assertEqual(self.load('r2.example.net')['name'], 'r2.example.net')
+        self.assertTrue(os.path.isfile(os.path.join(self.out, '.jarchive_manifest')))
+        # the failed config is parsed again once it changes
+        self.write_config('r1.conf', JUNOS.format('r1') + '\n')
+        self.assertIn('Parsed 1, unchanged 1', self.run_main())
+        self.assertEqual(self.load('r1.example.net')['name'], 'r1.example.net')
+
+    def test_only_file_prefilter(self):
+        self.write_config('r1.conf', JUNOS.format('r1'))
+        self.write_config('r2.conf', JUNOS.format('r2'))
+        only = {'r1.example.net'}
+        with mock.patch.object(jarchive.juniper, 'parse_text', wraps=jarchive.juniper.parse_text) as parse_text:
+            excluded = jarchive.parse_file(Path(self.path, 'r2.conf'), only)
+            # only the system stanza is parsed, not the whole config
+            self.assertNotIn(JUNOS.format('r2'), [c.args[0] for c in parse_text.call_args_list])
+            included = jarchive.parse_file(Path(self.path, 'r1.conf'), only)
+            self.assertIn(JUNOS.format('r1'), [c.args[0] for c in parse_text.call_args_list])
+        self.assertEqual((excluded.name, excluded.text, excluded.message), ('r2.example.net', None, None))
+        self.assertEqual(json.loads(included.text)['host']['name'], 'r1.example.net')
+
+    def test_only_file_without_scanned_hostname(self):
+        # configs the scan finds no host name in are parsed and filtered after
+        self.write_config('r1.conf', JUNOS.format('r1'))
+        self.write_config('r2.conf', JUNOS.format('r2'))
+        only = {'r1.example.net'}
+        with mock.patch.object(jarchive.juniper, 'scan_hostname', return_value=None):
+            excluded = jarchive.parse_file(Path(self.path, 'r2.conf'), only)
+            included = jarchive.parse_file(Path(self.path, 'r1.conf'), only)
+        self.assertEqual((excluded.name, excluded.text, excluded.message), ('r2.example.net', None, None))
+        self.assertEqual(json.loads(included.text)['host']['name'], 'r1.example.net')
+
+    def test_only_file_removes_excluded_output(self):
+        self.write_config('r1.conf', JUNOS.format('r1'))
+        self.write_config('r2.conf', JUNOS.format('r2'))
+        self.run_main()
+        only_file = os.path.join(self.tmp.name, 'only')
+        with open(only_file, 'w') as f:
+            f.write('r1.example.net\n')
+        self.assertIn('Parsed 2, unchanged 0', self.run_main('--only-file', only_file))
+        self.assertEqual(sorted(os.listdir(self.out)), ['.jarchive_manifest', 'r1.example.net.json'])
+        self.assertIn('Parsed 0, unchanged 2', self.run_main('--only-file', only_file))
+
+    def test_projection(self):
+        self.write_config('r1.conf', JUNOS.format('r1'))
+        self.run_main()
+        self.assertEqual(self.load('r1.example.net')['jarchive_juniper']['system'],
+                         {'host-name': 'r1', 'domain-name': 'example.net'})
+        # other options start over with all files
+        self.assertIn('Parsed 1, unchanged 0', self.run_main('--include', 'interfaces/lo0', '--exclude', 'system/domain-name'))
+        self.assertEqual(self.load('r1')['jarchive_juniper'], {
+            'system': {'host-name': 'r1'},
+            'interfaces': {'lo0': {'description': 'loopback'}},
+        })
+        # the host name changed with the options
+        self.assertEqual(os.listdir(self.out), ['.jarchive_manifest', 'r1.json'])
+
+    def test_incremental(self):
+        self.write_config('r1.conf', JUNOS.format('r1'))
+        self.write_config('r2.conf', JUNOS.format('r2'))
+        self.assertIn('Parsed 2, unchanged 0, removed 0 files', self.run_main())
+        self.assertIn('Parsed 0, unchanged 2, removed 0 files', self.run_main())
+        # renamed, the host is the same so its output stays
+        os.rename(os.path.join(self.path, 'r1.conf'), os.path.join(self.path, 'r1-new.conf'))
+        self.assertIn('Parsed 1, unchanged 1, removed 1 files', self.run_main())
+        self.assertEqual(self.load('r1.example.net')['name'], 'r1.example.net')
+        # deleted
+        os.remove(os.path.join(self.path, 'r2.conf'))
+        self.assertIn('Parsed 0, unchanged 1, removed 1 files', self.run_main())
+        self.assertFalse(os.path.exists(jarchive.output_file(self.out, 'r2.example.net')))
+        # output removed by someone else is written again
+        os.remove(jarchive.output_file(self.out, 'r1.example.net'))
+        self.assertIn('Parsed 1, unchanged 0, removed 0 files', self.run_main())
+        self.assertTrue(os.path.isfile(jarchive.output_file(self.out, 'r1.example.net')))
+
+    def test_touched_files_are_read_once(self):
+        self.write_config('r1.conf', JUNOS.format('r1'))
+        self.write_config('r2.conf', JUNOS.format('r2'))
+        self.run_main()
+        manifest_path = os.path.join(self.out, '.jarchive_manifest')
+        conf = os.path.join(self.path, 'r1.conf')
+        os.utime(conf, (1, 1))
+        with mock.patch.object(jarchive.sources, 'read_file', wraps=jarchive.sources.read_file) as read_file:
+            self.assertIn('Parsed 0, unchanged 2', self.run_main())
+            # same size, new content: hashed and parsed from one read
+            self.write_config('r1.conf', JUNOS.format('r3'))
+            os.utime(conf, (2, 2))
+            self.assertIn('Parsed 1, unchanged 1', self.run_main())
+        read_file.assert_not_called()
+        self.assertEqual(self.load('r3.example.net')['name'], 'r3.example.net')
+        with open(manifest_path) as f:
+            entry = json.load(f)['files'][conf]
+        self.assertEqual((entry['mtime'], entry['hash'], entry['host']),
+                         (2, hashlib.sha1(JUNOS.format('r3').encode()).hexdigest(), 'r3.example.net'))
+
+    def test_full(self):
+        self.write_config('r1.conf', JUNOS.format('r1'))
+        self.write_config('r2.conf', JUNOS.format('r2'))
+        self.run_main()
+        os.remove(os.path.join(self.path, 'r2.conf'))
+        self.assertIn('Parsed 1, unchanged 0, removed 0 files', self.run_main('--full'))
+        self.assertEqual(sorted(os.listdir(self.out)), ['.jarchive_manifest', 'r1.example.net.json'])
+
+    def test_jobs(self):
+        # enough batches to fill the jobs * 2 batches in flight
+        for i in range(jarchive.BATCH_SIZE * 6 + 3):
+            self.write_config('r{:03}.conf'.format(i), JUNOS.format('r{}'.format(i)))
+        self.write_config('empty.conf', 'foo;\n')
+        out = self.out
+        self.out = os.path.join(self.tmp.name, 'serial')
+        serial = self.run_main('-j', '1')
+        self.out = out
+        output = self.run_main('-j', '2', '--timings', '3')
+
+        # the same messages in the same order, then the timings
+        self.assertTrue(output.startswith(serial))
+        self.assertIn('Parsed {}, unchanged 0'.format(jarchive.BATCH_SIZE * 6 + 4), output)
+        timings = output[len(serial):].splitlines()
+        self.assertEqual(timings[0], 'Slowest configs:')
+        self.assertEqual(len(timings), 4)
+        self.assertTrue(all(line.endswith('.conf') and ' ms  ' in line for line in timings[1:]))
+
+        self.assertEqual(sorted(os.listdir(self.out)), sorted(os.listdir(os.path.join(self.tmp.name, 'serial'))))
+        for name in os.listdir(self.out):
+            with open(os.path.join(self.out, name)) as f, open(os.path.join(self.tmp.name, 'serial', name)) as g:
+                self.assertEqual(json.load(f), json.load(g), name)
+
+    def test_tarball(self):
+        self.write_config('r1.conf', JUNOS.format('r1'))
+        self.write_config('r2.conf', JUNOS.format('r2'))
+        configs, tar_path = self.path, os.path.join(self.tmp.name, 'configs.tar.xz')
+
+        def write_tar():
+            with tarfile.open(tar_path, 'w:xz') as tar:
+                tar.add(configs, 'configs')
+
+        write_tar()
+        self.path = tar_path
+        self.assertIn('Parsed 2, unchanged 0, removed 0 files', self.run_main('-j', '2'))
+        self.assertEqual(self.load('r2.example.net')['name'], 'r2.example.net')
+        # a rewritten tarball with the same content is not parsed again
+        write_tar()
+        self.assertIn('Parsed 0, unchanged 2, removed 0 files', self.run_main())
+
+    def test_remove_output(self):
+        os.makedirs(self.out)
+
+        def write(host, data):
+            with open(jarchive.output_file(self.out, host), 'w') as f:
+                json.dump({'host': dict({'name': host, 'version': 1}, **data)}, f)
+
+        write('only', {'jarchive_juniper': {}})
+        write('shared', {'jarchive_juniper': {}, 'nso_juniper': {'kept': True}})
+        write('other', {'nso_juniper': {'kept': True}})
+        write('empty', {})
+        for host in ['only', 'shared', 'other', 'empty', 'missing']:
+            jarchive.remove_output(self.out, host)
+        self.assertEqual(sorted(os.listdir(self.out)), ['empty.json', 'other.json', 'shared.json'])
+        self.assertEqual(self.load('shared'), {'name': 'shared', 'version': 1, 'nso_juniper': {'kept': True}})
+        self.assertEqual(self.load('other'), {'name': 'other', 'version': 1, 'nso_juniper': {'kept': True}})
+        self.assertEqual(self.load('empty'), {'name': 'empty', 'version': 1})
+
+    def test_deleted_host_keeps_other_producers(self):
+        self.write_config('r1.conf', JUNOS.format('r1'))
+        self.run_main()
+        host = self.load('r1.example.net')
+        host['nso_juniper'] = {'kept': True}
+        with open(jarchive.output_file(self.out, 'r1.example.net'), 'w') as f:
+            json.dump({'host': host}, f)
+        os.remove(os.path.join(self.path, 'r1.conf'))
+        self.run_main()
+        self.assertEqual(self.load('r1.example.net'), {'name': 'r1.example.net', 'version': 1,
+                                                       'nso_juniper': {'kept': True}})
@@ -0,0 +1,74 @@
+import os
+import tempfile
+import unittest
+from manifest import Manifest
+import sources
+
+
+class ManifestTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.manifest_path = os.path.join(self.tmp.name, '.jarchive_manifest')
+        self.conf = os.path.join(self.tmp.name, 'r1.conf')
+        with open(self.conf, 'w') as f:
+            f.write('version 1;\n')
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_unchanged(self):
+        manifest = Manifest(self.manifest_path)
+        self.assertFalse(manifest.unchanged(self.conf, os.stat(self.conf)))
+        self.assertFalse(manifest.moved(self.conf, os.stat(self.conf)))
+        manifest.record(self.conf, os.stat(self.conf), 'r1', 'v1')
+        self.assertTrue(manifest.unchanged(self.conf, os.stat(self.conf)))
+        self.assertFalse(manifest.moved(self.conf, os.stat(self.conf)))
+        # touched, only the hash can tell and the manifest does not read it
+        os.utime(self.conf, (1, 1))
+        self.assertTrue(manifest.moved(self.conf, os.stat(self.conf)))
+        self.assertFalse(manifest.unchanged(self.conf, os.stat(self.conf)))
+        # the hash still matches and the new mtime is kept
+        self.assertTrue(manifest.unchanged(self.conf, os.stat(self.conf), 'v1'))
+        self.assertEqual(manifest.files[self.conf]['mtime'], 1)
+        self.assertFalse(manifest.moved(self.conf, os.stat(self.conf)))
+        with open(self.conf, 'w') as f:
+            f.write('version 2;\n')
+        # same size, another mtime and hash
+        os.utime(self.conf, (2, 2))
+        self.assertFalse(manifest.unchanged(self.conf, os.stat(self.conf), 'v2'))
+        # another size
+        with open(self.conf, 'w') as f:
+            f.write('version 10;\n')
+        self.assertFalse(manifest.moved(self.conf, os.stat(self.conf)))
+
+    def test_digest(self):
+        manifest = Manifest(self.manifest_path)
+        manifest.record('a.tar/r1.conf', sources.Stat(3, 1), 'r1', 'abc')
+        self.assertTrue(manifest.unchanged('a.tar/r1.conf', sources.Stat(3, 2), 'abc'))
+        self.assertFalse(manifest.unchanged('a.tar/r1.conf', sources.Stat(3, 3), 'abd'))
+
+    def test_save_and_options(self):
+        manifest = Manifest(self.manifest_path, {'only': []})
+        manifest.record(self.conf, os.stat(self.conf), 'r1', 'v1')
+        manifest.record('gone.conf', sources.Stat(0, 0), None, 'abc')
+        manifest.save()
+        loaded = Manifest(self.manifest_path, {'only': []})
+        self.assertEqual(loaded.files, manifest.files)
+        self.assertEqual(loaded.host(self.conf), 'r1')
+        self.assertEqual(loaded.hosts(), {'r1'})
+        self.assertEqual(loaded.remove('gone.conf')['host'], None)
+        self.assertIsNone(loaded.host('gone.conf'))
+        # other options start over
+        self.assertEqual(Manifest(self.manifest_path, {'only': ['r1']}).files, {})
+
+    def test_dropped(self):
+        manifest = Manifest(self.manifest_path, {'only': []})
+        manifest.record(self.conf, os.stat(self.conf), 'r1', 'v1')
+        manifest.record('r2.conf', sources.Stat(0, 0), 'r2', 'abc')
+        manifest.record('none.conf', sources.Stat(0, 0), None, 'abc')
+        manifest.save()
+        self.assertEqual(Manifest(self.manifest_path, {'only': []}).dropped, set())
+        self.assertEqual(Manifest(self.manifest_path, {'only': ['r1']}).dropped, {'r1', 'r2'})
+        manifest.clear()
+        self.assertEqual(manifest.dropped, {'r1', 'r2'})
+        self.assertEqual(manifest.files, {})
@@ -0,0 +1,78 @@
+import gzip
+import hashlib
+import io
+import lzma
+import os
+import tarfile
+import tempfile
+import unittest
+from pathlib import Path
+import sources
+
+JUNOS = b'## Last commit: 2024-01-01 by admin\nversion 20.4R3.8;\nsystem {\n    host-name r1;\n}\n'
+EOS = b'! Command: show running-config\n!\nhostname sw1\n'
+
+
+def sha1(data):
+    return hashlib.sha1(data).hexdigest()
+
+
+class SourcesTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = Path(self.tmp.name)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write(self, name, data, opener=open):
+        with opener(self.path / name, 'wb') as f:
+            f.write(data)
+        return self.path / name
+
+    def test_sniff(self):
+        self.assertEqual(sources.sniff(JUNOS), sources.JUNIPER)
+        self.assertEqual(sources.sniff(b'system {\n'), sources.JUNIPER)
+        self.assertEqual(sources.sniff(EOS), sources.ARISTA)
+        self.assertIsNone(sources.sniff(b'hostname sw1\n'))
+        self.assertIsNone(sources.sniff(b''))
+
+    def test_read_file(self):
+        self.assertEqual(sources.read(self.write('r1.conf', JUNOS)), (sources.JUNIPER, JUNOS.decode(), sha1(JUNOS)))
+        self.assertEqual(sources.read(self.write('empty.conf', b'')), (None, '', sha1(b'')))
+
+    def test_read_compressed(self):
+        # the digest is of the decompressed config, like for tarball members
+        self.assertEqual(sources.read(self.write('r1.conf.gz', JUNOS, gzip.open)), (sources.JUNIPER, JUNOS.decode(), sha1(JUNOS)))
+        self.assertEqual(sources.read(self.write('sw1.conf.xz', EOS, lzma.open)), (sources.ARISTA, EOS.decode(), sha1(EOS)))
+
+    def test_load(self):
+        path = self.write('r1.conf.gz', JUNOS, gzip.open)
+        stat = os.stat(path)
+        member = sources.load(path, stat)
+        self.assertEqual(member, sources.Member(str(path), stat, sha1(JUNOS), JUNOS))
+        self.assertEqual(sources.read(member), sources.read(path))
+
+    def test_config_files(self):
+        for name in ['b.conf', 'a.conf.gz', 'c.conf.xz', '.hidden.conf', 'notes.txt']:
+            self.write(name, b'')
+        self.assertEqual([p.name for p in sources.config_files(self.path)], ['a.conf.gz', 'b.conf', 'c.conf.xz'])
+
+    def test_tar_members(self):
+        tar_path = self.path / 'configs.tar.gz'
+        with tarfile.open(tar_path, 'w:gz') as tar:
+            for name, data in [('configs/r1.conf', JUNOS), ('configs/sw1.conf.gz', gzip.compress(EOS)),
+                               ('configs/.r2.conf', JUNOS), ('configs/README', b'')]:
+                info = tarfile.TarInfo(name)
+                info.size = len(data)
+                info.mtime = 1700000000
+                tar.addfile(info, io.BytesIO(data))
+        members = list(sources.tar_members(tar_path))
+        self.assertEqual([m.path for m in members], [os.path.join(str(tar_path), 'configs/r1.conf'),
+                                                     os.path.join(str(tar_path), 'configs/sw1.conf.gz')])
+        self.assertEqual(members[0].stat, sources.Stat(len(JUNOS), 1700000000))
+        self.assertEqual(members[0].digest, sha1(JUNOS))
+        # compressed members are read decompressed
+        self.assertEqual(members[1].data, EOS)
+        self.assertEqual(sources.read(members[0]), (sources.JUNIPER, JUNOS.decode(), sha1(JUNOS)))
+        self.assertEqual(sources.read(members[1]), (sources.ARISTA, EOS.decode(), sha1(EOS)))
@@ -91,6 +91,12 @@ def parse_args():
         '-N',
         action='store_true',
         help='Don\'t write output to disk.')
+    parser.add_argument(
+        '-Q',
+        '--write-queue',
+        type=int,
+        default=0,
+        help='Write output in a background thread, buffering at most this many routers (0 writes synchronously).')
     args = parser.parse_args()
     # Load the configuration file
     if not args.C:
@@ -105,12 +111,17 @@ def parse_args():
     if args.O:
         out_dir = args.O
 
-    return config, not_to_disk, out_dir
+    return config, not_to_disk, out_dir, args.write_queue
 
 
 def main():
-    config, not_to_disk, out_dir = parse_args()
-    jsonWriter = JsonWriter(not_to_disk, out_dir)
+    config, not_to_disk, out_dir, write_queue = parse_args()
+    with JsonWriter(not_to_disk, out_dir, write_queue) as jsonWriter:
+        process_sources(config, jsonWriter)
+    return 0
+
+
+def process_sources(config, jsonWriter):
     # Process local files
     local_sources = config.get('sources', 'local').split()
     for f in local_sources:
@@ -143,7 +154,6 @@ def main():
                 router.hardware = chassis
             # Write JSON
             jsonWriter.write(router)
-    return 0
 
 
 if __name__ == '__main__':
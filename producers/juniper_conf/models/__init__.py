@@ -1 +1 @@
-from .models import Router, Interface, BgpPeering
+from .models import Router, Interface, BgpPeering, Unit
@@ -1,4 +1,6 @@
 class Chassis:
+    __slots__ = ('name', 'serial_number', 'description', 'modules')
+
     def __init__(self):
         self.name = ''
         self.serial_number = ''
@@ -9,12 +11,17 @@ class Chassis:
         return "<Chassis name: {0}, description: {1}, serial_number: {2}, modules: {3}>".format(self.name, self.description, self.serial_number, len(self.modules))
 
     def to_json(self):
-        out = vars(self).copy()
-        out['modules'] = [m.to_json() for m in self.modules]
-        return out
+        return {
+            'name': self.name,
+            'serial_number': self.serial_number,
+            'description': self.description,
+            'modules': [m.to_json() for m in self.modules],
+        }
 
 
 class ChassisModule:
+    __slots__ = ('name', 'version', 'part_number', 'serial_number', 'description', 'model_number', 'clei_code', 'sub_modules')
+
     def __init__(self):
         self.name = ''
         self.version = ''
@@ -29,6 +36,13 @@ class ChassisModule:
         return "<ChassisModule name: {0}, description: {1}, sub_modules: {2}>".format(self.name, self.description, len(self.sub_modules))
 
     def to_json(self):
-        out = vars(self).copy()
-        out['sub_modules'] = [m.to_json() for m in self.sub_modules]
-        return out
+        return {
+            'name': self.name,
+            'version': self.version,
+            'part_number': self.part_number,
+            'serial_number': self.serial_number,
+            'description': self.description,
+            'model_number': self.model_number,
+            'clei_code': self.clei_code,
+            'sub_modules': [m.to_json() for m in self.sub_modules],
+        }
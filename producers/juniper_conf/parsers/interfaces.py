@@ -1,4 +1,4 @@
-from models import Interface
+from models import Interface, Unit
 from .base import ElementParser, get_hostname
 from util import logger
 
@@ -64,10 +64,10 @@ class InterfaceParser:
         interface.unitdict += [self._unit(u) for u in node.all("unit")]
 
     def _unit(self, unit):
-        return {
-            'unit': unit.first("name").text(),
-            'description': unit.first("description").text(),
-            'vlanid': unit.first("vlan-id").text(),
-            'address': [a.first("name").text() for a in unit.all("address")],
-            'inactive': unit.attr('inactive') == 'inactive',
-        }
+        return Unit(
+            unit=unit.first("name").text(),
+            description=unit.first("description").text(),
+            vlanid=unit.first("vlan-id").text(),
+            address=[a.first("name").text() for a in unit.all("address")],
+            inactive=unit.attr('inactive') == 'inactive',
+        )
@@ -0,0 +1,95 @@
+from xml.dom import minidom
+from .writer import iterencode, JsonWriter
+from models import Router, Interface
+from models.chassis import Chassis, ChassisModule
+from parsers import RouterPaser
+import unittest
+import json
+import os
+import tempfile
+
+
+class IterencodeTest(unittest.TestCase):
+    def setUp(self):
+        xml = minidom.parse("parsers/test_show_config.xml")
+        self.router = RouterPaser().parse(xml, None)
+
+    def template(self, router):
+        return {
+            'host': {
+                'name': router.name.lower(),
+                'version': 1,
+                'juniper_conf': router,
+            }
+        }
+
+    def assertSameAsDumps(self, router):
+        expected = self.template(router)
+        expected['host']['juniper_conf'] = router.to_json()
+        out = "".join(iterencode(self.template(router)))
+        self.assertEqual(out, json.dumps(expected, indent=4))
+
+    def test_router(self):
+        self.assertSameAsDumps(self.router)
+
+    def test_router_with_hardware(self):
+        chassis = Chassis()
+        chassis.name = "Chassis"
+        module = ChassisModule()
+        module.name = "FPC 0"
+        module.sub_modules = [ChassisModule()]
+        chassis.modules = [module]
+        self.router.hardware = chassis
+        self.assertSameAsDumps(self.router)
+
+    def test_empty_router(self):
+        self.assertSameAsDumps(Router())
+
+    def test_non_ascii(self):
+        interface = Interface()
+        interface.name = "xe-0/0/0"
+        interface.description = "Länk till \"Köpenhamn\"\n"
+        self.router.interfaces = [interface]
+        self.assertSameAsDumps(self.router)
+
+    def test_scalars(self):
+        for value in [None, True, 1, 1.5, "", "test", [], {}, [[]], {"a": {}}]:
+            self.assertEqual("".join(iterencode(value)), json.dumps(value, indent=4))
+
+
+class BackgroundJsonWriterTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.out_dir = self.tmp.name
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def router(self, name):
+        router = Router()
+        router.name = name
+        return router
+
+    def test_writes_all_on_close(self):
+        with JsonWriter(out_dir=self.out_dir, queue_size=2) as writer:
+            for i in range(10):
+                writer.write(self.router("Router{}".format(i)))
+        self.assertIsNone(writer.thread)
+        self.assertEqual(len(os.listdir(self.out_dir)), 10)
+        with open(os.path.join(self.out_dir, "router3.json")) as f:
+            self.assertEqual(json.load(f)['host']['juniper_conf']['name'], "Router3")
+
+    def test_same_output_as_synchronous(self):
+        sync_dir = os.path.join(self.out_dir, "sync")
+        async_dir = os.path.join(self.out_dir, "async")
+        JsonWriter(out_dir=sync_dir).write(self.router("r1"))
+        with JsonWriter(out_dir=async_dir, queue_size=1) as writer:
+            writer.write(self.router("r1"))
+        with open(os.path.join(sync_dir, "r1.json")) as a, open(os.path.join(async_dir, "r1.json")) as b:
+            self.assertEqual(a.read(), b.read())
+
+    def test_error_is_raised(self):
+        writer = JsonWriter(out_dir=self.out_dir, queue_size=1)
+        writer.write(object())
+        with self.assertRaises(AttributeError):
+            writer.close()
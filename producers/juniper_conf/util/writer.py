@@ -1,33 +1,134 @@
 import json
 import os
+import queue
+import sys
+import threading
+
+INDENT = '    '
+_STOP = object()
+
+
+def iterencode(obj, level=0):
+    """
+        Encodes obj as JSON piece by piece, the output is identical to
+        json.dumps(obj, indent=4).
+
+        Dicts, lists and models with a json_fields method are walked one item
+        at a time, everything else (e.g. a single interface) is encoded in
+        one go, so only one item is ever held as a string.
+    """
+    if hasattr(obj, 'json_fields'):
+        obj = obj.json_fields()
+    if isinstance(obj, dict) and obj:
+        newline = '\n' + INDENT * (level + 1)
+        sep = '{'
+        for key, value in obj.items():
+            yield '{}{}{}: '.format(sep, newline, json.dumps(key))
+            yield from iterencode(value, level + 1)
+            sep = ','
+        yield '\n' + INDENT * level + '}'
+    elif isinstance(obj, (list, tuple)) and obj:
+        newline = '\n' + INDENT * (level + 1)
+        sep = '['
+        for value in obj:
+            yield sep + newline
+            yield from iterencode(value, level + 1)
+            sep = ','
+        yield '\n' + INDENT * level + ']'
+    else:
+        if hasattr(obj, 'to_json'):
+            obj = obj.to_json()
+        out = json.dumps(obj, indent=4)
+        if level:
+            # JSON strings never contain raw newlines, so this only touches
+            # the indentation.
+            out = out.replace('\n', '\n' + INDENT * level)
+        yield out
 
 
 class JsonWriter:
-    def __init__(self, dry_run=False, out_dir="json"):
+    """
+        Writes routers as NERDS JSON files.
+
+        With a queue_size above 0 the encoding and writing is done in a
+        background thread. write() only blocks when queue_size routers are
+        already waiting. Use close() (or the writer as a context manager) to
+        wait for all pending routers to be written. An error in the
+        background thread is raised again by the next write() or close().
+    """
+    def __init__(self, dry_run=False, out_dir="json", queue_size=0):
         self.dry_run = dry_run
         self.out_dir = out_dir
         if not os.path.exists(out_dir):
             os.makedirs(out_dir)
+        self.error = None
+        self.queue = None
+        self.thread = None
+        if queue_size > 0:
+            self.queue = queue.Queue(maxsize=queue_size)
+            self.thread = threading.Thread(target=self._run, name='JsonWriter', daemon=True)
+            self.thread.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
 
     def write(self, router):
+        if self.thread is None:
+            self._write(router)
+        else:
+            self._raise_error()
+            self.queue.put(router)
+
+    def close(self):
+        """
+            Waits for the background thread to write all queued routers.
+        """
+        if self.thread is not None:
+            self.queue.put(_STOP)
+            self.thread.join()
+            self.thread = None
+        self._raise_error()
+
+    def _raise_error(self):
+        if self.error is not None:
+            error, self.error = self.error, None
+            raise error
+
+    def _run(self):
+        while True:
+            router = self.queue.get()
+            if router is _STOP:
+                break
+            if self.error is not None:
+                # Keep draining so write() never blocks forever
+                continue
+            try:
+                self._write(router)
+            except Exception as e:
+                self.error = e
+
+    def _write(self, router):
         template = {
             'host': {
                 'name': router.name.lower(),
                 'version': 1,
-                'juniper_conf': router.to_json()
+                'juniper_conf': router
             }
         }
-        out = json.dumps(template, indent=4)
         if self.dry_run:
-            print(out)
+            sys.stdout.writelines(iterencode(template))
+            sys.stdout.write('\n')
         else:
-            self.write_to_file(out, router.name.lower())
+            self.write_to_file(template, router.name.lower())
 
     def write_to_file(self, out, name):
         path = os.path.join(self.out_dir, name + ".json")
         try:
             with open(path, 'w') as f:
-                f.write(out)
+                f.writelines(iterencode(out))
         except IOError as e:
             # TODO: logging
             print("I/O error: {}".format(e))
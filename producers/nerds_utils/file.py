@@ -35,3 +35,26 @@ def save_to_json(nerds, out_dir, merge=merge_nerds_file, sort_keys=True):
                 json.dump(nerds, f, indent=4, sort_keys=sort_keys)
         else:
             pass
+
+
+def save_json_text(text, host, out_dir, merge=merge_nerds_file, sort_keys=True):
+    """
+    Like save_to_json, for a NERDS document that is already encoded, e.g.
+    by a worker process. The text is written as is unless there is an
+    existing file with host keys the merge has to keep.
+    """
+    if not os.path.exists(out_dir):
+        os.makedirs(out_dir)
+
+    file_name = os.path.join(out_dir, "{}.json".format(host.lower()))
+    if os.path.isfile(file_name):
+        current = load_nerds_file(file_name)
+        if current:
+            nerds = json.loads(text)
+            if merge is not merge_nerds_file or not set(current.get('host', {})) <= set(nerds['host']):
+                nerds = merge(current, nerds)
+                with open(file_name, 'w') as f:
+                    json.dump(nerds, f, indent=4, sort_keys=sort_keys)
+                return
+    with open(file_name, 'w') as f:
+        f.write(text)
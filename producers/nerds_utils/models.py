@@ -0,0 +1,146 @@
+class Unit:
+    """
+        A logical unit on an interface.
+
+        Supports item access with the JSON keys (unit['vlanid'],
+        unit.get('address')) so it can stand in for the dicts that were used
+        before. inactive and logical_system are left out of the JSON when
+        they are None.
+    """
+    __slots__ = ('unit', 'description', 'vlanid', 'address', 'inactive', 'logical_system')
+
+    def __init__(self, unit=None, description=None, vlanid=None, address=None, inactive=None, logical_system=None):
+        self.unit = unit
+        self.description = description
+        self.vlanid = vlanid
+        self.address = address if address is not None else []
+        self.inactive = inactive
+        self.logical_system = logical_system
+
+    def __getitem__(self, key):
+        if key not in self.__slots__:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def get(self, key, default=None):
+        if key not in self.__slots__:
+            return default
+        return getattr(self, key)
+
+    def to_json(self):
+        j = {
+            'unit': self.unit,
+            'description': self.description,
+            'vlanid': self.vlanid,
+            'address': self.address,
+        }
+        if self.inactive is not None:
+            j['inactive'] = self.inactive
+        if self.logical_system:
+            j['logical_system'] = self.logical_system
+        return j
+
+
+class Interface:
+    __slots__ = ('name', 'bundle', 'description', 'vlantagging', 'tunneldict', 'inactive', 'unitdict')
+
+    def __init__(self):
+        self.name = ''
+        self.bundle = ''
+        self.description = ''
+        self.vlantagging = ''
+        # List of {'source': ..., 'destination': ...} dicts
+        self.tunneldict = []
+        self.inactive = False
+        # List of Unit objects
+        self.unitdict = []
+
+    def to_json(self):
+        return {
+            'name': self.name,
+            'bundle': self.bundle,
+            'description': self.description,
+            'vlantagging': self.vlantagging,
+            'tunnels': self.tunneldict,
+            'units': [u.to_json() for u in self.unitdict],
+            'inactive': self.inactive,
+        }
+
+
+class BgpPeering:
+    __slots__ = ('type', 'remote_address', 'description', 'local_address', 'group', 'as_number')
+
+    def __init__(self):
+        self.type = None
+        self.remote_address = None
+        self.description = None
+        self.local_address = None
+        self.group = None
+        self.as_number = None
+
+    def to_json(self):
+        return {
+            'type': self.type,
+            'remote_address': self.remote_address,
+            'description': self.description,
+            'local_address': self.local_address,
+            'group': self.group,
+            'as_number': self.as_number,
+        }
+
+
+class Equipment:
+    __slots__ = ('name', 'version', 'model', 'interfaces')
+
+    def __init__(self):
+        self.name = ''
+        self.version = ''
+        self.model = ''
+        self.interfaces = []
+
+    def json_fields(self):
+        """
+            Returns the top level fields without serializing the children,
+            used for streaming output.
+        """
+        return {
+            'name': self.name,
+            'version': self.version,
+            'model': self.model,
+            'interfaces': self.interfaces,
+        }
+
+    def to_json(self):
+        j = self.json_fields()
+        j['interfaces'] = [i.to_json() for i in self.interfaces]
+        return j
+
+
+class Switch(Equipment):
+    __slots__ = ()
+
+
+class Router(Equipment):
+    """
+        hardware is either a model with to_json (juniper_conf Chassis) or a
+        plain dict (nso).
+    """
+    __slots__ = ('bgp_peerings', 'hardware')
+
+    def __init__(self):
+        super().__init__()
+        self.bgp_peerings = []
+        self.hardware = {}
+
+    def json_fields(self):
+        j = super().json_fields()
+        j['bgp_peerings'] = self.bgp_peerings
+        j['hardware'] = self.hardware
+        return j
+
+    def to_json(self):
+        j = super().to_json()
+        j['bgp_peerings'] = [p.to_json() for p in self.bgp_peerings]
+        if hasattr(self.hardware, 'to_json'):
+            j['hardware'] = self.hardware.to_json()
+        return j
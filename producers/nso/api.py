@@ -1,45 +1,299 @@
 import base64
+import http.client
 import json
-from urllib.request import Request, urlopen
+import queue
+import ssl
+import time
+from urllib.parse import urlsplit
+
+import stream
+from throttle import AdaptiveLimit, RetryPolicy, TokenBucket
+from utils import find
+
+
+class ApiError(Exception):
+    def __init__(self, status, reason, url, retry_after=None):
+        super().__init__('HTTP {} {} for {}'.format(status, reason, url))
+        self.status = status
+        self.reason = reason
+        self.url = url
+        self.retry_after = retry_after
+
+
+class ConnectionPool(object):
+    """
+    Keeps up to size idle keep-alive connections to the NSO host.
+
+    get() hands out an idle connection or opens a new one, so more than size
+    connections can be in use at once, only size of them are kept around.
+    """
+    def __init__(self, url, size=4, timeout=60):
+        parts = urlsplit(url)
+        self.https = parts.scheme == 'https'
+        self.host = parts.hostname
+        self.port = parts.port
+        self.size = size
+        self.timeout = timeout
+        self._idle = queue.LifoQueue(maxsize=size)
+        self._context = ssl.create_default_context() if self.https else None
+
+    def get(self):
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            return self._new()
+
+    def put(self, conn):
+        try:
+            self._idle.put_nowait(conn)
+        except queue.Full:
+            conn.close()
+
+    def close(self):
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                break
+
+    def _new(self):
+        if self.https:
+            return http.client.HTTPSConnection(self.host, self.port, timeout=self.timeout, context=self._context)
+        return http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
 
 
 class Api(object):
-    def __init__(self, url, user, password):
+    # Errors that mean a kept alive connection was closed by the server
+    STALE_ERRORS = (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError)
+
+    def __init__(self, url, user, password, pool_size=4, timeout=60, cache=None, rate=0, retries=3, adaptive=True):
         self.url = url
         self.user = user
         self.password = password
+        self.base_path = urlsplit(url).path.rstrip('/')
+        self.pool = ConnectionPool(url, pool_size, timeout)
+        self.authorization = self.auth()
+        # Optional ResponseCache for conditional GET requests
+        self.cache = cache
+        self.bucket = TokenBucket(rate)
+        self.limit = AdaptiveLimit(pool_size) if adaptive else None
+        self.retry = RetryPolicy(retries)
+        self.retried = 0
 
     def get(self, path, collection=False):
-        url = '{}{}'.format(self.url, path)
         accept = 'application/vnd.yang.data+json'
         if collection:
             accept = 'application/vnd.yang.collection+json'
         headers = {
-            'Authorization': self.auth(),
+            'Authorization': self.authorization,
             'Accept': accept
         }
-        with urlopen(Request(url, headers=headers)) as r:
-            try:
-                result = json.load(r)
-            except json.decoder.JSONDecodeError:
-                # Ignore
-                result = {}
+        if self.cache is None:
+            return self.decode(self.request('GET', path, headers)[1])
+
+        key = '{} {}'.format(accept, path)
+        entry = self.cache.get(key)
+        if entry:
+            if entry['etag']:
+                headers['If-None-Match'] = entry['etag']
+            if entry['last_modified']:
+                headers['If-Modified-Since'] = entry['last_modified']
+        response, content = self.request('GET', path, headers)
+        etag = response.getheader('ETag')
+        # NSO derives the ETag from the transaction id, the same ETag means
+        # the same data even if the server did not answer 304.
+        if entry and (response.status == 304 or (etag and etag == entry['etag'])):
+            self.cache.hit()
+            return entry['body']
+        self.cache.miss()
+        result = self.decode(content)
+        self.cache.put(key, etag, response.getheader('Last-Modified'), result)
         return result
 
     def post(self, path, data=None):
-        url = '{}{}'.format(self.url, path)
         headers = {
-            'Authorization': self.auth(),
+            'Authorization': self.authorization,
             'Accept': 'application/vnd.yang.data+json',
         }
-        with urlopen(Request(url, headers=headers, method='POST'), data=data) as r:
+        return self.decode(self.request('POST', path, headers, data)[1])
+
+    def get_items(self, path, what, collection=False):
+        """
+        Yields the items of the list at the dotted path what in the response
+        to path, decoding them one at a time while the body is read. Only
+        the items are ever materialized, except with a cache: the cache
+        keeps whole responses, so the response is then read with get().
+
+        Broken JSON is ignored like get() does if nothing was yielded yet,
+        after that the error is raised, the items already yielded are only
+        part of the list.
+        """
+        if self.cache is not None:
+            yield from find(what, self.get(path, collection), default=[])
+            return
+        accept = 'application/vnd.yang.data+json'
+        if collection:
+            accept = 'application/vnd.yang.collection+json'
+        headers = {
+            'Authorization': self.authorization,
+            'Accept': accept
+        }
+        conn, response = self._call(lambda timing: self._open_checked('GET', path, headers, timing), self._kind(path))
+        done = False
+        yielded = False
+        try:
+            try:
+                for item in stream.iter_items(response, what):
+                    yielded = True
+                    yield item
+            except ValueError:
+                if yielded:
+                    raise
+            # Drain the rest of the body so the connection can be reused
+            response.read()
+            done = True
+            self._release(conn, response)
+        finally:
+            if not done:
+                conn.close()
+
+    def request(self, method, path, headers, body=None):
+        """
+        Sends a request over a pooled connection and returns the response
+        and its body. Overload answers and connection errors are retried.
+        """
+        return self._call(lambda timing: self._request(method, path, headers, body, timing), self._kind(path))
+
+    def _request(self, method, path, headers, body=None, timing=None):
+        conn, response = self._open(method, path, headers, body, timing)
+        try:
+            content = response.read()
+        except Exception:
+            conn.close()
+            raise
+        self._release(conn, response)
+        if response.status >= 400:
+            raise self._error(response, path)
+        return response, content
+
+    def _open_checked(self, method, path, headers, timing=None):
+        """
+        Like _open, but raises ApiError for error statuses.
+        """
+        conn, response = self._open(method, path, headers, timing=timing)
+        if response.status >= 400:
             try:
-                result = json.load(r)
-            except json.decoder.JSONDecodeError:
-                # Ignore
-                result = {}
+                response.read()
+            except Exception:
+                conn.close()
+                raise
+            self._release(conn, response)
+            raise self._error(response, path)
+        return conn, response
+
+    def _call(self, send, kind=None):
+        """
+        Runs send(timing) within the rate and concurrency limits, retrying
+        it according to the retry policy. For streamed responses the
+        concurrency slot is only held until the headers have arrived.
+
+        send stores the time until the response headers arrived in
+        timing['latency']. That is the latency the concurrency limit goes
+        by, the time to read the body depends on the size of the device.
+        """
+        attempt = 0
+        while True:
+            self.bucket.acquire()
+            if self.limit:
+                sent = self.limit.acquire()
+            timing = {}
+            ok = True
+            try:
+                return send(timing)
+            except Exception as e:
+                retry = self.retry.retryable(e)
+                ok = not retry
+                if not retry or attempt >= self.retry.retries:
+                    raise
+                delay = self.retry.delay(attempt, getattr(e, 'retry_after', None))
+            finally:
+                if self.limit:
+                    self.limit.release(ok, timing.get('latency'), kind, sent)
+            self.retried += 1
+            attempt += 1
+            time.sleep(delay)
+
+    def _kind(self, path):
+        """
+        The path without the device name. Devices differ in size, but the
+        time until the headers arrive is about the same for all requests of
+        a kind.
+        """
+        parts = path.split('/', 4)
+        if len(parts) > 3 and parts[1:3] == ['devices', 'device']:
+            parts[3] = '*'
+        return '/'.join(parts)
+
+    def stats(self):
+        stats = {'retried': self.retried}
+        if self.limit:
+            stats['concurrency'] = int(self.limit.limit)
+            stats['decreases'] = self.limit.decreases
+        return stats
+
+    def _error(self, response, path):
+        retry_after = response.getheader('Retry-After')
+        try:
+            retry_after = float(retry_after) if retry_after else None
+        except ValueError:
+            # HTTP dates are not worth parsing here
+            retry_after = None
+        return ApiError(response.status, response.reason, '{}{}'.format(self.url, path), retry_after)
+
+    def _open(self, method, path, headers, body=None, timing=None):
+        """
+        Sends a request and returns the connection and the response, with
+        the body still unread. A request on a kept alive connection that the
+        server has closed is retried once on a new connection. The time
+        until the headers arrived is stored in timing['latency'].
+        """
+        url = self.base_path + path
+        start = time.monotonic()
+        while True:
+            conn = self.pool.get()
+            reused = conn.sock is not None
+            try:
+                conn.request(method, url, body=body, headers=headers)
+                response = conn.getresponse()
+                if timing is not None:
+                    timing['latency'] = time.monotonic() - start
+                return conn, response
+            except self.STALE_ERRORS:
+                conn.close()
+                if reused:
+                    continue
+                raise
+            except Exception:
+                conn.close()
+                raise
+
+    def _release(self, conn, response):
+        if response.will_close:
+            conn.close()
+        else:
+            self.pool.put(conn)
+
+    def decode(self, content):
+        try:
+            result = json.loads(content)
+        except json.decoder.JSONDecodeError:
+            # Ignore
+            result = {}
         return result
 
+    def close(self):
+        self.pool.close()
+
     def auth(self):
         basic = '{}:{}'.format(self.user, self.password).encode('UTF-8')
         return 'Basic {}'.format(base64.encodebytes(basic).decode('UTF-8')[:-1])
@@ -0,0 +1,104 @@
+# Fleet wide collection queries.
+#
+# Instead of asking NSO for every hierarchy of every device, whole device
+# collections are fetched in pages and each device's slice is reshaped into
+# the responses the per device queries would have returned, so the parsers
+# in parser/ can be used unchanged.
+#
+# Only the wanted devices are fetched: the device names are listed first,
+# which is cheap, and the collection is then read in windows of offsets
+# that hold wanted devices only.
+from utils import find
+
+# Both vendors in one query, a device only has the configuration of its own
+SELECT = ';'.join([
+    'name',
+    'address',
+    # Junos
+    'config/configuration/version',
+    'config/configuration/interfaces(*)',
+    'config/configuration/protocols/bgp(*)',
+    'config/configuration/logical-systems(*)',
+    # Arista
+    'config/boot(*)',
+    'config/interface(*)',
+])
+# Names are small, they are listed in larger pages
+NAMES_PAGE_SIZE = 1000
+
+
+def get_page(api, select, offset, limit):
+    data = api.get('/devices/device?select={}&offset={}&limit={}'.format(select, offset, limit), collection=True)
+    return find('collection.tailf-ncs:device', data, default=[])
+
+
+def iter_pages(api, select, page_size=50):
+    """
+    Yields the device items of /devices/device?select=... one page of
+    page_size devices at a time.
+    """
+    offset = 0
+    while True:
+        items = get_page(api, select, offset, page_size)
+        if items:
+            yield items
+        if len(items) < page_size:
+            break
+        offset += page_size
+
+
+def device_names(api, page_size=NAMES_PAGE_SIZE):
+    """
+    Returns the names of all devices in NSO, in the order NSO lists them.
+    """
+    return [item['name'] for page in iter_pages(api, 'name', page_size) for item in page]
+
+
+def windows(names, wanted, page_size=50):
+    """
+    Returns (offset, limit) of the runs of wanted devices in the list of
+    device names, at most page_size devices long.
+    """
+    runs = []
+    for offset, name in enumerate(names):
+        if name not in wanted:
+            continue
+        if runs and sum(runs[-1]) == offset and runs[-1][1] < page_size:
+            runs[-1][1] += 1
+        else:
+            runs.append([offset, 1])
+    return [tuple(run) for run in runs]
+
+
+def iter_windows(api, select, windows):
+    """
+    Yields the device items of each (offset, limit) window.
+    """
+    for offset, limit in windows:
+        items = get_page(api, select, offset, limit)
+        if items:
+            yield items
+
+
+def device_data(item):
+    """
+    Returns the item in the shape of /devices/device/<name>.
+    """
+    return {'tailf-ncs:device': item}
+
+
+def junos_slices(item):
+    """
+    Returns the interfaces, bgp and logical systems data of a device item in
+    the shape of the per device queries.
+    """
+    conf = find('config.junos:configuration', item, default={})
+    ifdata = {'junos:interfaces': conf.get('interfaces', {})}
+    bgpdata = {'junos:bgp': find('protocols.bgp', conf, default={})}
+    logical_data = {'collection': {'junos:logical-systems': conf.get('logical-systems', [])}}
+    return ifdata, bgpdata, logical_data
+
+
+def arista_slices(item):
+    return {'tailf-ned-arista-dcs:interface': find('config.tailf-ned-arista-dcs:interface', item, default={})}
+
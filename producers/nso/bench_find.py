@@ -0,0 +1,105 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Benchmark of the compiled selectors in utils against the previous
+# recursive find/find_all functions, on a synthetic large interface list.
+import argparse
+import timeit
+
+from utils import compile_path, find, find_all
+
+
+def old_find(what, data, delimiter='.', default=None):
+    paths = what.split(delimiter)
+    elm = data
+    for p in paths:
+        if p not in elm:
+            elm = default
+            break
+        elm = elm[p]
+    return elm
+
+
+def old_find_all(what, data, result=None):
+    if result is None:
+        result = []
+    if isinstance(data, list):
+        for v in data:
+            old_find_all(what, v, result)
+    if isinstance(data, dict):
+        for k, v in data.items():
+            if k == what:
+                result.append(v)
+            else:
+                old_find_all(what, v, result)
+    return result
+
+
+def old_find_first(what, data, default=None):
+    result = old_find_all(what, data)
+    if result:
+        return result[0]
+    else:
+        return default
+
+
+def interfaces(count, units):
+    return {
+        'junos:interfaces': {
+            'interface': [
+                {
+                    'name': 'xe-{}/0/0'.format(i),
+                    'description': 'interface {}'.format(i),
+                    'gigether-options': {'ieee-802.3ad': {'bundle': 'ae{}'.format(i % 10)}} if i % 2 else {},
+                    'unit': [
+                        {
+                            'name': str(u),
+                            'vlan-id': str(u),
+                            'family': {
+                                'inet': {'address': [{'name': '10.{}.{}.1/30'.format(i % 256, u % 256)}]},
+                                'inet6': {'address': [{'name': 'fc00:{:x}:{:x}::1/64'.format(i, u)}]},
+                            },
+                        } for u in range(units)
+                    ],
+                } for i in range(count)
+            ]
+        }
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--interfaces', type=int, default=200)
+    parser.add_argument('--units', type=int, default=20)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    data = interfaces(args.interfaces, args.units)
+    items = find('junos:interfaces.interface', data)
+    bundle = compile_path('**.bundle')
+    addresses = compile_path('**.address.**.name')
+    cases = [
+        ('find path',
+         lambda: [old_find('junos:interfaces.interface', data) for _ in range(1000)],
+         lambda: [find('junos:interfaces.interface', data) for _ in range(1000)]),
+        ('find_first bundle',
+         lambda: [old_find_first('bundle', i) for i in items],
+         lambda: [bundle.first(i) for i in items]),
+        ('unit addresses',
+         lambda: [old_find_all('name', old_find_all('address', u)) for i in items for u in i['unit']],
+         lambda: [addresses.all(u) for i in items for u in i['unit']]),
+        ('find_all compat',
+         lambda: [old_find_all('name', old_find_all('address', u)) for i in items for u in i['unit']],
+         lambda: [find_all('name', find_all('address', u)) for i in items for u in i['unit']]),
+    ]
+    print('{} interfaces with {} units'.format(args.interfaces, args.units))
+    print('{:<20} {:>10} {:>10} {:>8}'.format('case', 'old ms', 'new ms', 'speedup'))
+    for name, old, new in cases:
+        assert old() == new(), name
+        old_t = min(timeit.repeat(old, number=1, repeat=args.repeat)) * 1000
+        new_t = min(timeit.repeat(new, number=1, repeat=args.repeat)) * 1000
+        print('{:<20} {:>10.2f} {:>10.2f} {:>7.2f}x'.format(name, old_t, new_t, old_t / new_t))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,108 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Throughput benchmark of the NSO producer against the local stand-in.
+#
+# Starts standin.py in a separate process (so the server does not compete
+# with the producer for the GIL), runs nso.main once per worker count and
+# reports devices per second together with the requests, connections and
+# 503 rejections the server saw.
+import argparse
+import configparser
+import json
+import logging
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+import nso
+
+
+def start_standin(devices, latency, ratio, capacity):
+    proc = subprocess.Popen(
+        [sys.executable, 'standin.py', '--port', '0', '--devices', str(devices),
+         '--latency', str(latency), '--ratio', str(ratio), '--capacity', str(capacity)],
+        stdout=subprocess.PIPE, universal_newlines=True)
+    url = proc.stdout.readline().strip()
+    if not url:
+        proc.kill()
+        raise RuntimeError('standin.py did not start')
+    return proc, url
+
+
+def server_stats(url):
+    stats_url = url.split('/api/')[0] + '/_standin/stats'
+    with urllib.request.urlopen(stats_url) as r:
+        return json.load(r)
+
+
+def make_config(url, workers, pool_size, batch, page_size):
+    config = configparser.ConfigParser()
+    config['nso'] = {
+        'url': url,
+        'user': 'bench',
+        'password': 'bench',
+        'pool_size': str(pool_size),
+    }
+    config['bench'] = {
+        'device_groups': 'all',
+        'workers': str(workers),
+        'batch': str(batch).lower(),
+        'page_size': str(page_size),
+    }
+    return config
+
+
+def run(url, workers, pool_size, batch, page_size):
+    config = make_config(url, workers, pool_size, batch, page_size)
+    with tempfile.TemporaryDirectory() as out_dir:
+        before = server_stats(url)
+        start = time.perf_counter()
+        nso.main(config, 'bench', out_dir, False)
+        elapsed = time.perf_counter() - start
+        after = server_stats(url)
+    requests = after['requests'] - before['requests'] - 1
+    connections = after['connections'] - before['connections'] - 1
+    return elapsed, requests, connections, after['rejected'] - before['rejected']
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--devices', type=int, default=100, help='Number of synthetic devices.')
+    parser.add_argument('--latency', type=float, default=0.01, help='Delay in seconds per request.')
+    parser.add_argument('--capacity', type=int, default=0, help='Requests in flight the stand-in accepts before answering 503.')
+    parser.add_argument('--ratio', type=int, default=4, help='Every ratio:th device is an Arista switch.')
+    parser.add_argument('--workers', default='1,4,16', help='Comma separated worker counts to run.')
+    parser.add_argument('--pool-size', type=int, default=4, help='Pool size, raised to the worker count.')
+    parser.add_argument('--batch', action='store_true', help='Also run in batch mode.')
+    parser.add_argument('--page-size', type=int, default=50)
+    parser.add_argument('--url', help='Use an already running stand-in instead of starting one.')
+    args = parser.parse_args()
+
+    nso.logger.setLevel(logging.WARNING)
+    proc = None
+    url = args.url
+    if not url:
+        proc, url = start_standin(args.devices, args.latency, args.ratio, args.capacity)
+    try:
+        devices = len(nso.Api(url, '', '').get('/devices/device-group?shallow', collection=True)
+                      ['collection']['tailf-ncs:device-group'][0]['device-name'])
+        print('{} devices, {} s latency per request'.format(devices, args.latency))
+        print('{:<8} {:>7} {:>9} {:>10} {:>9} {:>11} {:>8}'.format(
+            'mode', 'workers', 'seconds', 'devices/s', 'requests', 'connections', 'rejected'))
+        modes = [False, True] if args.batch else [False]
+        for batch in modes:
+            for workers in [int(w) for w in args.workers.split(',')]:
+                elapsed, requests, connections, rejected = run(url, workers, args.pool_size, batch, args.page_size)
+                print('{:<8} {:>7} {:>9.2f} {:>10.1f} {:>9} {:>11} {:>8}'.format(
+                    'batch' if batch else 'device', workers, elapsed, devices / elapsed, requests, connections, rejected))
+    finally:
+        if proc:
+            proc.terminate()
+            proc.wait()
+
+
+if __name__ == '__main__':
+    main()
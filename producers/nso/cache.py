@@ -0,0 +1,64 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+
+
+class ResponseCache(object):
+    """
+    On-disk cache of decoded GET responses keyed by URL and Accept header.
+
+    Every entry keeps the ETag and Last-Modified of the response so the
+    next request can be made conditional. Safe to use from several threads.
+    """
+    def __init__(self, path):
+        self.path = path
+        if not os.path.exists(path):
+            os.makedirs(path)
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def _file(self, key):
+        return os.path.join(self.path, hashlib.sha1(key.encode('utf-8')).hexdigest() + '.json')
+
+    def get(self, key):
+        """
+        Returns the entry {'etag', 'last_modified', 'body'} for key, or None.
+        """
+        try:
+            with open(self._file(key)) as f:
+                entry = json.load(f)
+        except (IOError, ValueError):
+            return None
+        if entry.get('key') != key:
+            return None
+        return entry
+
+    def put(self, key, etag, last_modified, body):
+        if not etag and not last_modified:
+            # Nothing to validate against next time
+            return
+        entry = {'key': key, 'etag': etag, 'last_modified': last_modified, 'body': body}
+        fd, tmp = tempfile.mkstemp(dir=self.path, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w') as f:
+                json.dump(entry, f)
+            os.replace(tmp, self._file(key))
+        except Exception:
+            os.unlink(tmp)
+            raise
+
+    def hit(self):
+        with self._lock:
+            self.hits += 1
+
+    def miss(self):
+        with self._lock:
+            self.misses += 1
+
+    def stats(self):
+        total = self.hits + self.misses
+        ratio = 100.0 * self.hits / total if total else 0.0
+        return '{} hits, {} misses ({:.1f}% hit rate)'.format(self.hits, self.misses, ratio)
@@ -6,7 +6,12 @@ import logging
 import argparse
 import configparser
 import ipaddress
+from concurrent.futures import ThreadPoolExecutor
 from api import Api
+from cache import ResponseCache
+from state import DeviceState, fetch_markers, MAX_AGE
+from plan import Planner, LOGICAL_SYSTEMS_SELECT
+import batch
 from utils import find
 from parser import junos, arista
 import json
@@ -23,41 +28,82 @@ ch.setFormatter(formatter)
 logger.addHandler(ch)
 
 
-def junos_device_to_nerds(device, device_data, api):
+def get_chassis(device, api):
     chassis_data = None
     try:
         chassis_data = api.post('/devices/device/{}/rpc/jrpc:rpc-get-chassis-inventory/_operations/get-chassis-inventory'.format(device))
     except Exception as e:
         logger.warning('Could not get chassis inventory for %s. Error: %s', device, e)
+    return chassis_data
 
-    router = junos.parse_router(device_data, chassis_data)
-    ifdata = api.get('/devices/device/{}/config/configuration/interfaces?deep'.format(device))
-    router.interfaces = junos.parse_interfaces(ifdata)
-
-    bgpdata = api.get('/devices/device/{}/config/configuration/protocols/bgp?deep'.format(device))
-    router.bgp_peerings = junos.parse_bgp_sessions(bgpdata)
-
-    # logical systems
-    logical_ifdata = api.get('/devices/device/{}/config/configuration/logical-systems?select=name;interfaces(*)'.format(device), collection=True)
-    junos.parse_logical_interfaces(logical_ifdata, router.interfaces)
-
-    logical_bgpdata = api.get('/devices/device/{}/config/configuration/logical-systems?select=name;protocols/bgp(*)'.format(device), collection=True)
-    router.bgp_peerings += junos.parse_logical_bgp_sessions(logical_bgpdata)
 
+def junos_to_nerds(device, device_data, chassis_data, interfaces, bgp_peerings):
+    router = junos.parse_router(device_data, chassis_data)
+    router.interfaces = interfaces
+    router.bgp_peerings = bgp_peerings
 
     if device not in router.name:
         logger.warning('%s ==> %s', device, router.name)
     return to_nerds(router.name, 'nso_juniper', router.to_json())
 
 
-def arista_device_to_nerds(device, device_data, api):
+def junos_device_to_nerds(device, device_data, api, planner):
+    plan = planner.plan(device_data)
+    chassis_data = get_chassis(device, api)
+    interfaces = []
+    bgp_peerings = []
+    # The interface and logical systems responses can be very large, they
+    # are parsed one item at a time while they are read
+    if plan.interfaces:
+        interfaces = junos.parse_interface_items(
+            api.get_items('/devices/device/{}/config/configuration/interfaces?deep'.format(device), 'junos:interfaces.interface'))
+    if plan.bgp:
+        bgpdata = api.get('/devices/device/{}/config/configuration/protocols/bgp?deep'.format(device))
+        bgp_peerings = junos.parse_bgp_sessions(bgpdata)
+
+    # logical systems, interfaces and bgp in one query
+    if plan.logical_systems:
+        logical_systems = list(api.get_items(
+            '/devices/device/{}/config/configuration/logical-systems?select={}'.format(device, LOGICAL_SYSTEMS_SELECT),
+            'collection.junos:logical-systems', collection=True))
+        junos.parse_logical_system_interfaces(logical_systems, interfaces)
+        bgp_peerings += junos.parse_logical_system_bgp_sessions(logical_systems)
+    return junos_to_nerds(device, device_data, chassis_data, interfaces, bgp_peerings)
+
+
+def arista_to_nerds(device_data, ifdata):
     switch = arista.parse_switch(device_data)
-    ifdata = api.get('/devices/device/{}/config/interface?deep'.format(device))
     switch.interfaces = arista.parse_interfaces(ifdata)
 
     return to_nerds(switch.name, 'nso_arista', switch.to_json())
 
 
+def arista_device_to_nerds(device, device_data, api):
+    ifdata = api.get('/devices/device/{}/config/interface?deep'.format(device))
+    return arista_to_nerds(device_data, ifdata)
+
+
+def batch_item_to_nerds(item, api):
+    """
+    Builds the NERDS document for a device item of a batch collection page.
+    Only the chassis inventory, which is an RPC, is fetched per device.
+    """
+    device = item['name']
+    logger.info('Processing: %s', device)
+    try:
+        device_data = batch.device_data(item)
+        if junos.is_junos(device_data):
+            ifdata, bgpdata, logical_data = batch.junos_slices(item)
+            interfaces = junos.parse_logical_interfaces(logical_data, junos.parse_interfaces(ifdata))
+            bgp_peerings = junos.parse_bgp_sessions(bgpdata) + junos.parse_logical_bgp_sessions(logical_data)
+            return junos_to_nerds(device, device_data, get_chassis(device, api), interfaces, bgp_peerings)
+        elif arista.is_arista(device_data):
+            return arista_to_nerds(device_data, batch.arista_slices(item))
+    except Exception as e:
+        logger.error('Could not process %s. Error: %s', device, e)
+    return None
+
+
 def is_ipaddr(name):
     result = True
     try:
@@ -74,24 +120,83 @@ def out_nerds(nerds, out_dir, not_to_disk):
         save_to_json(nerds, out_dir, sort_keys=False)
 
 
-def process_devices(api, out_dir, not_to_disk, devices):
-    for device in devices:
+def device_to_nerds(api, device, planner=None):
+    logger.info('Processing: %s', device)
+    planner = planner or Planner()
+    try:
+        device_data = api.get(planner.device_path(device))
         # check if juniper
-        logger.info('Processing: %s', device)
-        device_data = api.get('/devices/device/' + device)
-        out = None
         if junos.is_junos(device_data):
-            out = junos_device_to_nerds(device, device_data, api)
+            return junos_device_to_nerds(device, device_data, api, planner)
         elif arista.is_arista(device_data):
-            out = arista_device_to_nerds(device, device_data, api)
+            return arista_device_to_nerds(device, device_data, api)
+    except Exception as e:
+        logger.error('Could not process %s. Error: %s', device, e)
+    return None
+
+
+def write_result(device, out, out_dir, not_to_disk):
+    """
+    Writes out and returns True, or returns False if there was nothing to
+    write.
+    """
+    if out:
+        if is_ipaddr(out['host']['name']):
+            logger.warning('Skipping - %s device name is an ip address (%s).', device, out['host']['name'])
+            return False
+        out_nerds(out, out_dir, not_to_disk)
+        return True
+    else:
+        print('-', device)
+        return False
+
+
+def process_devices(api, out_dir, not_to_disk, devices, workers=1, state=None, planner=None):
+    """
+    Fetches up to workers devices at the same time. Devices are handled in
+    sorted order and all output is written from the calling thread.
+    Written devices are recorded in state if given.
+    """
+    devices = sorted(devices)
+    planner = planner or Planner()
+    with ThreadPoolExecutor(max_workers=max(workers, 1)) as executor:
+        results = executor.map(lambda device: device_to_nerds(api, device, planner), devices)
+        for device, out in zip(devices, results):
+            if write_result(device, out, out_dir, not_to_disk) and state:
+                state.record(device, out['host']['name'])
 
-        if out:
-            if is_ipaddr(out['host']['name']):
-                logger.warning('Skipping - %s device name is an ip address (%s).', device, out['host']['name'])
-                continue
-            out_nerds(out, out_dir, not_to_disk)
-        else:
-            print('-', device)
+
+def process_batch(api, out_dir, not_to_disk, devices, workers=1, page_size=50, state=None, names=None):
+    """
+    Fetches the wanted devices with paged collection queries that only
+    cover them, see batch.windows. names is the NSO device order if it is
+    already known. Output is written from the calling thread in the order
+    NSO returns the devices.
+    """
+    wanted = set(devices)
+    if not wanted:
+        return
+    if names is None or not wanted <= set(names):
+        names = batch.device_names(api)
+    done = set()
+    with ThreadPoolExecutor(max_workers=max(workers, 1)) as executor:
+        for page in batch.iter_windows(api, batch.SELECT, batch.windows(names, wanted, page_size)):
+            # the device list may have changed since the names were listed
+            items = [i for i in page if i.get('name') in wanted and i['name'] not in done]
+            results = executor.map(lambda item: batch_item_to_nerds(item, api), items)
+            for item, out in zip(items, results):
+                done.add(item['name'])
+                if write_result(item['name'], out, out_dir, not_to_disk) and state:
+                    state.record(item['name'], out['host']['name'])
+        # devices that moved out of their window, or are not in NSO at all,
+        # are fetched with the per device queries
+        missing = sorted(wanted - done)
+        if missing:
+            logger.info('Batch: %d devices not in their window, fetching them one by one', len(missing))
+        results = executor.map(lambda device: device_to_nerds(api, device), missing)
+        for device, out in zip(missing, results):
+            if write_result(device, out, out_dir, not_to_disk) and state:
+                state.record(device, out['host']['name'])
 
 
 def get_devices(section, device_groups):
@@ -104,12 +209,26 @@ def get_devices(section, device_groups):
     return devices
 
 
-def main(config, section, out_dir, not_to_disk):
+def main(config, section, out_dir, not_to_disk, workers=None, batch_mode=None, cache_dir=None, state_file=None):
     base_url = config['nso']['url']
     api_user = config['nso']['user']
     api_password = config['nso']['password']
 
-    api = Api(base_url, api_user, api_password)
+    if workers is None and config.has_section(section):
+        workers = config[section].getint('workers', 1)
+    workers = workers or 1
+    # No point in having fewer connections than workers
+    pool_size = max(config['nso'].getint('pool_size', 4), workers)
+    timeout = config['nso'].getfloat('timeout', 60)
+    rate = config['nso'].getfloat('rate', 0)
+    retries = config['nso'].getint('retries', 3)
+    adaptive = config['nso'].getboolean('adaptive', True)
+
+    cache_dir = cache_dir or config['nso'].get('cache_dir')
+    cache = ResponseCache(cache_dir) if cache_dir else None
+
+    api = Api(base_url, api_user, api_password, pool_size=pool_size, timeout=timeout, cache=cache,
+              rate=rate, retries=retries, adaptive=adaptive)
     device_groups = api.get('/devices/device-group?shallow', collection=True)
     # TODO: device-groups can have other device groups, and no device-names...
     # print(json.dumps(device_groups, indent=4))
@@ -118,9 +237,32 @@ def main(config, section, out_dir, not_to_disk):
     if config.has_section(section):
         devices = get_devices(config[section], device_groups)
         logger.debug('Processing %s: %s', section, devices)
-        process_devices(api, out_dir, not_to_disk, devices)
+        page_size = config[section].getint('page_size', 50)
+        state = None
+        state_file = state_file or config[section].get('state_file')
+        if state_file and not not_to_disk:
+            state = DeviceState(state_file, out_dir, config[section].getfloat('max_age', MAX_AGE) * 3600)
+            state.markers = fetch_markers(api, page_size)
+            devices, unchanged = state.split(devices)
+            logger.info('Incremental: %d unchanged devices skipped, %d to fetch', len(unchanged), len(devices))
+        if batch_mode is None:
+            batch_mode = config[section].getboolean('batch', False)
+        if batch_mode:
+            # the markers hold every device, in the NSO device order
+            names = list(state.markers) if state else None
+            process_batch(api, out_dir, not_to_disk, devices, workers, page_size, state, names)
+        else:
+            planner = Planner(config[section].getboolean('plan', True))
+            process_devices(api, out_dir, not_to_disk, devices, workers, state, planner)
+            logger.info('Query planning: %s', planner.stats())
+        if state:
+            state.save()
     else:
         logger.error('Configuration does not have a %s section', section)
+    api.close()
+    logger.info('API: %s', api.stats())
+    if cache:
+        logger.info('Response cache: %s', cache.stats())
 
 
 if __name__ == '__main__':
@@ -142,6 +284,25 @@ if __name__ == '__main__':
         '--section',
         default='routers',
         help='What configuration section to use')
+    parser.add_argument(
+        '-W',
+        '--workers',
+        type=int,
+        help='Number of devices to fetch in parallel, overrides the workers setting of the section.')
+    parser.add_argument(
+        '-B',
+        '--batch',
+        action='store_true',
+        default=None,
+        help='Fetch the devices with paged collection queries instead of per device queries.')
+    parser.add_argument(
+        '--cache-dir',
+        help='Directory for cached NSO responses, overrides cache_dir in the nso section.')
+    parser.add_argument(
+        '-I',
+        '--incremental',
+        metavar='STATE_FILE',
+        help='Only fetch devices whose NSO transaction id changed since the run that wrote STATE_FILE, overrides state_file of the section.')
 
     args = parser.parse_args()
 
@@ -151,4 +312,4 @@ if __name__ == '__main__':
 
     if args.out:
         out_dir = args.out
-    main(config, args.section, out_dir, args.N)
+    main(config, args.section, out_dir, args.N, args.workers, args.batch, args.cache_dir, args.incremental)
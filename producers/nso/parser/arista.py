@@ -1,5 +1,9 @@
 from models import Switch, Interface
-from utils import find, hostname_clean
+from utils import compile_path, hostname_clean
+
+ETHERNET = compile_path('tailf-ned-arista-dcs:interface.Ethernet')
+BOOT_SYSTEM = compile_path('config.tailf-ned-arista-dcs:boot.system')
+ARISTA_BOOT = compile_path('tailf-ncs:device.config.tailf-ned-arista-dcs:boot')
 
 
 def eos_version(data):
@@ -15,7 +19,7 @@ def parse_interface(data):
 
 
 def parse_interfaces(data):
-    ifaces = find('tailf-ned-arista-dcs:interface.Ethernet', data, default=[])
+    ifaces = ETHERNET.first(data, [])
     return [parse_interface(d) for d in ifaces]
 
 
@@ -24,9 +28,9 @@ def parse_switch(data):
 
     switch = Switch()
     switch.name = hostname_clean(switch_data['address'])
-    switch.version = eos_version(find('config.tailf-ned-arista-dcs:boot.system', switch_data, default=''))
+    switch.version = eos_version(BOOT_SYSTEM.first(switch_data, ''))
     return switch
 
 
 def is_arista(data):
-    return find('tailf-ncs:device.config.tailf-ned-arista-dcs:boot', data) is not None
+    return ARISTA_BOOT.first(data) is not None
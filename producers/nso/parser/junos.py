@@ -1,5 +1,18 @@
-from models import Interface, BgpPeering, Router
-from utils import find, find_first, find_all, hostname_clean
+from models import Interface, BgpPeering, Router, Unit
+from utils import compile_path, hostname_clean
+
+BUNDLE = compile_path('**.bundle')
+UNIT_ADDRESSES = compile_path('**.address.**.name')
+TUNNEL_SOURCE = compile_path('tunnel.source')
+TUNNEL_DESTINATION = compile_path('tunnel.destination')
+INTERFACES = compile_path('junos:interfaces.interface')
+LOGICAL_SYSTEMS = compile_path('collection.junos:logical-systems')
+LS_INTERFACES = compile_path('interfaces.interface')
+BGP_GROUPS = compile_path('junos:bgp.group')
+LS_BGP_GROUPS = compile_path('protocols.bgp.group')
+JUNOS_CONFIGURATION = compile_path('tailf-ncs:device.config.junos:configuration')
+VERSION = compile_path('config.junos:configuration.version')
+CHASSIS = compile_path('junos-rpc:output.chassis-inventory.chassis')
 
 
 def parse_interface(item, logical_system=None):
@@ -8,37 +21,46 @@ def parse_interface(item, logical_system=None):
     iface.description = item.get('description')
     iface.vlantagging = 'vlan-tagging' in item or 'flexible-vlan-tagging' in item
     iface.unitdict = [parse_unit(u, logical_system) for u in item.get('unit', [])]
-    iface.bundle = find_first('bundle', item) or None
+    iface.bundle = BUNDLE.first(item) or None
     iface.tunneldict = [
         {
-            'source': find('tunnel.source', u),
-            'destination': find('tunnel.destination', u)
+            'source': TUNNEL_SOURCE.first(u),
+            'destination': TUNNEL_DESTINATION.first(u)
         } for u in item.get('unit', []) if 'tunnel' in u
     ]
     return iface
 
 
 def parse_unit(item, logical_system=None):
-    unit = {
-        'unit': item['name'],
-        'description': item.get('description'),
-        'vlanid': item.get('vlan-id'),
-        'address': find_all('name', find_all('address', item)),
-    }
-    if logical_system:
-        unit['logical_system'] = logical_system
-    return unit
+    return Unit(
+        unit=item['name'],
+        description=item.get('description'),
+        vlanid=item.get('vlan-id'),
+        address=UNIT_ADDRESSES.all(item),
+        logical_system=logical_system,
+    )
 
 
 def parse_interfaces(data):
-    return [parse_interface(item) for item in find('junos:interfaces.interface', data, default=[])]
+    return parse_interface_items(INTERFACES.first(data, []))
+
+
+def parse_interface_items(items):
+    """
+    Parses an iterable of interface items, e.g. streamed from the API.
+    """
+    return [parse_interface(item) for item in items]
 
 
 def parse_logical_interfaces(data, interfaces):
+    return parse_logical_system_interfaces(LOGICAL_SYSTEMS.first(data, []), interfaces)
+
+
+def parse_logical_system_interfaces(logical_systems, interfaces):
     # make interface map for quick lookups
     if_map = { i.name: i for i in interfaces }
-    for ls in find('collection.junos:logical-systems', data, default=[]):
-        for i in find('interfaces.interface', ls, default=[]):
+    for ls in logical_systems:
+        for i in LS_INTERFACES.first(ls, []):
             iface = parse_interface(i, logical_system=ls['name'])
             if iface.name in if_map:
                 if_map[iface.name].unitdict += iface.unitdict
@@ -67,22 +89,26 @@ def parse_bgp_group(group, peerings):
 def parse_bgp_sessions(data):
     peerings = []
 
-    for group in find('junos:bgp.group', data, default=[]):
+    for group in BGP_GROUPS.first(data, []):
         parse_bgp_group(group, peerings)
     return peerings
 
 
 def parse_logical_bgp_sessions(data):
+    return parse_logical_system_bgp_sessions(LOGICAL_SYSTEMS.first(data, []))
+
+
+def parse_logical_system_bgp_sessions(logical_systems):
     peerings = []
 
-    for ls in find('collection.junos:logical-systems', data, default=[]):
-      for group in find('protocols.bgp.group', ls, default=[]):
+    for ls in logical_systems:
+      for group in LS_BGP_GROUPS.first(ls, []):
         parse_bgp_group(group, peerings)
     return peerings
 
 
 def is_junos(data):
-    return find('tailf-ncs:device.config.junos:configuration', data) is not None
+    return JUNOS_CONFIGURATION.first(data) is not None
 
 
 def parse_chassis(data):
@@ -104,9 +130,9 @@ def parse_router(data, chassis_data=None):
     router = Router()
     name = hostname_clean(router_data['address'])
     router.name = name
-    router.version = find('config.junos:configuration.version', router_data)
+    router.version = VERSION.first(router_data)
     if chassis_data:
-        chassis = find('junos-rpc:output.chassis-inventory.chassis', chassis_data, default={})
+        chassis = CHASSIS.first(chassis_data, {})
         if chassis:
             router.model = chassis['description']
         router.hardware = parse_chassis(chassis)
@@ -0,0 +1,73 @@
+# Per device query planning for Juniper devices.
+#
+# The device query selects the names in the interfaces, bgp and
+# logical-systems hierarchies along with the device data, so the
+# hierarchies a device does not have are not asked for at all. Logical
+# system interfaces and bgp are fetched with one combined query.
+import threading
+
+from utils import find
+
+DEVICE_SELECT = ';'.join([
+    'name',
+    'address',
+    'config/configuration/version',
+    'config/configuration/interfaces/interface/name',
+    'config/configuration/protocols/bgp/group/name',
+    'config/configuration/logical-systems/name',
+    'config/boot(*)',
+])
+LOGICAL_SYSTEMS_SELECT = 'name;interfaces(*);protocols/bgp(*)'
+# Queries per Juniper device without planning: interfaces, bgp, logical
+# systems interfaces and logical systems bgp
+UNPLANNED_QUERIES = 4
+
+
+class QueryPlan(object):
+    __slots__ = ('interfaces', 'bgp', 'logical_systems')
+
+    def __init__(self, interfaces=True, bgp=True, logical_systems=True):
+        self.interfaces = interfaces
+        self.bgp = bgp
+        self.logical_systems = logical_systems
+
+    def queries(self):
+        return int(self.interfaces) + int(self.bgp) + int(self.logical_systems)
+
+
+class Planner(object):
+    """
+    Makes QueryPlans from device data and counts the queries they save,
+    against the UNPLANNED_QUERIES of a device before planning. Disabled,
+    the device is fetched as before and every hierarchy is queried, only
+    the combined logical systems query is saved.
+    """
+    def __init__(self, enabled=True):
+        self.enabled = enabled
+        self.devices = 0
+        self.saved = 0
+        self.lock = threading.Lock()
+
+    def device_path(self, device):
+        path = '/devices/device/{}'.format(device)
+        if self.enabled:
+            path += '?select={}'.format(DEVICE_SELECT)
+        return path
+
+    def plan(self, device_data):
+        if self.enabled:
+            conf = find('tailf-ncs:device.config.junos:configuration', device_data, default={})
+            plan = QueryPlan(
+                interfaces=bool(find('interfaces.interface', conf)),
+                bgp=bool(find('protocols.bgp.group', conf)),
+                logical_systems=bool(conf.get('logical-systems')),
+            )
+        else:
+            plan = QueryPlan()
+        with self.lock:
+            self.devices += 1
+            self.saved += UNPLANNED_QUERIES - plan.queries()
+        return plan
+
+    def stats(self):
+        return {'devices': self.devices, 'saved_queries': self.saved}
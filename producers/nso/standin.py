@@ -0,0 +1,334 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Local stand-in for the NSO REST API, for load testing the producer.
+#
+# Serves a fleet of synthetic devices built from the fixture JSON in
+# fixtures/, with the resources the producer uses:
+#   GET  /devices/device/<name>                    the device, shallow
+#   GET  /devices/device/<name>/<path>[?deep]      a configuration hierarchy
+#   GET  /devices/device/<name>/<path>?select=...  a selected collection
+#   GET  /devices/device?select=...&offset=&limit= paged device collections
+#   GET  /devices/device-group?shallow             one group with every device
+#   POST /devices/device/<name>/rpc/.../get-chassis-inventory
+#   GET  /_standin/stats                           request counters
+# ETags follow the device transaction ids and every request is delayed by
+# the configured latency. With a capacity, requests beyond that many in
+# flight are answered 503 like an overloaded NSO.
+import argparse
+import json
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlsplit
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+BASE_PATH = '/api/running'
+DEVICE_SELECT = 'name;address;config/configuration/version;config/boot(*)'
+DATA = 'application/vnd.yang.data+json'
+COLLECTION = 'application/vnd.yang.collection+json'
+
+
+def load_fixture(vendor, fixtures=FIXTURES):
+    with open(os.path.join(fixtures, '{}.json'.format(vendor))) as f:
+        return json.load(f)
+
+
+def render(template, name, index):
+    """
+    Returns a copy of template with {name} and {index} replaced in all
+    strings.
+    """
+    if isinstance(template, dict):
+        return {k: render(v, name, index) for k, v in template.items()}
+    if isinstance(template, list):
+        return [render(v, name, index) for v in template]
+    if isinstance(template, str):
+        return template.replace('{name}', name).replace('{index}', str(index))
+    return template
+
+
+def local_name(key):
+    return key.split(':')[-1]
+
+
+def child(node, name):
+    """
+    Returns the key and value of the child of node called name, with or
+    without a module prefix.
+    """
+    if isinstance(node, dict):
+        for k, v in node.items():
+            if k == name or local_name(k) == name:
+                return k, v
+    return None, None
+
+
+def project(node, select):
+    """
+    Returns the parts of node named by a NSO select expression like
+    'name;config/configuration/interfaces(*)'. Steps through a list select
+    from each of its entries.
+    """
+    out = {}
+    for path in select.split(';'):
+        if path.endswith('(*)'):
+            path = path[:-3]
+        steps = [s for s in path.split('/') if s]
+        if steps:
+            _project(node, steps, out)
+    return out
+
+
+def _project(node, steps, out):
+    key, value = child(node, steps[0])
+    if key is None:
+        return
+    if len(steps) == 1:
+        out[key] = value
+    elif isinstance(value, list):
+        entries = out.setdefault(key, [{} for v in value])
+        for v, entry in zip(value, entries):
+            _project(v, steps[1:], entry)
+    else:
+        _project(value, steps[1:], out.setdefault(key, {}))
+
+
+class Fleet(object):
+    """
+    Synthetic devices, every ratio:th device is an Arista switch and the
+    rest are Juniper routers. Odd numbered routers have no logical systems.
+    """
+    def __init__(self, count, ratio=4, fixtures=FIXTURES):
+        junos = load_fixture('junos', fixtures)
+        arista = load_fixture('arista', fixtures)
+        self.devices = {}
+        self.chassis = {}
+        self.lock = threading.Lock()
+        self.generation = 0
+        for i in range(count):
+            if ratio and i % ratio == ratio - 1:
+                name = 'switch{}'.format(i)
+                template = arista
+            else:
+                name = 'router{}'.format(i)
+                template = junos
+            device = render(template['device'], name, i % 256)
+            if i % 2 and template is junos:
+                device['config']['junos:configuration'].pop('logical-systems', None)
+            device['state'] = {'last-transaction-id': '0-{}'.format(name)}
+            self.devices[name] = device
+            if 'chassis' in template:
+                self.chassis[name] = render(template['chassis'], name, i % 256)
+        self._names = sorted(self.devices)
+
+    def names(self):
+        return self._names
+
+    def touch(self, name):
+        """
+        Moves the transaction id of a device, like a configuration commit.
+        """
+        with self.lock:
+            self.generation += 1
+            state = self.devices[name]['state']
+            state['last-transaction-id'] = '{}-{}'.format(self.generation, name)
+
+    def etag(self, name=None):
+        if name is None:
+            return '"g{}"'.format(self.generation)
+        return '"{}"'.format(self.devices[name]['state']['last-transaction-id'])
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    # Headers and body are written separately, without TCP_NODELAY every
+    # response would wait for a delayed ACK
+    disable_nagle_algorithm = True
+
+    def setup(self):
+        super().setup()
+        self.server.count('connections')
+
+    def do_GET(self):
+        self.handle_request(self.get)
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        if length:
+            self.rfile.read(length)
+        self.handle_request(self.post)
+
+    def handle_request(self, method):
+        self.server.count('requests')
+        if not self.server.enter():
+            self.server.count('rejected')
+            return self.reply(503)
+        try:
+            self.dispatch(method)
+        finally:
+            self.server.leave()
+
+    def dispatch(self, method):
+        if self.server.latency:
+            time.sleep(self.server.latency)
+        parts = urlsplit(self.path)
+        path = unquote(parts.path)
+        if path == '/_standin/stats':
+            return self.reply(200, dict(self.server.stats), DATA)
+        if not path.startswith(BASE_PATH + '/'):
+            return self.reply(404)
+        steps = [s for s in path[len(BASE_PATH):].split('/') if s]
+        query = parse_qs(parts.query, keep_blank_values=True)
+        try:
+            method(steps, query)
+        except LookupError:
+            self.reply(404)
+
+    def get(self, steps, query):
+        fleet = self.server.fleet
+        if steps == ['devices', 'device-group']:
+            group = {'name': 'all', 'device-name': fleet.names()}
+            return self.reply(200, {'collection': {'tailf-ncs:device-group': [group]}}, COLLECTION, fleet.etag())
+        if steps == ['devices', 'device']:
+            select = query.get('select', ['name'])[0]
+            offset = int(query.get('offset', ['0'])[0])
+            limit = int(query.get('limit', [str(len(fleet.devices))])[0])
+            items = [project(fleet.devices[n], select) for n in fleet.names()[offset:offset + limit]]
+            return self.reply(200, {'collection': {'tailf-ncs:device': items}}, COLLECTION, fleet.etag())
+        if len(steps) < 3 or steps[:2] != ['devices', 'device']:
+            raise KeyError(steps)
+        name = steps[2]
+        device = fleet.devices[name]
+        etag = fleet.etag(name)
+        if len(steps) == 3:
+            select = query.get('select', [DEVICE_SELECT])[0]
+            return self.reply(200, {'tailf-ncs:device': project(device, select)}, DATA, etag)
+        key, node, prefix = None, device, None
+        for step in steps[3:]:
+            key, node = child(node, step)
+            if key is None:
+                # An existing device without the hierarchy, NSO answers
+                # with no content
+                return self.reply(204, etag=etag)
+            if ':' in key:
+                prefix = key.split(':')[0]
+        if ':' not in key and prefix:
+            key = '{}:{}'.format(prefix, key)
+        if 'select' in query:
+            items = [project(i, query['select'][0]) for i in node]
+            return self.reply(200, {'collection': {key: items}}, COLLECTION, etag)
+        return self.reply(200, {key: node}, DATA, etag)
+
+    def post(self, steps, query):
+        fleet = self.server.fleet
+        if len(steps) < 5 or steps[:2] != ['devices', 'device'] or steps[-1] != 'get-chassis-inventory':
+            raise KeyError(steps)
+        chassis = fleet.chassis[steps[2]]
+        self.reply(200, {'junos-rpc:output': {'chassis-inventory': {'chassis': chassis}}}, DATA)
+
+    def reply(self, status, data=None, content_type=DATA, etag=None):
+        if etag and self.headers.get('If-None-Match') == etag:
+            status, data = 304, None
+        body = json.dumps(data).encode('utf-8') if data is not None else b''
+        self.send_response(status)
+        if data is not None:
+            self.send_header('Content-Type', content_type)
+        if etag:
+            self.send_header('ETag', etag)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class StandinServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, fleet, latency=0.0, capacity=0):
+        super().__init__(address, Handler)
+        self.fleet = fleet
+        self.latency = latency
+        self.capacity = capacity
+        self.active = 0
+        self.stats = {'connections': 0, 'requests': 0, 'rejected': 0}
+        self._stats_lock = threading.Lock()
+
+    @property
+    def url(self):
+        return 'http://{}:{}{}'.format(self.server_address[0], self.server_port, BASE_PATH)
+
+    def count(self, what):
+        with self._stats_lock:
+            self.stats[what] += 1
+
+    def enter(self):
+        with self._stats_lock:
+            if self.capacity and self.active >= self.capacity:
+                return False
+            self.active += 1
+            return True
+
+    def leave(self):
+        with self._stats_lock:
+            self.active -= 1
+
+    def start(self):
+        """
+        Serves from a background thread, stop with shutdown().
+        """
+        thread = threading.Thread(target=self.serve_forever, args=(0.05,), daemon=True)
+        thread.start()
+        return thread
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        '-D',
+        '--devices',
+        type=int,
+        default=100,
+        help='Number of synthetic devices.')
+    parser.add_argument(
+        '-L',
+        '--latency',
+        type=float,
+        default=0.0,
+        help='Delay in seconds added to every request.')
+    parser.add_argument(
+        '--capacity',
+        type=int,
+        default=0,
+        help='Answer 503 to requests beyond this many in flight, 0 for no limit.')
+    parser.add_argument(
+        '--ratio',
+        type=int,
+        default=4,
+        help='Every ratio:th device is an Arista switch, 0 for none.')
+    parser.add_argument(
+        '--fixtures',
+        default=FIXTURES,
+        help='Directory with junos.json and arista.json device templates.')
+    parser.add_argument(
+        '--host',
+        default='127.0.0.1')
+    parser.add_argument(
+        '-p',
+        '--port',
+        type=int,
+        default=8080,
+        help='Port to listen on, 0 for any free port.')
+
+    args = parser.parse_args()
+
+    server = StandinServer((args.host, args.port), Fleet(args.devices, args.ratio, args.fixtures), args.latency, args.capacity)
+    print(server.url, flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    server.server_close()
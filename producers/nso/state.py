@@ -0,0 +1,100 @@
+# Incremental runs.
+#
+# NSO keeps a last transaction id per device that moves whenever the device
+# configuration changes. The id seen when a device was last written is kept
+# in a state file, devices whose id has not moved since are skipped and
+# their previous NERDS document is left as is.
+#
+# Operational data, like the chassis inventory, does not move the id: a
+# swapped module or a replaced chassis leaves it as it was. Unchanged
+# devices are therefore fetched again once their document is old enough,
+# somewhere between half of max_age and max_age depending on the device,
+# so the devices written in one run are not all fetched again in the same
+# later run.
+import json
+import os
+import time
+import zlib
+
+import batch
+from utils import find
+
+MARKER_SELECT = 'name;state/last-transaction-id'
+# Default max_age in hours, a week
+MAX_AGE = 7 * 24
+
+
+def fetch_markers(api, page_size=50):
+    """
+    Returns {device name: last transaction id} for all devices in NSO, in
+    the order NSO lists them. Devices without an id, like devices that
+    were never synced, are kept with None so the keys can be used as the
+    device order of batch.windows.
+    """
+    markers = {}
+    for page in batch.iter_pages(api, MARKER_SELECT, page_size):
+        for item in page:
+            markers[item['name']] = find('state.last-transaction-id', item)
+    return markers
+
+
+class DeviceState(object):
+    def __init__(self, path, out_dir, max_age=0, clock=time.time):
+        self.path = path
+        self.out_dir = out_dir
+        # Seconds after which an unchanged device is fetched again, 0 for never
+        self.max_age = max_age
+        self.now = clock()
+        # device -> {'marker': ..., 'host': ..., 'fetched': time of the run}
+        self.devices = {}
+        # Markers of the current run
+        self.markers = {}
+        if os.path.isfile(path):
+            with open(path) as f:
+                try:
+                    self.devices = json.load(f)
+                except ValueError:
+                    self.devices = {}
+
+    def expiry(self, device):
+        """
+        Seconds after which the unchanged device is fetched again, between
+        max_age / 2 and max_age.
+        """
+        spread = zlib.crc32(device.encode('utf-8')) / 0xffffffff
+        return self.max_age * (1 + spread) / 2
+
+    def unchanged(self, device):
+        """
+        True if the device has the same marker as when it was last written,
+        was written less than its expiry ago and its output file is still
+        there.
+        """
+        marker = self.markers.get(device)
+        known = self.devices.get(device)
+        if not marker or not known or known.get('marker') != marker:
+            return False
+        if self.max_age and self.now - known.get('fetched', 0) > self.expiry(device):
+            return False
+        return os.path.isfile(os.path.join(self.out_dir, '{}.json'.format(known['host'].lower())))
+
+    def split(self, devices):
+        """
+        Returns (changed, unchanged) lists of devices.
+        """
+        changed = []
+        unchanged = []
+        for device in devices:
+            (unchanged if self.unchanged(device) else changed).append(device)
+        return changed, unchanged
+
+    def record(self, device, host):
+        marker = self.markers.get(device)
+        if marker:
+            self.devices[device] = {'marker': marker, 'host': host, 'fetched': int(self.now)}
+
+    def save(self):
+        tmp = '{}.tmp'.format(self.path)
+        with open(tmp, 'w') as f:
+            json.dump(self.devices, f, indent=4, sort_keys=True)
+        os.replace(tmp, self.path)
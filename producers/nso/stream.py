@@ -0,0 +1,172 @@
+# Streaming JSON decoding.
+#
+# Large NSO responses (?deep interfaces, logical systems) are scanned
+# incrementally. Only the values at the requested path are decoded, one
+# list item at a time, everything else is skipped without building Python
+# objects.
+import codecs
+import json
+import re
+
+WHITESPACE = re.compile(r'[ \t\n\r]*')
+SPECIAL = re.compile(r'["{}\[\]]')
+STRING = re.compile(r'"(?:[^"\\]|\\.)*"', re.DOTALL)
+# Characters that can continue a number
+NUMBER_CHARS = frozenset('0123456789.eE+-')
+DECODER = json.JSONDecoder()
+
+
+class Reader(object):
+    """
+    Buffered reader over a binary or text file object.
+    """
+    def __init__(self, fp, chunk_size=65536):
+        self.fp = fp
+        self.chunk_size = chunk_size
+        self.buf = ''
+        self.pos = 0
+        self.eof = False
+        self.decoder = codecs.getincrementaldecoder('utf-8')()
+
+    def fill(self, size=None):
+        """
+        Reads the next chunk, drops everything before pos. Returns False at
+        the end of the stream.
+        """
+        if self.eof:
+            return False
+        data = self.fp.read(size or self.chunk_size)
+        if isinstance(data, bytes):
+            text = self.decoder.decode(data, final=not data)
+        else:
+            text = data
+        if not data:
+            self.eof = True
+        self.buf = self.buf[self.pos:] + text
+        self.pos = 0
+        return bool(data)
+
+    def peek(self):
+        """
+        Skips whitespace and returns the next character, '' at the end.
+        """
+        while True:
+            self.pos = WHITESPACE.match(self.buf, self.pos).end()
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self.fill():
+                return ''
+
+    def expect(self, chars):
+        c = self.peek()
+        if c not in chars or not c:
+            raise ValueError('Expected {!r} at offset {}, got {!r}'.format(chars, self.pos, c))
+        self.pos += 1
+        return c
+
+    def string(self):
+        self.expect('"')
+        self.pos -= 1
+        while True:
+            m = STRING.match(self.buf, self.pos)
+            if m:
+                self.pos = m.end()
+                return json.loads(m.group())
+            if not self.fill():
+                raise ValueError('Unterminated string')
+
+    def value(self):
+        """
+        Decodes the next value.
+        """
+        self.peek()
+        size = self.chunk_size
+        while True:
+            try:
+                obj, end = DECODER.raw_decode(self.buf, self.pos)
+                # A number could continue in the next chunk, 1.5 cut after
+                # the . decodes as 1
+                if self.eof or not self.partial_number(obj, end):
+                    self.pos = end
+                    return obj
+            except ValueError:
+                if self.eof:
+                    raise
+            # Grow the reads so a value much larger than a chunk is not
+            # decoded over and over again
+            self.fill(size)
+            size *= 2
+
+    def partial_number(self, obj, end):
+        if not isinstance(obj, (int, float)) or isinstance(obj, bool):
+            return False
+        return end == len(self.buf) or self.buf[end] in NUMBER_CHARS
+
+    def skip(self):
+        """
+        Skips the next value without decoding containers.
+        """
+        if self.peek() not in '{[':
+            self.value()
+            return
+        depth = 0
+        while True:
+            m = SPECIAL.search(self.buf, self.pos)
+            if not m:
+                self.pos = len(self.buf)
+                if not self.fill():
+                    raise ValueError('Unexpected end of JSON')
+                continue
+            c = m.group()
+            if c == '"':
+                self.pos = m.start()
+                self.string()
+                continue
+            self.pos = m.end()
+            depth += 1 if c in '{[' else -1
+            if depth == 0:
+                return
+
+
+def _items(reader, keys):
+    if not keys:
+        if reader.peek() == '[':
+            reader.expect('[')
+            if reader.peek() == ']':
+                reader.expect(']')
+                return
+            while True:
+                yield reader.value()
+                if reader.expect(',]') == ']':
+                    return
+        else:
+            yield reader.value()
+        return
+    if reader.peek() != '{':
+        reader.skip()
+        return
+    reader.expect('{')
+    if reader.peek() == '}':
+        reader.expect('}')
+        return
+    while True:
+        key = reader.string()
+        reader.expect(':')
+        if key == keys[0]:
+            yield from _items(reader, keys[1:])
+        else:
+            reader.skip()
+        if reader.expect(',}') == '}':
+            return
+
+
+def iter_items(fp, what, delimiter='.', chunk_size=65536):
+    """
+    Yields the items of the list at the dotted path what in the JSON
+    document read from fp, or the value itself if it is not a list.
+    Nothing is yielded if the path does not exist or the document is empty.
+    """
+    reader = Reader(fp, chunk_size)
+    if not reader.peek():
+        return
+    yield from _items(reader, what.split(delimiter))
@@ -0,0 +1,152 @@
+import json
+import tempfile
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from api import Api, ApiError
+from cache import ResponseCache
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def setup(self):
+        super().setup()
+        self.server.connections += 1
+
+    def do_GET(self):
+        self.server.requests.append((self.path, dict(self.headers)))
+        if self.path.endswith('/missing'):
+            self.send_response(404)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        if self.path.endswith('/etag') and self.headers.get('If-None-Match') == '"tx-1"':
+            self.send_response(304)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        body = json.dumps({'path': self.path, 'count': len(self.server.requests), 'items': {'item': [{'n': 1}, {'n': 2}]}}).encode()
+        if self.path.endswith('/truncated'):
+            # cut off in the middle of the second item
+            body = body[:body.index(b'{"n": 2}') + 3]
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/vnd.yang.data+json')
+        if self.path.endswith('etag'):
+            self.send_header('ETag', '"tx-1"')
+        self.send_header('Content-Length', str(len(body)))
+        if self.path.endswith('/close'):
+            self.send_header('Connection', 'close')
+            self.close_connection = True
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class ApiTest(unittest.TestCase):
+    def setUp(self):
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.server.connections = 0
+        self.server.requests = []
+        self.thread = threading.Thread(target=self.server.serve_forever, args=(0.05,), daemon=True)
+        self.thread.start()
+        self.api = Api('http://127.0.0.1:{}/api/running'.format(self.server.server_port), 'user', 'secret', pool_size=2, timeout=5)
+
+    def tearDown(self):
+        self.api.close()
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_keep_alive(self):
+        for i in range(5):
+            result = self.api.get('/devices/device/r{}'.format(i))
+            self.assertEqual(result['path'], '/api/running/devices/device/r{}'.format(i))
+        self.assertEqual(self.server.connections, 1)
+        path, headers = self.server.requests[0]
+        self.assertEqual(headers['Authorization'], 'Basic dXNlcjpzZWNyZXQ=')
+        self.assertEqual(headers['Accept'], 'application/vnd.yang.data+json')
+
+    def test_collection_accept(self):
+        self.api.get('/devices/device-group', collection=True)
+        self.assertEqual(self.server.requests[0][1]['Accept'], 'application/vnd.yang.collection+json')
+
+    def test_server_closes_connection(self):
+        self.api.get('/devices/close')
+        self.api.get('/devices/device/r1')
+        self.assertEqual(self.server.connections, 2)
+
+    def test_error(self):
+        with self.assertRaises(ApiError) as cm:
+            self.api.get('/devices/missing')
+        self.assertEqual(cm.exception.status, 404)
+        # The connection is still usable
+        self.api.get('/devices/device/r1')
+        self.assertEqual(self.server.connections, 1)
+
+    def test_get_items(self):
+        self.assertEqual(list(self.api.get_items('/devices/device/r1', 'items.item')), [{'n': 1}, {'n': 2}])
+        self.assertEqual(list(self.api.get_items('/devices/device/r1', 'items.missing')), [])
+        # Stop half way, when streaming the connection is closed instead of reused
+        next(self.api.get_items('/devices/device/r1', 'items.item'))
+        self.api.get('/devices/device/r1')
+        self.assertEqual(self.server.connections, 1 if self.api.cache else 2)
+        with self.assertRaises(ApiError):
+            list(self.api.get_items('/devices/missing', 'items.item'))
+
+    def test_get_items_truncated(self):
+        # Broken JSON is ignored until an item has been yielded
+        self.assertEqual(list(self.api.get_items('/devices/device/r1/truncated', 'items.missing')), [])
+        if self.api.cache:
+            self.assertEqual(list(self.api.get_items('/devices/device/r1/truncated', 'items.item')), [])
+            return
+        items = []
+        with self.assertRaises(ValueError):
+            for item in self.api.get_items('/devices/device/r1/truncated', 'items.item'):
+                items.append(item)
+        self.assertEqual(items, [{'n': 1}])
+
+    def test_stale_connection_is_retried(self):
+        self.api.get('/devices/device/r1')
+        conn = self.api.pool._idle.queue[0]
+        conn.sock.shutdown(2)
+        self.assertEqual(self.api.get('/devices/device/r2')['path'], '/api/running/devices/device/r2')
+
+
+class CachedApiTest(ApiTest):
+    def setUp(self):
+        super().setUp()
+        self.tmp = tempfile.TemporaryDirectory()
+        self.api.cache = ResponseCache(self.tmp.name)
+
+    def tearDown(self):
+        super().tearDown()
+        self.tmp.cleanup()
+
+    def test_not_modified(self):
+        first = self.api.get('/devices/device/r1/etag')
+        # A new cache object, like on the next run
+        self.api.cache = ResponseCache(self.tmp.name)
+        second = self.api.get('/devices/device/r1/etag')
+        self.assertEqual(first, second)
+        self.assertEqual(self.server.requests[1][1]['If-None-Match'], '"tx-1"')
+        self.assertEqual((self.api.cache.hits, self.api.cache.misses), (1, 0))
+
+    def test_same_etag(self):
+        # The server ignores If-None-Match but returns the same ETag
+        first = self.api.get('/devices/device/r1/sameetag')
+        second = self.api.get('/devices/device/r1/sameetag')
+        self.assertEqual(first, second)
+        self.assertEqual((self.api.cache.hits, self.api.cache.misses), (1, 1))
+
+    def test_no_validator(self):
+        self.api.get('/devices/device/r1')
+        self.api.get('/devices/device/r1')
+        self.assertNotIn('If-None-Match', self.server.requests[1][1])
+        self.assertEqual((self.api.cache.hits, self.api.cache.misses), (0, 2))
+
+    def test_collection_key(self):
+        self.api.get('/devices/device/r1/etag')
+        self.api.get('/devices/device/r1/etag', collection=True)
+        self.assertEqual((self.api.cache.hits, self.api.cache.misses), (0, 2))
@@ -0,0 +1,140 @@
+import unittest
+from unittest import mock
+from urllib.parse import urlsplit, parse_qs
+import batch
+import nso
+
+
+def junos_item(name):
+    return {
+        'name': name,
+        'address': 'lo0.{}.nordu.net'.format(name),
+        'config': {
+            'junos:configuration': {
+                'version': '18.1',
+                'interfaces': {'interface': [{'name': 'xe-0/0/0', 'unit': [{'name': '0'}]}]},
+                'protocols': {'bgp': {'group': [{'name': 'g1', 'neighbor': [{'name': '10.0.0.1'}]}]}},
+                'logical-systems': [
+                    {
+                        'name': 'LS1',
+                        'interfaces': {'interface': [{'name': 'xe-0/0/0', 'unit': [{'name': '100'}]}]},
+                        'protocols': {'bgp': {'group': [{'name': 'g2', 'neighbor': [{'name': '10.0.1.1'}]}]}},
+                    }
+                ],
+            }
+        },
+    }
+
+
+def arista_item(name):
+    return {
+        'name': name,
+        'address': '{}.nordu.net'.format(name),
+        'config': {
+            'tailf-ned-arista-dcs:boot': {'system': 'flash:/EOS-4.20.5F.swi'},
+            'tailf-ned-arista-dcs:interface': {'Ethernet': [{'name': '1', 'description': 'uplink'}]},
+        },
+    }
+
+
+class FakeApi(object):
+    def __init__(self, items):
+        self.items = items
+        self.gets = []
+        self.posts = []
+        # names of the devices returned with their configuration
+        self.served = []
+
+    def get(self, path, collection=False):
+        self.gets.append(path)
+        parts = urlsplit(path)
+        query = parse_qs(parts.query)
+        if 'offset' not in query:
+            return self.get_device(parts.path.split('/')[-1])
+        offset = int(query['offset'][0])
+        limit = int(query['limit'][0])
+        items = self.items[offset:offset + limit]
+        if query['select'][0] == 'name':
+            return {'collection': {'tailf-ncs:device': [{'name': i['name']} for i in items]}}
+        self.served.extend(i['name'] for i in items)
+        return {'collection': {'tailf-ncs:device': items}}
+
+    def get_device(self, name):
+        # a per device query, only the device data without any hierarchies
+        for item in self.items:
+            if item['name'] == name:
+                self.served.append(name)
+                conf = {'junos:configuration': {'version': '18.1'}}
+                return batch.device_data({'name': name, 'address': item['address'], 'config': conf})
+        raise Exception('HTTP 404 Not Found')
+
+    def post(self, path, data=None):
+        self.posts.append(path)
+        return {}
+
+
+class BatchTest(unittest.TestCase):
+    def test_iter_pages(self):
+        api = FakeApi([{'name': 'd{}'.format(i)} for i in range(5)])
+        pages = list(batch.iter_pages(api, 'name', page_size=2))
+        self.assertEqual([len(p) for p in pages], [2, 2, 1])
+        self.assertEqual(len(api.gets), 3)
+
+    def test_windows(self):
+        names = ['d{}'.format(i) for i in range(10)]
+        self.assertEqual(batch.windows(names, {'d0', 'd1', 'd2', 'd5', 'd7', 'd8', 'd9'}, page_size=2),
+                         [(0, 2), (2, 1), (5, 1), (7, 2), (9, 1)])
+        self.assertEqual(batch.windows(names, {'d3', 'missing'}), [(3, 1)])
+        self.assertEqual(batch.windows(names, set()), [])
+
+    def test_device_names(self):
+        api = FakeApi([{'name': 'd{}'.format(i)} for i in range(5)])
+        self.assertEqual(batch.device_names(api, page_size=2), ['d0', 'd1', 'd2', 'd3', 'd4'])
+        self.assertEqual(api.served, [])
+
+    def test_junos_slices(self):
+        ifdata, bgpdata, logical_data = batch.junos_slices(junos_item('r1'))
+        self.assertEqual(ifdata['junos:interfaces']['interface'][0]['name'], 'xe-0/0/0')
+        self.assertEqual(bgpdata['junos:bgp']['group'][0]['name'], 'g1')
+        self.assertEqual(logical_data['collection']['junos:logical-systems'][0]['name'], 'LS1')
+
+    def test_process_batch(self):
+        items = [junos_item('r1'), arista_item('s1'), junos_item('r2'), junos_item('r3')]
+        api = FakeApi(items)
+        written = []
+        with mock.patch.object(nso, 'out_nerds', lambda out, *args: written.append(out)):
+            nso.process_batch(api, 'json', False, ['r1', 's1', 'r3', 'missing'], workers=2, page_size=2)
+
+        self.assertEqual([n['host']['name'] for n in written], ['r1.nordu.net', 's1.nordu.net', 'r3.nordu.net'])
+        # the names, then a page with r1 and s1 and one with r3, chassis
+        # RPC per junos device, and the missing device on its own
+        self.assertEqual(len(api.gets), 4)
+        self.assertEqual(len(api.posts), 2)
+        # r2 is not wanted and never fetched
+        self.assertEqual(api.served, ['r1', 's1', 'r3'])
+
+        router = written[0]['host']['nso_juniper']
+        self.assertEqual([u['unit'] for u in router['interfaces'][0]['units']], ['0', '100'])
+        self.assertEqual([p['group'] for p in router['bgp_peerings']], ['g1', 'g2'])
+        switch = written[1]['host']['nso_arista']
+        self.assertEqual(switch['interfaces'][0]['name'], 'et1')
+
+    def test_process_batch_known_names(self):
+        api = FakeApi([junos_item('r{}'.format(i)) for i in range(6)])
+        names = [i['name'] for i in api.items]
+        with mock.patch.object(nso, 'out_nerds', lambda *args: None):
+            nso.process_batch(api, 'json', False, ['r1', 'r2', 'r4'], page_size=50, names=names)
+            self.assertEqual(len(api.gets), 2)
+            self.assertEqual(api.served, ['r1', 'r2', 'r4'])
+            nso.process_batch(api, 'json', False, [], names=None)
+        self.assertEqual(len(api.gets), 2)
+
+    def test_process_batch_moved_devices(self):
+        # b has no transaction id and was left out of the names, so the
+        # window of c points at b
+        api = FakeApi([junos_item('a'), junos_item('b'), junos_item('c')])
+        written = []
+        with mock.patch.object(nso, 'out_nerds', lambda out, *args: written.append(out['host']['name'])):
+            nso.process_batch(api, 'json', False, ['c'], names=['a', 'c'])
+        self.assertEqual(written, ['c.nordu.net'])
+        self.assertEqual(api.served, ['b', 'c'])
@@ -0,0 +1,38 @@
+import unittest
+from models import Unit, Interface
+
+
+class UnitTest(unittest.TestCase):
+    def test_to_json(self):
+        unit = Unit(unit='10', description='test', vlanid='10', address=['10.0.0.1/31'])
+        self.assertEqual(unit.to_json(), {
+            'unit': '10',
+            'description': 'test',
+            'vlanid': '10',
+            'address': ['10.0.0.1/31'],
+        })
+
+    def test_optional_keys(self):
+        unit = Unit(unit='10', inactive=False, logical_system='LS1')
+        j = unit.to_json()
+        self.assertEqual(list(j.keys()), ['unit', 'description', 'vlanid', 'address', 'inactive', 'logical_system'])
+        self.assertFalse(j['inactive'])
+        self.assertEqual(j['logical_system'], 'LS1')
+
+    def test_item_access(self):
+        unit = Unit(unit='10', address=['10.0.0.1/31'])
+        self.assertEqual(unit['unit'], '10')
+        self.assertEqual(unit.get('address'), ['10.0.0.1/31'])
+        self.assertIsNone(unit.get('logical_system'))
+        self.assertEqual(unit.get('nope', 'default'), 'default')
+        with self.assertRaises(KeyError):
+            unit['nope']
+
+    def test_interface_units(self):
+        iface = Interface()
+        iface.unitdict = [Unit(unit='0')]
+        self.assertEqual(iface.to_json()['units'], [{'unit': '0', 'description': None, 'vlanid': None, 'address': []}])
+
+    def test_slots(self):
+        with self.assertRaises(AttributeError):
+            Interface().unknown = 1
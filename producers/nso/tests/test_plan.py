@@ -0,0 +1,55 @@
+import unittest
+from plan import DEVICE_SELECT, Planner, QueryPlan
+
+
+def device(conf):
+    return {'tailf-ncs:device': {'name': 'r1', 'config': {'junos:configuration': conf}}}
+
+
+FULL = {
+    'version': '18.4',
+    'interfaces': {'interface': [{'name': 'xe-0/0/0'}]},
+    'protocols': {'bgp': {'group': [{'name': 'g1'}]}},
+    'logical-systems': [{'name': 'LS1'}],
+}
+
+
+class QueryPlanTest(unittest.TestCase):
+    def test_queries(self):
+        self.assertEqual(QueryPlan().queries(), 3)
+        self.assertEqual(QueryPlan(interfaces=False, logical_systems=False).queries(), 1)
+        self.assertEqual(QueryPlan(False, False, False).queries(), 0)
+
+
+class PlannerTest(unittest.TestCase):
+    def assertPlan(self, plan, interfaces, bgp, logical_systems):
+        self.assertEqual((plan.interfaces, plan.bgp, plan.logical_systems), (interfaces, bgp, logical_systems))
+
+    def test_device_path(self):
+        self.assertEqual(Planner().device_path('r1'), '/devices/device/r1?select={}'.format(DEVICE_SELECT))
+        self.assertEqual(Planner(False).device_path('r1'), '/devices/device/r1')
+
+    def test_full(self):
+        planner = Planner()
+        self.assertPlan(planner.plan(device(FULL)), True, True, True)
+        # logical system interfaces and bgp in one query
+        self.assertEqual(planner.stats(), {'devices': 1, 'saved_queries': 1})
+
+    def test_empty_hierarchies(self):
+        planner = Planner()
+        self.assertPlan(planner.plan(device({'version': '18.4'})), False, False, False)
+        self.assertPlan(planner.plan(device({
+            'interfaces': {'interface': []},
+            'protocols': {'bgp': {}},
+            'logical-systems': [],
+        })), False, False, False)
+        self.assertPlan(planner.plan(device({'interfaces': {}, 'protocols': {'ospf': {}}})), False, False, False)
+        self.assertPlan(planner.plan(device({'protocols': {'bgp': {'group': [{'name': 'g1'}]}}})), False, True, False)
+        self.assertPlan(planner.plan({}), False, False, False)
+        self.assertEqual(planner.stats(), {'devices': 5, 'saved_queries': 4 + 4 + 4 + 3 + 4})
+
+    def test_disabled(self):
+        planner = Planner(False)
+        self.assertPlan(planner.plan(device({'version': '18.4'})), True, True, True)
+        self.assertPlan(planner.plan({}), True, True, True)
+        self.assertEqual(planner.stats(), {'devices': 2, 'saved_queries': 2})
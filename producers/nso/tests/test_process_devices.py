@@ -0,0 +1,68 @@
+import threading
+import time
+import unittest
+from unittest import mock
+import nso
+from utils import find
+
+
+def junos_device(name):
+    return {
+        'tailf-ncs:device': {
+            'name': name,
+            'address': 'lo0.{}.nordu.net'.format(name),
+            'config': {'junos:configuration': {'version': '18.1'}},
+        }
+    }
+
+
+class FakeApi(object):
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.active = 0
+        self.max_active = 0
+        self.lock = threading.Lock()
+
+    def get(self, path, collection=False):
+        with self.lock:
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+        time.sleep(self.delay)
+        with self.lock:
+            self.active -= 1
+        path = path.split('?')[0]
+        if path.startswith('/devices/device/') and path.count('/') == 3:
+            name = path.split('/')[-1]
+            if name == 'broken':
+                raise Exception('boom')
+            return junos_device(name)
+        return {}
+
+    def get_items(self, path, what, collection=False):
+        return find(what, self.get(path, collection), default=[])
+
+    def post(self, path, data=None):
+        return {}
+
+
+class ProcessDevicesTest(unittest.TestCase):
+    def run_devices(self, api, devices, workers):
+        written = []
+        with mock.patch.object(nso, 'out_nerds', lambda out, *args: written.append(out['host']['name'])):
+            nso.process_devices(api, 'json', False, devices, workers)
+        return written
+
+    def test_sorted_output(self):
+        devices = {'r{}'.format(i) for i in range(20)}
+        written = self.run_devices(FakeApi(), devices, 4)
+        self.assertEqual(written, ['{}.nordu.net'.format(d) for d in sorted(devices)])
+
+    def test_parallel(self):
+        api = FakeApi(delay=0.01)
+        self.run_devices(api, {'r{}'.format(i) for i in range(8)}, 4)
+        self.assertGreater(api.max_active, 1)
+        self.assertLessEqual(api.max_active, 4)
+
+    def test_failing_device(self):
+        written = self.run_devices(FakeApi(), {'a', 'broken', 'c'}, 2)
+        self.assertEqual(written, ['a.nordu.net', 'c.nordu.net'])
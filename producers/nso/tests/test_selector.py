@@ -0,0 +1,50 @@
+# -*- coding: utf-8 -*-
+import unittest
+from utils import compile_path, find_first, find_all
+
+
+class SelectorTest(unittest.TestCase):
+    DATA = {
+        'name': 'xe-0/0/0',
+        'gigether-options': {'ieee-802.3ad': {'bundle': 'ae1'}},
+        'unit': [
+            {'name': '0', 'family': {'inet': {'address': [{'name': '10.0.0.1/31'}, {'name': '10.0.0.3/31'}]}}},
+            {'name': '1', 'family': {'inet6': {'address': [{'name': 'fc00::1/64'}]}}},
+        ],
+    }
+
+    def test_child(self):
+        self.assertEqual(compile_path('gigether-options.ieee-802.3ad.bundle', delimiter='/').first(self.DATA), None)
+        self.assertEqual(compile_path('gigether-options/ieee-802.3ad/bundle', delimiter='/').first(self.DATA), 'ae1')
+        self.assertEqual(compile_path('missing.path').first(self.DATA, 'default'), 'default')
+
+    def test_list_items(self):
+        self.assertEqual(compile_path('unit.name').all(self.DATA), ['0', '1'])
+
+    def test_wildcard(self):
+        self.assertEqual(compile_path('unit.family.*.address.name').all(self.DATA), ['10.0.0.1/31', '10.0.0.3/31', 'fc00::1/64'])
+
+    def test_descendant(self):
+        self.assertEqual(compile_path('**.address.**.name').all(self.DATA), ['10.0.0.1/31', '10.0.0.3/31', 'fc00::1/64'])
+        self.assertEqual(compile_path('**.name').all(self.DATA), ['xe-0/0/0', '0', '10.0.0.1/31', '10.0.0.3/31', '1', 'fc00::1/64'])
+        # Matched values are not searched
+        self.assertEqual(compile_path('**.unit').all(self.DATA), [self.DATA['unit']])
+        self.assertEqual(compile_path('**.bundle').first(self.DATA), 'ae1')
+
+    def test_same_as_find_all(self):
+        self.assertEqual(find_all('name', find_all('address', self.DATA)), compile_path('**.address.**.name').all(self.DATA))
+        self.assertEqual(find_first('bundle', self.DATA), 'ae1')
+        self.assertEqual(find_first('missing', self.DATA, 'default'), 'default')
+
+    def test_lazy(self):
+        data = {'a': [{'x': 1}, {'x': 2}]}
+        it = compile_path('**.x').iter(data)
+        self.assertEqual(next(it), 1)
+        self.assertEqual(list(it), [2])
+
+    def test_cached(self):
+        self.assertIs(compile_path('a.b'), compile_path('a.b'))
+
+    def test_invalid(self):
+        with self.assertRaises(ValueError):
+            compile_path('a.**')
@@ -0,0 +1,122 @@
+import configparser
+import json
+import os
+import tempfile
+import unittest
+import nso
+from api import Api
+from standin import Fleet, StandinServer, project
+
+
+class ProjectTest(unittest.TestCase):
+    def test_select(self):
+        data = {
+            'name': 'r1',
+            'config': {'junos:configuration': {'version': '18.4', 'interfaces': {'interface': []}}},
+            'state': {'last-transaction-id': '1'},
+        }
+        self.assertEqual(project(data, 'name;config/configuration/version'),
+                         {'name': 'r1', 'config': {'junos:configuration': {'version': '18.4'}}})
+        self.assertEqual(project(data, 'name;config/boot(*)'), {'name': 'r1', 'config': {}})
+
+
+class StandinTest(unittest.TestCase):
+    def setUp(self):
+        self.server = StandinServer(('127.0.0.1', 0), Fleet(4))
+        self.server.start()
+        self.api = Api(self.server.url, 'user', 'secret', pool_size=2, timeout=5)
+        self.tmp = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.api.close()
+        self.server.shutdown()
+        self.server.server_close()
+        self.tmp.cleanup()
+
+    def run_nso(self, out, plan=True, max_age=24, **kwargs):
+        config = configparser.ConfigParser()
+        config['nso'] = {'url': self.server.url, 'user': 'user', 'password': 'secret'}
+        config['routers'] = {'device_groups': 'all', 'workers': '2', 'page_size': '3', 'plan': str(plan),
+                             'max_age': str(max_age)}
+        nso.main(config, 'routers', os.path.join(self.tmp.name, out), False, **kwargs)
+        return sorted(os.listdir(os.path.join(self.tmp.name, out)))
+
+    def load(self, out, name):
+        with open(os.path.join(self.tmp.name, out, name)) as f:
+            return json.load(f)
+
+    def test_device_resources(self):
+        device = self.api.get('/devices/device/router0')['tailf-ncs:device']
+        self.assertEqual(device['config'], {'junos:configuration': {'version': '18.4R2.7'}})
+        self.assertIn('junos:interfaces', self.api.get('/devices/device/router0/config/configuration/interfaces?deep'))
+        self.assertIn('junos:bgp', self.api.get('/devices/device/router0/config/configuration/protocols/bgp?deep'))
+        self.assertIn('tailf-ned-arista-dcs:interface', self.api.get('/devices/device/switch3/config/interface?deep'))
+        ls = self.api.get('/devices/device/router0/config/configuration/logical-systems?select=name;interfaces(*)', collection=True)
+        self.assertEqual([i['name'] for i in ls['collection']['junos:logical-systems']], ['LS1'])
+        self.assertNotIn('protocols', ls['collection']['junos:logical-systems'][0])
+
+    def test_nso_main(self):
+        names = self.run_nso('devices')
+        self.assertEqual(names, ['router0.example.net.json', 'router1.example.net.json',
+                                 'router2.example.net.json', 'switch3.example.net.json'])
+        host = self.load('devices', 'router0.example.net.json')['host']['nso_juniper']
+        self.assertEqual(host['model'], 'MX480')
+        self.assertEqual(len(host['bgp_peerings']), 4)
+        ae0 = [i for i in host['interfaces'] if i['name'] == 'ae0'][0]
+        self.assertEqual([u['unit'] for u in ae0['units']], ['0', '100', '200'])
+
+        # Batch mode gives the same documents
+        self.assertEqual(self.run_nso('batch', batch_mode=True), names)
+        for name in names:
+            self.assertEqual(self.load('devices', name), self.load('batch', name))
+
+    def test_incremental(self):
+        state_file = os.path.join(self.tmp.name, 'state.json')
+        self.run_nso('devices', state_file=state_file)
+        requests = self.server.stats['requests']
+        self.run_nso('devices', state_file=state_file)
+        # device groups and one page of markers per three devices
+        self.assertEqual(self.server.stats['requests'] - requests, 3)
+
+        self.server.fleet.touch('router1')
+        requests = self.server.stats['requests']
+        self.run_nso('devices', state_file=state_file)
+        # device, chassis, interfaces and bgp, router1 has no logical systems
+        self.assertEqual(self.server.stats['requests'] - requests, 3 + 4)
+
+    def test_incremental_max_age(self):
+        state_file = os.path.join(self.tmp.name, 'state.json')
+        self.run_nso('devices', state_file=state_file)
+        requests = self.server.stats['requests']
+        # a negative age has expired already, every device is fetched again
+        self.run_nso('devices', state_file=state_file, max_age=-1)
+        self.assertGreater(self.server.stats['requests'] - requests, 3 + 4 * 2)
+        requests = self.server.stats['requests']
+        self.run_nso('devices', state_file=state_file)
+        self.assertEqual(self.server.stats['requests'] - requests, 3)
+
+    def test_incremental_batch(self):
+        state_file = os.path.join(self.tmp.name, 'state.json')
+        names = self.run_nso('batch', batch_mode=True, state_file=state_file)
+        self.server.fleet.touch('router2')
+        requests = self.server.stats['requests']
+        self.assertEqual(self.run_nso('batch', batch_mode=True, state_file=state_file), names)
+        # device groups, two pages of markers, then one window with router2
+        # and its chassis, the unchanged devices are not fetched
+        self.assertEqual(self.server.stats['requests'] - requests, 3 + 2)
+
+    def test_planned_queries(self):
+        requests = self.server.stats['requests']
+        self.run_nso('planned')
+        planned = self.server.stats['requests'] - requests
+        requests = self.server.stats['requests']
+        self.run_nso('unplanned', plan=False)
+        unplanned = self.server.stats['requests'] - requests
+        # router1 has no logical systems
+        self.assertEqual(unplanned - planned, 1)
+        for name in self.run_nso('planned'):
+            self.assertEqual(self.load('planned', name), self.load('unplanned', name))
+
+    def test_not_modified(self):
+        response, _ = self.api.request('GET', '/devices/device/router0', {'If-None-Match': '"0-router0"'})
+        self.assertEqual(response.status, 304)
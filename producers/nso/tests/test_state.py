@@ -0,0 +1,127 @@
+import os
+import tempfile
+import unittest
+from state import DeviceState, fetch_markers, MAX_AGE
+
+
+class FakeApi(object):
+    def __init__(self, markers):
+        self.markers = markers
+
+    def get(self, path, collection=False):
+        return {
+            'collection': {
+                'tailf-ncs:device': [
+                    {'name': name, 'state': {'last-transaction-id': marker}} if marker else {'name': name}
+                    for name, marker in self.markers.items()
+                ]
+            }
+        }
+
+
+class DeviceStateTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, 'state.json')
+        self.out_dir = self.tmp.name
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def touch(self, host):
+        with open(os.path.join(self.out_dir, host + '.json'), 'w') as f:
+            f.write('{}')
+
+    def test_fetch_markers(self):
+        markers = fetch_markers(FakeApi({'r1': '1-1', 'r2': None, 'r3': '1-2'}))
+        self.assertEqual(markers, {'r1': '1-1', 'r2': None, 'r3': '1-2'})
+        self.assertEqual(list(markers), ['r1', 'r2', 'r3'])
+
+    def test_no_marker_in_nso(self):
+        state = DeviceState(self.path, self.out_dir)
+        state.markers = fetch_markers(FakeApi({'r1': None}))
+        state.record('r1', 'r1')
+        self.touch('r1')
+        self.assertEqual(state.devices, {})
+        self.assertEqual(state.split(['r1']), (['r1'], []))
+
+    def test_incremental(self):
+        state = DeviceState(self.path, self.out_dir)
+        state.markers = {'r1': '1', 'r2': '5', 'r3': '7'}
+        self.assertEqual(state.split(['r1', 'r2', 'r3']), (['r1', 'r2', 'r3'], []))
+        for device in ['r1', 'r2', 'r3']:
+            state.record(device, device.upper() + '.nordu.net')
+            self.touch(device + '.nordu.net')
+        state.save()
+
+        state = DeviceState(self.path, self.out_dir)
+        state.markers = {'r1': '1', 'r2': '6', 'r3': '7', 'r4': '1'}
+        os.remove(os.path.join(self.out_dir, 'r3.nordu.net.json'))
+        self.assertEqual(state.split(['r1', 'r2', 'r3', 'r4']), (['r2', 'r3', 'r4'], ['r1']))
+
+    def test_no_marker(self):
+        state = DeviceState(self.path, self.out_dir)
+        state.record('r1', 'r1')
+        self.touch('r1')
+        self.assertEqual(state.devices, {})
+        self.assertFalse(state.unchanged('r1'))
+
+    def test_max_age(self):
+        state = DeviceState(self.path, self.out_dir, max_age=3600, clock=lambda: 1000)
+        state.markers = {'r1': '1', 'r2': '1'}
+        state.record('r1', 'r1')
+        self.touch('r1')
+        state.save()
+        self.assertEqual(state.devices['r1']['fetched'], 1000)
+        expiry = state.expiry('r1')
+        self.assertTrue(1800 <= expiry <= 3600)
+
+        state = DeviceState(self.path, self.out_dir, max_age=3600, clock=lambda: 1000 + expiry - 1)
+        state.markers = {'r1': '1'}
+        self.assertTrue(state.unchanged('r1'))
+        # the chassis inventory may have changed without a new marker
+        state = DeviceState(self.path, self.out_dir, max_age=3600, clock=lambda: 1000 + expiry + 1)
+        state.markers = {'r1': '1'}
+        self.assertFalse(state.unchanged('r1'))
+        state = DeviceState(self.path, self.out_dir, max_age=0, clock=lambda: 10 ** 9)
+        state.markers = {'r1': '1'}
+        self.assertTrue(state.unchanged('r1'))
+
+    def test_staggered_expiry(self):
+        state = DeviceState(self.path, self.out_dir, max_age=MAX_AGE * 3600)
+        expiries = [state.expiry('r{}'.format(i)) for i in range(100)]
+        self.assertEqual(expiries, [state.expiry('r{}'.format(i)) for i in range(100)])
+        self.assertTrue(all(MAX_AGE * 1800 <= e <= MAX_AGE * 3600 for e in expiries))
+        # devices written in the same run are not all fetched in the same later run
+        self.assertGreater(len({int(e // 86400) for e in expiries}), 2)
+
+    def test_daily_runs(self):
+        devices = ['r{}'.format(i) for i in range(50)]
+        markers = {device: '1' for device in devices}
+        day = 86400
+        start = 10 ** 9 + 0.7
+        state = DeviceState(self.path, self.out_dir, max_age=MAX_AGE * 3600, clock=lambda: start)
+        state.markers = markers
+        for device in devices:
+            state.record(device, device)
+            self.touch(device)
+        state.save()
+        # a daily cron job starts a little later than the day before
+        state = DeviceState(self.path, self.out_dir, max_age=MAX_AGE * 3600, clock=lambda: start + day + 90)
+        state.markers = dict(markers, r3='2')
+        self.assertEqual(state.split(devices), (['r3'], [d for d in devices if d != 'r3']))
+        state.record('r3', 'r3')
+        state.save()
+        state = DeviceState(self.path, self.out_dir, max_age=MAX_AGE * 3600, clock=lambda: start + 2 * day + 180)
+        state.markers = dict(markers, r3='2')
+        self.assertEqual(state.split(devices), ([], devices))
+
+    def test_max_age_without_fetched(self):
+        # state files written before max_age
+        state = DeviceState(self.path, self.out_dir, max_age=3600)
+        state.markers = {'r1': '1'}
+        state.devices = {'r1': {'marker': '1', 'host': 'r1'}}
+        self.touch('r1')
+        self.assertFalse(state.unchanged('r1'))
+        state.max_age = 0
+        self.assertTrue(state.unchanged('r1'))
@@ -0,0 +1,60 @@
+import io
+import json
+import unittest
+from stream import iter_items
+
+
+def items(doc, what, chunk_size=7):
+    return list(iter_items(io.BytesIO(doc.encode('utf-8')), what, chunk_size=chunk_size))
+
+
+class StreamTest(unittest.TestCase):
+    DATA = {
+        'junos:interfaces': {
+            'other': [{'name': 'skip "me" {['}, 12345, None, True],
+            'interface': [
+                {'name': 'xe-0/0/0', 'description': 'Läsk \\"}]', 'unit': [{'name': '0', 'vlan-id': 100}]},
+                {'name': 'xe-0/0/1', 'mtu': 9192.5},
+            ],
+            'after': {'interface': [{'name': 'wrong'}]},
+        }
+    }
+
+    def test_items(self):
+        doc = json.dumps(self.DATA, indent=2)
+        expected = self.DATA['junos:interfaces']['interface']
+        for chunk_size in [1, 2, 7, 64, 65536]:
+            self.assertEqual(items(doc, 'junos:interfaces.interface', chunk_size), expected)
+
+    def test_compact(self):
+        doc = json.dumps(self.DATA, separators=(',', ':'), ensure_ascii=False)
+        self.assertEqual(items(doc, 'junos:interfaces.interface', 3), self.DATA['junos:interfaces']['interface'])
+
+    def test_numbers(self):
+        doc = '{"a":{"b":1,"c":1.5,"d":-2.5e+10,"e":[10,1E-3,-0.25]}}'
+        for chunk_size in range(1, 8):
+            self.assertEqual(items(doc, 'a', chunk_size), [json.loads(doc)['a']])
+            self.assertEqual(items(doc, 'a.e', chunk_size), [10, 0.001, -0.25])
+        self.assertEqual(items('{"a": 12.5}', 'a', 1), [12.5])
+
+    def test_not_a_list(self):
+        self.assertEqual(items('{"a": {"b": 1234567}}', 'a.b'), [1234567])
+        self.assertEqual(items('{"a": {"b": {"c": 1}}}', 'a.b'), [{'c': 1}])
+
+    def test_missing(self):
+        self.assertEqual(items('{"a": {"c": [1, 2]}}', 'a.b'), [])
+        self.assertEqual(items('{"a": [1, 2]}', 'a.b'), [])
+        self.assertEqual(items('', 'a.b'), [])
+        self.assertEqual(items('{}', 'a.b'), [])
+        self.assertEqual(items('{"a": []}', 'a'), [])
+
+    def test_text_input(self):
+        self.assertEqual(list(iter_items(io.StringIO('{"a": [1, "x"]}'), 'a')), [1, 'x'])
+
+    def test_lazy(self):
+        # Items are produced before the rest of the document is read
+        gen = iter_items(io.BytesIO(b'{"a": [{"x": 1}, {"x": 2}, '), 'a', chunk_size=4)
+        self.assertEqual(next(gen), {'x': 1})
+        self.assertEqual(next(gen), {'x': 2})
+        with self.assertRaises(ValueError):
+            next(gen)
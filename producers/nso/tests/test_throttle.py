@@ -0,0 +1,204 @@
+import json
+import socket
+import threading
+import time
+import unittest
+from unittest import mock
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from api import Api, ApiError
+from throttle import AdaptiveLimit, RetryPolicy, TokenBucket
+
+
+class FakeClock(object):
+    def __init__(self):
+        self.now = 0.0
+        self.slept = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.slept.append(seconds)
+        self.now += seconds
+
+
+class TokenBucketTest(unittest.TestCase):
+    def test_unlimited(self):
+        clock = FakeClock()
+        bucket = TokenBucket(0, clock=clock, sleep=clock.sleep)
+        for i in range(100):
+            bucket.acquire()
+        self.assertEqual(clock.slept, [])
+
+    def test_rate(self):
+        clock = FakeClock()
+        bucket = TokenBucket(10, burst=2, clock=clock, sleep=clock.sleep)
+        for i in range(12):
+            bucket.acquire()
+        # The burst is free, then one request per 0.1 s
+        self.assertEqual(len(clock.slept), 10)
+        self.assertAlmostEqual(clock.now, 1.0)
+
+
+class AdaptiveLimitTest(unittest.TestCase):
+    def test_decrease_once_per_window(self):
+        limit = AdaptiveLimit(8)
+        sent = [limit.acquire() for i in range(8)]
+        for s in sent:
+            limit.release(False, sent=s)
+        self.assertEqual(limit.limit, 4)
+        self.assertEqual(limit.decreases, 1)
+        # Requests sent after the decrease may lower it again
+        for i in range(4):
+            limit.release(False, sent=limit.acquire())
+        self.assertEqual(limit.limit, 1)
+
+    def test_slow_requests(self):
+        limit = AdaptiveLimit(4)
+        for latency in [0.1, 0.1, 0.1, 0.1, 1.0]:
+            limit.release(True, latency, 'a', limit.acquire())
+        self.assertEqual(limit.limit, 2)
+        # Other kinds of requests have their own typical latency
+        limit.release(True, 5.0, 'b', limit.acquire())
+        self.assertEqual(limit.decreases, 1)
+
+    def test_slack(self):
+        limit = AdaptiveLimit(4, slack=0.05)
+        for latency in [0.002, 0.002, 0.01, 0.04]:
+            limit.release(True, latency, 'a', limit.acquire())
+        # five times the typical latency, but only milliseconds more
+        self.assertEqual(limit.decreases, 0)
+        limit.release(True, 0.1, 'a', limit.acquire())
+        self.assertEqual(limit.decreases, 1)
+
+    def test_probe_upward(self):
+        limit = AdaptiveLimit(4)
+        limit.limit = 1.0
+        for i in range(20):
+            limit.acquire()
+            limit.release(True, 0.1)
+        self.assertEqual(limit.limit, 4)
+
+    def test_blocks_at_limit(self):
+        limit = AdaptiveLimit(1)
+        limit.acquire()
+        acquired = threading.Event()
+
+        def other():
+            limit.acquire()
+            acquired.set()
+        thread = threading.Thread(target=other)
+        thread.start()
+        self.assertFalse(acquired.wait(0.05))
+        limit.release()
+        self.assertTrue(acquired.wait(1))
+        thread.join()
+
+
+class RetryPolicyTest(unittest.TestCase):
+    def test_retryable(self):
+        policy = RetryPolicy()
+        self.assertTrue(policy.retryable(ApiError(503, 'Service Unavailable', 'url')))
+        self.assertTrue(policy.retryable(ApiError(429, 'Too Many Requests', 'url')))
+        self.assertFalse(policy.retryable(ApiError(404, 'Not Found', 'url')))
+        self.assertTrue(policy.retryable(socket.timeout('timed out')))
+        self.assertTrue(policy.retryable(ConnectionResetError()))
+        self.assertFalse(policy.retryable(ValueError()))
+
+    def test_delay(self):
+        policy = RetryPolicy(backoff=1, max_backoff=5)
+        for attempt in range(6):
+            delay = policy.delay(attempt)
+            self.assertLessEqual(delay, min(5, 2 ** attempt))
+        self.assertGreaterEqual(policy.delay(0, retry_after=3), 3)
+        self.assertEqual(policy.delay(0, retry_after=60), 5)
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        self.server.requests += 1
+        if self.server.failures:
+            self.server.failures -= 1
+            self.send_response(self.server.status)
+            self.send_header('Retry-After', '0')
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        body = json.dumps({'items': {'item': [1, 2]}}).encode()
+        self.send_response(200)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        if self.server.body_delay:
+            self.wfile.flush()
+            time.sleep(self.server.body_delay)
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class ApiRetryTest(unittest.TestCase):
+    def setUp(self):
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.server.requests = 0
+        self.server.failures = 0
+        self.server.status = 503
+        self.server.body_delay = 0
+        self.thread = threading.Thread(target=self.server.serve_forever, args=(0.05,), daemon=True)
+        self.thread.start()
+        self.api = Api('http://127.0.0.1:{}/api/running'.format(self.server.server_port), 'user', 'secret', pool_size=4, timeout=5)
+        self.api.retry.backoff = 0
+
+    def tearDown(self):
+        self.api.close()
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_retry_overload(self):
+        self.server.failures = 2
+        self.assertEqual(self.api.get('/devices/device/r1'), {'items': {'item': [1, 2]}})
+        self.assertEqual(self.server.requests, 3)
+        self.assertEqual(self.api.stats()['retried'], 2)
+        self.assertEqual(self.api.stats()['concurrency'], 2)
+
+    def test_retry_streamed(self):
+        self.server.failures = 1
+        self.assertEqual(list(self.api.get_items('/devices/device/r1', 'items.item')), [1, 2])
+        self.assertEqual(self.server.requests, 2)
+
+    def test_latency_to_headers(self):
+        # a large body that is slow to read is not a slow request
+        self.server.body_delay = 0.2
+        self.api.get('/devices/device/r1')
+        list(self.api.get_items('/devices/device/r2', 'items.item'))
+        self.assertLess(self.api.limit.latency['/devices/device/*'], 0.1)
+
+    def test_give_up(self):
+        self.server.failures = 10
+        with self.assertRaises(ApiError) as cm:
+            self.api.get('/devices/device/r1')
+        self.assertEqual(cm.exception.status, 503)
+        self.assertEqual(self.server.requests, 4)
+
+    def test_no_retry_on_client_error(self):
+        self.server.failures = 1
+        self.server.status = 404
+        with self.assertRaises(ApiError):
+            self.api.get('/devices/device/r1')
+        self.assertEqual(self.server.requests, 1)
+        self.assertEqual(self.api.stats()['decreases'], 0)
+
+    def test_retry_timeout(self):
+        real_open = self.api._open
+        calls = []
+
+        def flaky_open(*args, **kwargs):
+            calls.append(args)
+            if len(calls) == 1:
+                raise socket.timeout('timed out')
+            return real_open(*args, **kwargs)
+        with mock.patch.object(self.api, '_open', flaky_open):
+            self.assertEqual(self.api.get('/devices/device/r1'), {'items': {'item': [1, 2]}})
+        self.assertEqual(len(calls), 2)
@@ -0,0 +1,126 @@
+# Client side flow control for the NSO API.
+#
+# A token bucket caps the request rate, an AIMD limit adapts the number of
+# requests in flight to how NSO is coping and a retry policy retries
+# overload answers and timeouts with jittered exponential backoff.
+import http.client
+import random
+import threading
+import time
+
+# Statuses NSO, or a proxy in front of it, answers when overloaded
+RETRY_STATUSES = (429, 502, 503, 504)
+# Timeouts and connection errors are OSErrors
+RETRY_ERRORS = (OSError, http.client.HTTPException)
+
+
+class TokenBucket(object):
+    """
+    Allows rate requests per second on average with bursts of up to burst
+    requests. A rate of 0 means no limit.
+    """
+    def __init__(self, rate=0, burst=None, clock=time.monotonic, sleep=time.sleep):
+        self.rate = rate
+        self.burst = burst or max(rate, 1)
+        self.tokens = self.burst
+        self.clock = clock
+        self.sleep = sleep
+        self.stamp = clock()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        if not self.rate:
+            return
+        with self.lock:
+            now = self.clock()
+            self.tokens = min(self.burst, self.tokens + (now - self.stamp) * self.rate)
+            self.stamp = now
+            # Take the token now and wait for it outside the lock, later
+            # callers queue up behind the debt
+            self.tokens -= 1
+            wait = -self.tokens / self.rate if self.tokens < 0 else 0
+        if wait:
+            self.sleep(wait)
+
+
+class AdaptiveLimit(object):
+    """
+    Limits the number of requests in flight with additive increase and
+    multiplicative decrease.
+
+    A request that fails with an overload error, or takes more than
+    tolerance times the typical latency of its kind of request, and at
+    least slack seconds more, halves the limit. The slack keeps jitter on
+    requests of a few milliseconds from counting as slow. Only requests
+    sent after the last decrease can lower it again, so a burst of
+    failures from the same window counts once. Every healthy request adds
+    1/limit, probing upward by one per round of requests.
+    """
+    def __init__(self, maximum, minimum=1, tolerance=2.0, slack=0.05, decrease=0.5, alpha=0.1):
+        self.maximum = maximum
+        self.minimum = max(1, min(minimum, maximum))
+        self.limit = float(maximum)
+        self.tolerance = tolerance
+        self.slack = slack
+        self.decrease = decrease
+        self.alpha = alpha
+        # Moving averages of healthy request latencies per kind
+        self.latency = {}
+        self.active = 0
+        self.decreases = 0
+        self.cond = threading.Condition()
+
+    def acquire(self):
+        """
+        Waits for a free slot and returns the number of decreases so far, to
+        be passed to release().
+        """
+        with self.cond:
+            while self.active >= int(self.limit):
+                self.cond.wait()
+            self.active += 1
+            return self.decreases
+
+    def release(self, ok=True, latency=None, kind=None, sent=None):
+        with self.cond:
+            self.active -= 1
+            slow = False
+            if ok and latency is not None:
+                typical = self.latency.get(kind)
+                if typical is None:
+                    self.latency[kind] = latency
+                else:
+                    slow = latency > max(typical * self.tolerance, typical + self.slack)
+                    self.latency[kind] = typical + self.alpha * (latency - typical)
+            if not ok or slow:
+                if sent is None or sent == self.decreases:
+                    self.limit = max(self.minimum, self.limit * self.decrease)
+                    self.decreases += 1
+            else:
+                self.limit = min(self.maximum, self.limit + 1 / self.limit)
+            self.cond.notify_all()
+
+
+class RetryPolicy(object):
+    """
+    Retries overload statuses and connection errors up to retries times,
+    waiting a random time up to backoff * 2 ** attempt (full jitter), or at
+    least as long as a Retry-After header asks for.
+    """
+    def __init__(self, retries=3, backoff=0.5, max_backoff=30, statuses=RETRY_STATUSES):
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.statuses = statuses
+
+    def retryable(self, error):
+        status = getattr(error, 'status', None)
+        if status is not None:
+            return status in self.statuses
+        return isinstance(error, RETRY_ERRORS)
+
+    def delay(self, attempt, retry_after=None):
+        delay = random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt))
+        if retry_after:
+            delay = max(delay, min(retry_after, self.max_backoff))
+        return delay
@@ -1,7 +1,140 @@
+import functools
+import itertools
+
+
+class Selector(object):
+    """
+    A compiled path expression.
+
+    Steps are matched one after the other:
+      key   the value of key in a dict
+      *     every value of a dict
+      **    followed by a key, every value of that key anywhere below,
+            without looking inside the matched values (like find_all)
+    A step applied to a list is applied to each of its items. all() collects
+    every match, iter() and first() are lazy and stop at the first match.
+    """
+    __slots__ = ('steps', 'ops')
+
+    def __init__(self, steps):
+        ops = []
+        i = 0
+        while i < len(steps):
+            if steps[i] == '**':
+                if i + 1 == len(steps) or steps[i + 1] in ('*', '**'):
+                    raise ValueError('** must be followed by a key')
+                ops.append((True, steps[i + 1]))
+                i += 2
+            else:
+                ops.append((False, steps[i]))
+                i += 1
+        self.steps = steps
+        self.ops = tuple(ops)
+
+    def iter(self, data):
+        """
+        Lazily yields the matches.
+        """
+        nodes = iter((data,))
+        for descendant, key in self.ops:
+            nodes = (_iter_descendants if descendant else _iter_children)(key, nodes)
+        return nodes
+
+    def all(self, data):
+        """
+        Returns a list of all matches.
+        """
+        nodes = [data]
+        for descendant, key in self.ops:
+            out = []
+            collect = _descendants if descendant else _children
+            for node in nodes:
+                collect(key, node, out)
+            nodes = out
+        return nodes
+
+    def first(self, data, default=None):
+        return next(self.iter(data), default)
+
+
+def _children(key, node, out):
+    stack = [node]
+    while stack:
+        n = stack.pop()
+        if isinstance(n, dict):
+            if key == '*':
+                out.extend(n.values())
+            elif key in n:
+                out.append(n[key])
+        elif isinstance(n, list):
+            stack.extend(reversed(n))
+
+
+def _descendants(key, node, out):
+    # Recursion is faster than an explicit stack for the shallow trees in
+    # device configurations, iter() is used where stopping early matters
+    if isinstance(node, dict):
+        for k, v in node.items():
+            if k == key:
+                out.append(v)
+            elif isinstance(v, (dict, list)):
+                _descendants(key, v, out)
+    elif isinstance(node, list):
+        for v in node:
+            if isinstance(v, (dict, list)):
+                _descendants(key, v, out)
+
+
+def _iter_children(key, nodes):
+    for node in nodes:
+        out = []
+        _children(key, node, out)
+        yield from out
+
+
+def _iter_descendants(key, nodes):
+    for node in nodes:
+        stack = [_entries(node)]
+        while stack:
+            for k, v in stack[-1]:
+                if k == key:
+                    yield v
+                elif isinstance(v, (dict, list)):
+                    stack.append(_entries(v))
+                    break
+            else:
+                stack.pop()
+
+
+def _entries(node):
+    if isinstance(node, dict):
+        return iter(node.items())
+    if isinstance(node, list):
+        return zip(itertools.repeat(None), node)
+    return iter(())
+
+
+@functools.lru_cache(maxsize=512)
+def compile_steps(steps):
+    return Selector(steps)
+
+
+def compile_path(expr, delimiter='.'):
+    """
+    Compiles a path expression like 'junos:interfaces.interface' or
+    '**.address.**.name'. Compiled selectors are cached.
+    """
+    return compile_steps(_split(expr, delimiter))
+
+
+@functools.lru_cache(maxsize=512)
+def _split(what, delimiter):
+    return tuple(what.split(delimiter))
+
+
 def find(what, data, delimiter='.', default=None):
-    paths = what.split(delimiter)
     elm = data
-    for p in paths:
+    for p in _split(what, delimiter):
         if p not in elm:
             elm = default
             break
@@ -10,25 +143,13 @@ def find(what, data, delimiter='.', default=None):
 
 
 def find_first(what, data, default=None):
-    result = find_all(what, data)
-    if result:
-        return result[0]
-    else:
-        return default
+    return compile_steps(('**', what)).first(data, default)
 
 
 def find_all(what, data, result=None):
     if result is None:
         result = []
-    if isinstance(data, list):
-        for v in data:
-            find_all(what, v, result)
-    if isinstance(data, dict):
-        for k, v in data.items():
-            if k == what:
-                result.append(v)
-            else:
-                find_all(what, v, result)
+    _descendants(what, data, result)
     return result
 
 
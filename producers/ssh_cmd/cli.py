@@ -1,5 +1,5 @@
 import argparse
-import ConfigParser
+import configparser
 
 class DefaultConf(object):
     def __init__(self, config):
@@ -24,10 +24,13 @@ def cli():
     parser = argparse.ArgumentParser(description='SSH command producer.')
     parser.add_argument('--config', '-C', required=True, help='a configuration file')
     parser.add_argument('--out', '-O', default='./json', help='an output directory')
+    parser.add_argument('--parallel', '-p', type=int, default=8, metavar='N', help='number of hosts to run commands on at once')
+    parser.add_argument('--single-session', '-s', action='store_true', help='run all commands for a host over one ssh session')
+    parser.add_argument('--timeout', '-t', type=float, help='seconds all commands on one host may take (default: timeout in base_conf or 60)')
     return parser.parse_args()
 
 def load_config(filepath):
-    conf = ConfigParser.SafeConfigParser()
+    conf = configparser.ConfigParser()
     conf.read(filepath)
     return DefaultConf(conf)
 
@@ -1,11 +1,17 @@
-from fabric.api import run, settings, env, quiet, hosts, local
 from cli import cli, load_config
+from concurrent.futures import ThreadPoolExecutor
 from file import template
 import converters
+import json
 import logging
+import os
+import shlex
+import subprocess
+import time
+import uuid
 import sys
 sys.path.append('../')
-from utils.file import save_to_json 
+from nerds_utils.file import load_nerds_file, merge_nerds_file  # noqa: E402
 
 
 logger = logging.getLogger('ssh_cmd')
@@ -16,15 +22,132 @@ formatter = logging.Formatter('%(name)s - %(levelname)s - %(message)s')
 ch.setFormatter(formatter)
 logger.addHandler(ch)
 
-# Would be nice to use hosts list instead of host_string...
-def ssh_cmd(host, cmd, options={}):
+# Seconds all commands on one host may take, unless configured
+DEFAULT_TIMEOUT = 60
+# Where ssh keeps the sockets of shared connections, see ssh_options
+DEFAULT_CONTROL_PATH = '~/.ssh/ssh_cmd-%C'
+
+
+class SshError(Exception):
+    pass
+
+
+def ssh_cmd(host, cmd, timeout=None, user=None, options=()):
+    """
+    Runs cmd on host with the ssh client, which reads ~/.ssh/config, or in
+    a local shell for localhost, and returns its output. Like before the
+    output of a command that fails is returned, but ssh failing to connect
+    raises SshError and a command running past timeout seconds raises
+    subprocess.TimeoutExpired.
+    """
     if host == "localhost":
-        with settings(quiet()):
-            output = local(cmd, capture=True)
+        args = cmd
     else:
-        with settings(quiet(), use_ssh_config = True, host_string = host):
-            output = run(cmd)
-    return output
+        args = ['ssh', '-o', 'BatchMode=yes']
+        if timeout:
+            args += ['-o', 'ConnectTimeout={}'.format(max(1, int(timeout)))]
+        if user:
+            args += ['-l', user]
+        args += list(options)
+        args += [host, cmd]
+    proc = subprocess.run(args, shell=host == "localhost", stdin=subprocess.DEVNULL, stdout=subprocess.PIPE,
+                          stderr=subprocess.PIPE, universal_newlines=True, timeout=timeout)
+    if host != "localhost" and proc.returncode == 255:
+        raise SshError(proc.stderr.strip())
+    return proc.stdout
+
+
+def ssh_options(config):
+    """
+    Returns the ssh options for control_persist in base_conf. With it set,
+    e.g. to 10m, ssh keeps a master connection to each host open that long
+    and later sessions, also of later runs, use it without a handshake.
+    """
+    persist = config.get('base_conf', 'control_persist')
+    if not persist:
+        return []
+    path = os.path.expanduser(config.get('base_conf', 'control_path', DEFAULT_CONTROL_PATH))
+    return ['-o', 'ControlMaster=auto', '-o', 'ControlPath={}'.format(path), '-o', 'ControlPersist={}'.format(persist)]
+
+
+def compound_cmd(cmds, mark):
+    """
+    Returns a command that runs cmds one after the other with sh, each in
+    a subshell and with its output between lines starting with mark.
+    """
+    script = []
+    for i, cmd in enumerate(cmds):
+        script.append("echo '{} begin {}'".format(mark, i))
+        script.append('(\n{}\n)'.format(cmd))
+        script.append("printf '\\n{} end {} %s\\n' $?".format(mark, i))
+    return 'sh -c {}'.format(shlex.quote('\n'.join(script)))
+
+
+def split_output(output, count, mark):
+    """
+    Returns the output of each of the count commands of a compound_cmd, or
+    None for a command that did not finish.
+    """
+    outputs = []
+    pos = 0
+    for i in range(count):
+        begin = '{} begin {}\n'.format(mark, i)
+        start = output.find(begin, pos)
+        end = output.find('\n{} end {} '.format(mark, i), start)
+        if start < 0 or end < 0:
+            outputs.append(None)
+            continue
+        outputs.append(output[start + len(begin):end])
+        pos = end
+    return outputs
+
+
+def host_jobs(producers, config):
+    """
+    Returns the producers to run on each host, in config order.
+    """
+    base_hosts = config.get('base_conf', 'hosts')
+    jobs = {}
+    for producer in producers:
+        for host in config.get(producer, 'hosts', base_hosts).split():
+            jobs.setdefault(host, []).append(producer)
+    return jobs
+
+
+def run_host(host, producers, config, timeout, single_session=False, options=()):
+    """
+    Runs the commands of producers on host one after the other, all within
+    timeout seconds. With single_session the commands for the same user
+    are run as one compound command over one ssh session. Returns a
+    (producer, lines, error) tuple for each and the number of sessions.
+    """
+    deadline = time.monotonic() + timeout
+    base_user = config.get('base_conf', 'user') or None
+    sessions = {}
+    for producer in producers:
+        user = config.get(producer, 'user', base_user)
+        sessions.setdefault(user if single_session else producer, (user, []))[1].append(producer)
+    results = []
+    for user, session in sessions.values():
+        cmds = [config.get(producer, 'cmd') for producer in session]
+        try:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise subprocess.TimeoutExpired(cmds[0], timeout)
+            if len(cmds) == 1:
+                outputs = [ssh_cmd(host, cmds[0], remaining, user, options)]
+            else:
+                mark = 'ssh_cmd-{}'.format(uuid.uuid4().hex)
+                outputs = split_output(ssh_cmd(host, compound_cmd(cmds, mark), remaining, user, options), len(cmds), mark)
+        except Exception as e:
+            results.extend((producer, None, e) for producer in session)
+            continue
+        for producer, output in zip(session, outputs):
+            if output is None:
+                results.append((producer, None, SshError('the session ended before the command finished')))
+            else:
+                results.append((producer, output.splitlines(), None))
+    return results, len(sessions)
 
 
 def handle_convert(host, lines, config, producer):
@@ -49,22 +172,71 @@ def handle_convert(host, lines, config, producer):
 
     return result
 
+def collect(hosts, nerds):
+    """
+    Merges the NERDS document nerds into the one for its host in hosts,
+    like writing it to the host file would.
+    """
+    name = nerds.get('host', {}).get('name')
+    if not name:
+        return False
+    key = name.lower()
+    if key in hosts:
+        hosts[key]['host'].update(nerds['host'])
+    else:
+        hosts[key] = nerds
+    return True
+
+
+def save_hosts(hosts, out_dir):
+    """
+    Writes the collected document of each host to its file in out_dir,
+    merged with what the file already holds. Every file is read and
+    written once, and replaced atomically.
+    """
+    if not os.path.exists(out_dir):
+        os.makedirs(out_dir)
+    for key, nerds in hosts.items():
+        file_name = os.path.join(out_dir, '{}.json'.format(key))
+        if os.path.isfile(file_name):
+            nerds = merge_nerds_file(load_nerds_file(file_name), nerds)
+        tmp = '{}.tmp'.format(file_name)
+        with open(tmp, 'w') as f:
+            json.dump(nerds, f, indent=4, sort_keys=True)
+        os.replace(tmp, file_name)
+
+
 def main(producers, config, args):
-    base_hosts = config.get('base_conf', 'hosts')
-    for producer in producers:
-        hosts = config.get(producer, 'hosts', base_hosts).split()
-        for host in hosts:
-            try:
-                producer_conf = config.get_section(producer)
-                cmd = config.get(producer, 'cmd')
-
-                lines = ssh_cmd(host, cmd).splitlines()
-                result = handle_convert(host, lines, producer_conf, producer)
-                # output result
-                for nerds in result:
-                    save_to_json(nerds, args.out)
-            except Exception as e:
-                logger.error( "Producer '{}' on host '{}' failed with message: {}".format(producer, host, e))
+    timeout = args.timeout or float(config.get('base_conf', 'timeout', DEFAULT_TIMEOUT))
+    single_session = args.single_session or config.get('base_conf', 'single_session').lower() in ('true', 'yes', '1')
+    options = ssh_options(config)
+    jobs = host_jobs(producers, config)
+    total_sessions = 0
+    # documents per host file, written once at the end
+    hosts = {}
+    documents = 0
+    # Hosts are run in parallel, results are converted and collected here
+    # only, in config order so the merge does not depend on timing
+    with ThreadPoolExecutor(max_workers=max(1, args.parallel)) as executor:
+        futures = {executor.submit(run_host, host, host_producers, config, timeout, single_session, options): host
+                   for host, host_producers in jobs.items()}
+        for future, host in futures.items():
+            results, sessions = future.result()
+            total_sessions += sessions
+            for producer, lines, error in results:
+                try:
+                    if error:
+                        raise error
+                    result = handle_convert(host, lines, config.get_section(producer), producer)
+                    for nerds in result:
+                        if collect(hosts, nerds):
+                            documents += 1
+                except Exception as e:
+                    logger.error("Producer '{}' on host '{}' failed with message: {}".format(producer, host, e))
+    logger.info('Ran {} commands on {} hosts over {} sessions'.format(
+        sum(len(p) for p in jobs.values()), len(jobs), total_sessions))
+    save_hosts(hosts, args.out)
+    logger.info('Wrote {} files for {} documents, saved {} writes'.format(len(hosts), documents, documents - len(hosts)))
 
 
 if __name__ == '__main__':
@@ -0,0 +1,94 @@
+import argparse
+import json
+import os
+import tempfile
+import time
+import unittest
+from cli import load_config
+import subprocess
+from ssh_cmd.ssh_cmd import compound_cmd, host_jobs, main, run_host, split_output, ssh_options
+
+CONFIG = '''
+[base_conf]
+hosts = localhost
+timeout = 2
+
+[mem_info]
+cmd = printf 'MemTotal: 1 kB\\nMemFree: 2 kB\\n'
+convert = split
+seperator = :
+
+[users]
+cmd = printf 'alice\\nbob\\n'
+convert = to_list
+list_key = users
+
+[slow]
+cmd = sleep 10
+convert = to_list
+'''
+
+
+class SshCmdTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        path = os.path.join(self.tmp.name, 'ssh_cmd.conf')
+        with open(path, 'w') as f:
+            f.write(CONFIG)
+        self.config = load_config(path)
+        self.out = os.path.join(self.tmp.name, 'json')
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_host_jobs(self):
+        self.assertEqual(host_jobs(['mem_info', 'users'], self.config),
+                         {'localhost': ['mem_info', 'users']})
+
+    def test_run_host_timeout(self):
+        start = time.monotonic()
+        results, sessions = run_host('localhost', ['mem_info', 'slow', 'users'], self.config, 1)
+        self.assertEqual(sessions, 3)
+        self.assertLess(time.monotonic() - start, 5)
+        self.assertEqual(results[0], ('mem_info', ['MemTotal: 1 kB', 'MemFree: 2 kB'], None))
+        self.assertEqual([r[0] for r in results], ['mem_info', 'slow', 'users'])
+        # the host is out of time after the slow command
+        self.assertIsNotNone(results[1][2])
+        self.assertIsNotNone(results[2][2])
+
+    def test_ssh_options(self):
+        self.assertEqual(ssh_options(self.config), [])
+        self.config.config.set('base_conf', 'control_persist', '10m')
+        self.config.config.set('base_conf', 'control_path', '/tmp/ssh_cmd-%%C')
+        self.assertEqual(ssh_options(self.config), ['-o', 'ControlMaster=auto', '-o', 'ControlPath=/tmp/ssh_cmd-%C',
+                                                    '-o', 'ControlPersist=10m'])
+
+    def test_compound_cmd(self):
+        cmds = ["printf 'a\\nb\\n'", "printf 'no newline'", "cd /; pwd; exit 3", 'true']
+        output = subprocess.run(compound_cmd(cmds, 'mark'), shell=True, stdout=subprocess.PIPE,
+                                universal_newlines=True).stdout
+        self.assertEqual(split_output(output, 4, 'mark'), ['a\nb\n', 'no newline', '/\n', ''])
+        # the session ended during the second command
+        self.assertEqual(split_output(output[:output.index('no newline')], 4, 'mark'), ['a\nb\n', None, None, None])
+
+    def test_single_session(self):
+        results, sessions = run_host('localhost', ['mem_info', 'users'], self.config, 2, single_session=True)
+        self.assertEqual(sessions, 1)
+        self.assertEqual(results, [('mem_info', ['MemTotal: 1 kB', 'MemFree: 2 kB'], None),
+                                   ('users', ['alice', 'bob'], None)])
+
+    def test_main(self):
+        os.makedirs(self.out)
+        with open(os.path.join(self.out, 'localhost.json'), 'w') as f:
+            json.dump({'host': {'name': 'localhost', 'version': 1, 'other': {'kept': True}}}, f)
+        args = argparse.Namespace(out=self.out, parallel=4, timeout=None, single_session=False)
+        with self.assertLogs('ssh_cmd', 'INFO') as logs:
+            main(['mem_info', 'users', 'slow'], self.config, args)
+        self.assertIn('INFO:ssh_cmd:Wrote 1 files for 2 documents, saved 1 writes', logs.output)
+        self.assertEqual(os.listdir(self.out), ['localhost.json'])
+        with open(os.path.join(self.out, 'localhost.json')) as f:
+            host = json.load(f)['host']
+        self.assertEqual(host['mem_info'], {'MemTotal': '1 kB', 'MemFree': '2 kB'})
+        self.assertEqual(host['users'], {'users': ['alice', 'bob']})
+        self.assertEqual(host['other'], {'kept': True})
+        self.assertNotIn('slow', host)